@@ -0,0 +1,63 @@
+'''
+Throughput and accuracy of the area computations.
+
+    python -m benchmarks.bench_area [--calls 20]
+
+Throughput: `--calls` area computations of the South American countries,
+once with `to_crs(epsg=3035)` every time (as the notebook did) and once
+through `geobirds.area` (cached transformer, memoized reprojection), plus
+the vectorized geodesic areas.
+
+Accuracy: per-country relative error against pyproj.Geod (geodesic
+areas on WGS 84) for EPSG:3035, the regional equal-area CRS, a local
+LAEA and the vectorized geodesic areas.
+'''
+
+import argparse
+
+import numpy as np
+import pyproj
+
+from geobirds.area import (area_km2, equal_area_crs, geodesic_area_km2,
+                           local_equal_area_crs)
+from benchmarks.common import best_of, load_south_america, print_table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    south_america = load_south_america()
+    geod = pyproj.Geod(ellps='WGS84')
+    reference = np.array([abs(geod.geometry_area_perimeter(g)[0])
+                          for g in south_america.geometry]) / 10**6
+
+    def repeat(func):
+        return lambda: [func() for _ in range(args.calls)][-1]
+
+    methods = {
+        'to_crs(3035)': lambda: south_america.to_crs(epsg=3035).area / 10**6,
+        'area_km2(3035)': lambda: area_km2(south_america, 'EPSG:3035'),
+        'area_km2(region)': lambda: area_km2(south_america),
+        'area_km2(laea)': lambda: area_km2(
+            south_america, local_equal_area_crs(south_america)),
+        'geodesic': lambda: geodesic_area_km2(south_america),
+    }
+    rows = []
+    for label, func in methods.items():
+        t, area = best_of(repeat(func), args.repeat)
+        error = np.abs(np.asarray(area) / reference - 1)
+        rows.append({'method': label, 'calls': args.calls,
+                     'seconds': f'{t:.4f}',
+                     'max_rel_error': f'{error.max():.2e}',
+                     'total_rel_error':
+                         f'{abs(np.sum(area) / reference.sum() - 1):.2e}'})
+    print(f'regional CRS: {equal_area_crs(south_america)}')
+    print_table(rows, ['method', 'calls', 'seconds', 'max_rel_error',
+                       'total_rel_error'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+'''
+Multi-species batch: shared reference layers vs. reloading them per job.
+
+    python -m benchmarks.bench_batch [--species 12] [--fixes 20000]
+                                     [--polygons 4700] [--workers 1 4]
+
+Writes `--species` synthetic tracking CSVs and a synthetic protected area
+layer (GeoPackage). `reload` is one run per species, each reading,
+simplifying and indexing the protected areas again (as the script does);
+`shared` is `run_batch` with the layers loaded and indexed once, with
+the given worker counts. Maps are off, so that the table shows what the
+sharing saves.
+'''
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import geopandas as gpd
+
+from geobirds.batch import ReferenceLayers, run_batch, run_job
+from benchmarks.common import load_world, print_table
+from benchmarks.synthetic import bird_tracks, protected_polygons
+
+
+def load_reference(path, world):
+    protected = gpd.read_file(path)
+    protected['geometry'] = protected.simplify(0.02, preserve_topology=False)
+    return ReferenceLayers(protected, world)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--species', type=int, default=12)
+    parser.add_argument('--fixes', type=int, default=20_000)
+    parser.add_argument('--polygons', type=int, default=4700)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args(argv)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        layer = str(tmp / 'protected.gpkg')
+        protected_polygons(args.polygons).to_file(layer)
+        paths = []
+        for k in range(args.species):
+            paths.append(tmp / f'species_{k:02d}.csv')
+            bird_tracks(args.fixes, seed=k).to_csv(paths[-1], index=False)
+        world = load_world()
+
+        t0 = time.perf_counter()
+        for p in paths:
+            run_job(p, tmp, load_reference(layer, world), maps=False)
+        seconds = time.perf_counter() - t0
+        rows.append({'mode': 'reload', 'workers': 1,
+                     'reference_s': '', 'total_s': f'{seconds:.2f}',
+                     'jobs_per_min': f'{60 * len(paths) / seconds:.0f}'})
+
+        for workers in args.workers:
+            t0 = time.perf_counter()
+            reference = load_reference(layer, world)
+            manifest = run_batch(paths, tmp, workers=workers, maps=False,
+                                 reference=reference)
+            seconds = time.perf_counter() - t0
+            rows.append({'mode': 'shared', 'workers': workers,
+                         'reference_s': f'{seconds - manifest["jobs_s"]:.2f}',
+                         'total_s': f'{seconds:.2f}',
+                         'jobs_per_min': f'{manifest["jobs_per_min"]:.0f}'})
+    print_table(rows, ['mode', 'workers', 'reference_s', 'total_s',
+                       'jobs_per_min'])
+
+
+if __name__ == '__main__':
+    main()
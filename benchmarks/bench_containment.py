@@ -0,0 +1,65 @@
+'''
+Indexed vs. brute force point-in-protected-area and distance-to-boundary
+queries over synthetic fixes and polygons.
+
+    python -m benchmarks.bench_containment [--fixes 1000 100000 1000000]
+                                           [--polygons 1000 5000]
+                                           [--max-brute 10000000]
+
+The brute force variant tests every fix against every polygon; it is
+skipped when fixes x polygons exceeds --max-brute.
+'''
+
+import argparse
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from geobirds.containment import fix_containment, local_metric_crs
+from benchmarks.common import best_of, print_table
+from benchmarks.synthetic import bird_tracks, protected_polygons
+
+
+def brute_force(birds, protected):
+    crs = local_metric_crs(birds)
+    points = np.asarray(birds.to_crs(crs).geometry)[:, None]
+    polygons = np.asarray(protected.to_crs(crs).geometry)[None, :]
+    inside = shapely.intersects(points, polygons).any(axis=1)
+    dist = shapely.distance(points, shapely.boundary(polygons)).min(axis=1)
+    return inside, dist
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--fixes', type=int, nargs='+',
+                        default=[10**3, 10**5, 10**6])
+    parser.add_argument('--polygons', type=int, nargs='+',
+                        default=[1000, 5000])
+    parser.add_argument('--max-brute', type=int, default=10**7)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for n_poly in args.polygons:
+        protected = protected_polygons(n_poly)
+        for n in args.fixes:
+            df = bird_tracks(n)
+            birds = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(
+                df['location-long'], df['location-lat']), crs='EPSG:4326')
+            t, out = best_of(lambda: fix_containment(birds, protected),
+                             args.repeat)
+            row = {'polygons': n_poly, 'fixes': n,
+                   'indexed_s': f'{t:.3f}', 'brute_s': '-'}
+            if n * n_poly <= args.max_brute:
+                t, (inside, dist) = best_of(
+                    lambda: brute_force(birds, protected), args.repeat)
+                assert (inside == out['in_protected'].to_numpy()).all()
+                np.testing.assert_allclose(dist, out['boundary_dist_m'])
+                row['brute_s'] = f'{t:.3f}'
+            rows.append(row)
+    print_table(rows, ['polygons', 'fixes', 'indexed_s', 'brute_s'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''
+Dwell days per bird and country: `bird_dwell` vs. geopandas sjoin and
+groupby.
+
+    python -m benchmarks.bench_dwell [--fixes 100000 1000000 5000000]
+                                     [--polygons 4700] [--max-sjoin 1000000]
+
+`sjoin` builds the `birds` GeoDataFrame, joins it to the countries and
+to the protected areas with `gpd.sjoin` (predicate 'intersects') and
+sums the time weights with a pandas groupby, i.e. the usual geopandas
+way; it is skipped above --max-sjoin fixes. Both give the same days.
+'''
+
+import argparse
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from geobirds.dwell import AT_SEA, bird_dwell, fix_days
+from geobirds.trajectory import TrajectoryStore, track_offsets
+from benchmarks.common import best_of, load_world, print_table
+from benchmarks.synthetic import bird_tracks, protected_polygons
+
+
+def store(df):
+    ids, offsets = track_offsets(df['tag-local-identifier'].to_numpy())
+    return TrajectoryStore(ids, df['timestamp'].to_numpy(),
+                           df['location-long'].to_numpy(),
+                           df['location-lat'].to_numpy(), offsets)
+
+
+def with_sjoin(tracks, world, protected):
+    birds = tracks.to_birds()
+    country = gpd.sjoin(birds, world[['name', 'geometry']], how='left',
+                        predicate='intersects')
+    country = country[~country.index.duplicated()]['name'].fillna(AT_SEA)
+    inside = birds.index.isin(gpd.sjoin(birds, protected[['geometry']],
+                                        predicate='intersects').index)
+    df = pd.DataFrame({'bird': birds['tag-local-identifier'].to_numpy(),
+                       'country': country.to_numpy(),
+                       'days': fix_days(tracks)})
+    df['protected_days'] = np.where(inside, df['days'], 0.0)
+    return df.groupby(['bird', 'country'])[['days', 'protected_days']].sum()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--fixes', type=int, nargs='+',
+                        default=[10**5, 10**6, 5 * 10**6])
+    parser.add_argument('--polygons', type=int, default=4700)
+    parser.add_argument('--max-sjoin', type=int, default=10**6)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    world = load_world()
+    protected = protected_polygons(args.polygons)
+    rows = []
+    for n in args.fixes:
+        tracks = store(bird_tracks(n, n_birds=100))
+        t, out = best_of(lambda: bird_dwell(tracks, world, protected),
+                         args.repeat)
+        row = {'fixes': n, 'dwell_s': f'{t:.3f}', 'sjoin_s': '-'}
+        if n <= args.max_sjoin:
+            t, ref = best_of(lambda: with_sjoin(tracks, world, protected),
+                             args.repeat)
+            out = out.set_index(['tag-local-identifier', 'country'])
+            np.testing.assert_allclose(out['dwell_days'], ref['days'])
+            np.testing.assert_allclose(out['protected_days'],
+                                       ref['protected_days'])
+            row['sjoin_s'] = f'{t:.3f}'
+        rows.append(row)
+    print_table(rows, ['fixes', 'dwell_s', 'sjoin_s'])
+
+
+if __name__ == '__main__':
+    main()
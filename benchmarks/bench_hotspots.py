@@ -0,0 +1,68 @@
+'''
+Hashed hotspot counting vs. pandas groupby on synthetic tracks.
+
+    python -m benchmarks.bench_hotspots [--fixes 100000 1000000 10000000]
+                                        [--birds 11 1000]
+
+Both variants project the fixes, hash them to the same hexagons (about
+half of the time) and count fixes and distinct birds per (season, cell);
+`hotspots` with one sort of an int64 key, the other with a pandas
+groupby + nunique.
+'''
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from geobirds.area import REGION_CRS, transformer
+from geobirds.hotspots import hex_cells, hotspots, time_windows
+from geobirds.trajectory import TrajectoryStore
+from benchmarks.common import best_of, print_table
+from benchmarks.synthetic import bird_tracks
+
+
+def groupby_counts(store, cell):
+    x, y = transformer('EPSG:4326', REGION_CRS['World']).transform(
+        store.lon, store.lat)
+    i, j = hex_cells(x, y, cell)
+    window, _ = time_windows(store.t)
+    df = pd.DataFrame({'window': window, 'i': i, 'j': j,
+                       'bird': store.bird_of_fix()})
+    return df[window >= 0].groupby(['window', 'i', 'j'])['bird'].agg(
+        ['size', 'nunique'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--fixes', type=int, nargs='+',
+                        default=[10**5, 10**6, 10**7])
+    parser.add_argument('--birds', type=int, nargs='+', default=[11, 1000])
+    parser.add_argument('--cell', type=float, default=50_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for n_birds in args.birds:
+        for n in args.fixes:
+            df = bird_tracks(n, n_birds=n_birds)
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            store = TrajectoryStore.from_birds(df)
+            del df
+            t_hash, hot = best_of(lambda: hotspots(store, args.cell),
+                                  args.repeat)
+            t_group, ref = best_of(lambda: groupby_counts(store, args.cell),
+                                   args.repeat)
+            assert hot['n_fixes'].sum() == ref['size'].sum()
+            assert np.array_equal(np.sort(hot['n_birds'].to_numpy()),
+                                  np.sort(ref['nunique'].to_numpy()))
+            rows.append({'birds': n_birds, 'fixes': n, 'cells': len(hot),
+                         'hash_s': f'{t_hash:.3f}',
+                         'groupby_s': f'{t_group:.3f}',
+                         'Mfixes_per_s': f'{n / t_hash / 10**6:.1f}'})
+    print_table(rows, ['birds', 'fixes', 'cells', 'hash_s', 'groupby_s',
+                       'Mfixes_per_s'])
+
+
+if __name__ == '__main__':
+    main()
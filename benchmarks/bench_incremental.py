@@ -0,0 +1,77 @@
+'''
+Incremental update vs. full recomputation as the tracking history grows.
+
+    python -m benchmarks.bench_incremental [--history 10000 100000 1000000]
+                                           [--batch 1000] [--updates 5]
+
+For every history size, synthetic fixes (in time order) are written to a
+CSV and ingested once by `IncrementalTracks`; then `--updates` batches of
+`--batch` fixes are appended one after the other. `incremental_s` is
+the median time of `update` per batch (stats, layers and state
+written), `full_s` the time to read the whole CSV again and compute the
+step metrics, stopovers and protected area containment of every fix.
+'''
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from geobirds.batch import ReferenceLayers
+from geobirds.birds import read_tracks
+from geobirds.incremental import IncrementalTracks
+from geobirds.movement import step_metrics, stopovers
+from benchmarks.common import print_table
+from benchmarks.synthetic import bird_tracks, protected_polygons
+
+
+def full_run(path, reference):
+    tracks = read_tracks(path)
+    birds = tracks.to_birds()
+    step_metrics(tracks)
+    stopovers(tracks)
+    return reference.n_protected(np.asarray(birds.geometry))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--history', type=int, nargs='+',
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--updates', type=int, default=5)
+    parser.add_argument('--polygons', type=int, default=4700)
+    args = parser.parse_args(argv)
+
+    reference = ReferenceLayers(protected_polygons(args.polygons))
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.history:
+            fixes = bird_tracks(n + args.batch * args.updates, seed=n)
+            fixes = fixes.sort_values('timestamp', kind='stable')
+            path = Path(tmp) / f'tracks-{n}.csv'
+            fixes.iloc[:n].to_csv(path, index=False)
+            tracks = IncrementalTracks(Path(tmp) / f'state-{n}', reference)
+            tracks.update(path)
+
+            seconds = []
+            for k in range(args.updates):
+                lo = n + k * args.batch
+                fixes.iloc[lo:lo + args.batch].to_csv(path, mode='a',
+                                                      header=False,
+                                                      index=False)
+                seconds.append(tracks.update(path)['seconds'])
+            t0 = time.perf_counter()
+            full_run(path, reference)
+            full_s = time.perf_counter() - t0
+            rows.append({'history': n, 'batch': args.batch,
+                         'incremental_s': f'{np.median(seconds):.4f}',
+                         'full_s': f'{full_s:.3f}',
+                         'speedup': f'{full_s / np.median(seconds):.0f}x'})
+    print_table(rows, ['history', 'batch', 'incremental_s', 'full_s',
+                       'speedup'])
+
+
+if __name__ == '__main__':
+    main()
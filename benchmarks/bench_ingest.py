@@ -0,0 +1,85 @@
+'''
+Single `pd.read_csv(parse_dates=...)` vs. chunked `read_birds` of a
+Movebank-style CSV.
+
+    python -m benchmarks.bench_ingest [--fixes 100000 1000000]
+                                      [--chunksize 200000]
+
+`parse_peak_MB` is the peak memory of reading the file, `peak_MB` that
+of the whole load including the GeoDataFrame of shapely points (which
+is the same for both).
+'''
+
+import argparse
+import os
+import tempfile
+import tracemalloc
+
+import geopandas as gpd
+import pandas as pd
+
+from geobirds.birds import TrackAssembler, read_birds, read_chunks
+from benchmarks.common import best_of, print_table
+from benchmarks.synthetic import bird_tracks
+
+
+def read_whole(path):
+    '''
+    What the notebook did: one read_csv, then the GeoDataFrame.
+    '''
+    df = pd.read_csv(path, parse_dates=['timestamp'])
+    return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(
+        df['location-long'], df['location-lat']), crs='EPSG:4326')
+
+
+def parse_whole(path):
+    return pd.read_csv(path, parse_dates=['timestamp'])
+
+
+def parse_chunked(path, chunksize):
+    assembler = TrackAssembler()
+    for arrays in read_chunks(path, chunksize):
+        assembler.add(*arrays)
+    return assembler.arrays()
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--fixes', type=int, nargs='+',
+                        default=[10**5, 10**6])
+    parser.add_argument('--chunksize', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    readers = {'read_csv': (read_whole, parse_whole),
+               'read_birds': (lambda p: read_birds(p, args.chunksize),
+                              lambda p: parse_chunked(p, args.chunksize))}
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.fixes:
+            path = os.path.join(tmp, f'birds_{n}.csv')
+            bird_tracks(n).to_csv(path, index=False,
+                                  date_format='%Y-%m-%d %H:%M:%S.000')
+            for label, (read, parse) in readers.items():
+                t, _ = best_of(lambda: read(path), args.repeat)
+                rows.append({'fixes': n, 'reader': label,
+                             'seconds': f'{t:.3f}',
+                             'parse_peak_MB':
+                                 f'{peak_memory(lambda: parse(path)):.0f}',
+                             'peak_MB':
+                                 f'{peak_memory(lambda: read(path)):.0f}'})
+    print_table(rows, ['fixes', 'reader', 'seconds', 'parse_peak_MB',
+                       'peak_MB'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+'''
+Per-fix CircleMarker / PolyLine objects vs. one TrackLayer.
+
+    python -m benchmarks.bench_layers [--fixes 100 ... 1000000]
+                                      [--max-objects 10000]
+
+Reports the time to build and save the map and the HTML size. The
+per-object builder is skipped above --max-objects fixes (it takes
+minutes there).
+'''
+
+import argparse
+import os
+import tempfile
+import time
+
+import folium
+import numpy as np
+
+from geobirds.layers import add_tracks
+from benchmarks.common import print_table
+from benchmarks.synthetic import bird_tracks
+
+
+def per_object_map(birds, color):
+    '''
+    The map builder of the notebook before TrackLayer.
+    '''
+    m = folium.Map(location=[10, -70], zoom_start=3)
+    for i_g, (n, g) in enumerate(birds.groupby('tag-local-identifier')):
+        folium.PolyLine(locations=g[['location-lat', 'location-long']],
+                        weight=2, opacity=1.0, color=color[i_g]).add_to(m)
+        for i, r in g.iterrows():
+            folium.CircleMarker(location=(r['location-lat'],
+                                          r['location-long']),
+                                radius=8, color='transparent',
+                                fill_color=color[i_g], fill_opacity=0.7,
+                                fill=True).add_to(m)
+    return m
+
+
+def track_layer_map(birds, color):
+    m = folium.Map(location=[10, -70], zoom_start=3)
+    add_tracks(m, birds)
+    return m
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--fixes', type=int, nargs='+',
+                        default=[10**2, 10**3, 10**4, 10**5, 10**6])
+    parser.add_argument('--max-objects', type=int, default=10**4)
+    args = parser.parse_args(argv)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.fixes:
+            birds = bird_tracks(n)
+            ids = np.sort(birds['tag-local-identifier'].unique())
+            color = [f'#{c:06x}' for c in
+                     np.random.default_rng(0).integers(0, 256**3, len(ids))]
+            birds['color'] = birds['tag-local-identifier'].map(
+                dict(zip(ids, color)))
+            builders = {'per-object': per_object_map,
+                        'TrackLayer': track_layer_map}
+            for label, build in builders.items():
+                if label == 'per-object' and n > args.max_objects:
+                    continue
+                path = os.path.join(tmp, f'{label}.html')
+                t0 = time.perf_counter()
+                build(birds, color).save(path)
+                t = time.perf_counter() - t0
+                rows.append({'fixes': n, 'builder': label,
+                             'seconds': f'{t:.3f}',
+                             'html_kB': os.path.getsize(path) // 1024})
+    print_table(rows, ['fixes', 'builder', 'seconds', 'html_kB'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+'''
+Full vs. column-projected / bbox-filtered / compact loading of the
+protected area shapefile.
+
+    python -m benchmarks.bench_load [--shp PATH] [--n 20000] [--repeat 3]
+
+Without --shp (and without the course data) a synthetic WDPA-like
+shapefile with `--n` polygons is written to a temporary directory.
+'''
+
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from geobirds.protected import PIPELINE_COLUMNS, read_protected_areas
+from benchmarks.common import (DATA_DIR, PROTECTED_SHP, best_of, load_world,
+                               print_table)
+from benchmarks.synthetic import protected_polygons
+
+
+def peak_memory(func):
+    '''
+    Peak traced allocation [MB] while running `func`.
+    '''
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--shp')
+    parser.add_argument('--n', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    world = load_world()
+    americas = world.loc[world['continent'].isin(
+        ['North America', 'South America'])]
+    modes = {
+        'full': dict(),
+        'columns': dict(columns=PIPELINE_COLUMNS),
+        'columns+compact': dict(columns=PIPELINE_COLUMNS, compact=True),
+        'columns+compact+bbox': dict(columns=PIPELINE_COLUMNS, compact=True,
+                                     bbox=tuple(americas.total_bounds)),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shp = args.shp or Path(DATA_DIR) / PROTECTED_SHP
+        if not Path(shp).exists():
+            shp = Path(tmp) / 'synthetic.shp'
+            protected_polygons(args.n, bounds=(-180, -60, 180, 80)).to_file(
+                shp)
+
+        rows = []
+        for label, kwargs in modes.items():
+            t, gdf = best_of(lambda: read_protected_areas(shp, **kwargs),
+                             args.repeat)
+            peak = peak_memory(lambda: read_protected_areas(shp, **kwargs))
+            attrs = gdf.drop(columns=gdf.geometry.name)
+            attr_mb = attrs.memory_usage(deep=True).sum() / 2**20
+            rows.append({'mode': label, 'rows': len(gdf),
+                         'seconds': f'{t:.3f}',
+                         'peak_MB': f'{peak:.1f}',
+                         'attr_MB': f'{attr_mb:.2f}'})
+    print_table(rows, ['mode', 'rows', 'seconds', 'peak_MB', 'attr_MB'])
+
+
+if __name__ == '__main__':
+    main()
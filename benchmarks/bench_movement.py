@@ -0,0 +1,36 @@
+'''
+Throughput of the movement metrics (steps, speed, heading, stopovers).
+
+    python -m benchmarks.bench_movement [--fixes 100000 1000000 5000000]
+'''
+
+import argparse
+
+from geobirds.movement import movement_metrics
+from geobirds.trajectory import TrajectoryStore
+from benchmarks.common import best_of, print_table
+from benchmarks.synthetic import bird_tracks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--fixes', type=int, nargs='+',
+                        default=[10**5, 10**6, 5 * 10**6])
+    parser.add_argument('--birds', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for n in args.fixes:
+        birds = bird_tracks(n, n_birds=args.birds)
+        t_store, tracks = best_of(lambda: TrajectoryStore.from_birds(birds),
+                                  args.repeat)
+        t, _ = best_of(lambda: movement_metrics(tracks), args.repeat)
+        rows.append({'fixes': n, 'store_s': f'{t_store:.3f}',
+                     'metrics_s': f'{t:.3f}',
+                     'Mfix_per_s': f'{n / t / 1e6:.2f}'})
+    print_table(rows, ['fixes', 'store_s', 'metrics_s', 'Mfix_per_s'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+'''
+Nested loop vs. STR-tree vs. tiled parallel overlay for the per-country
+protected area.
+
+    python -m benchmarks.bench_overlay [--n 500 2000 4700] [--repeat 3]
+                                       [--workers 1 4]
+
+Uses the SAPA layer when the course data is present; otherwise
+synthetic polygons of the requested sizes.
+'''
+
+import argparse
+
+import numpy as np
+
+from geobirds.overlay import protected_fraction
+from benchmarks.common import (best_of, load_south_america,
+                               load_protected_areas, print_table)
+from benchmarks.synthetic import protected_polygons
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--n', type=int, nargs='+', default=[500, 2000, 4700])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--engines', nargs='+',
+                        default=['loop', 'indexed', 'parallel'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[None],
+                        help='worker counts for the parallel engine')
+    args = parser.parse_args(argv)
+
+    south_america = load_south_america()
+    real = load_protected_areas()
+    layers = ([('SAPA', real)] if real is not None else
+              [(f'synthetic-{n}', protected_polygons(n)) for n in args.n])
+
+    rows = []
+    for label, protected in layers:
+        results = []
+        for engine in args.engines:
+            for workers in (args.workers if engine == 'parallel' else [None]):
+                kwargs = {'workers': workers} if engine == 'parallel' else {}
+                t, out = best_of(lambda: protected_fraction(
+                    south_america, protected, engine=engine, **kwargs),
+                    args.repeat)
+                results.append(out['protected_area_total'].values)
+                rows.append({'layer': label, 'polygons': len(protected),
+                             'engine': engine, 'workers': workers or '-',
+                             'seconds': f'{t:.4f}'})
+        for r in results[1:]:
+            np.testing.assert_allclose(r, results[0], rtol=1e-9, atol=1e-12)
+    print_table(rows, ['layer', 'polygons', 'engine', 'workers', 'seconds'])
+
+
+if __name__ == '__main__':
+    main()
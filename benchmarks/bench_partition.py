@@ -0,0 +1,98 @@
+'''
+In-memory vs. out-of-core (Hilbert partitioned) country overlay.
+
+    python -m benchmarks.bench_partition [--n 20000 100000]
+                                         [--rows-per-partition 5000]
+
+Writes synthetic protected polygons to a GeoPackage, then in a fresh
+process each: reads the whole layer and runs `protected_fraction`
+(`memory`), or partitions it on disk and runs `partitioned_fraction`
+(`partitioned`, the partitioning is timed apart from the overlay). The
+table shows the time, the peak RSS of the process and the largest
+difference of the per-country areas between the two.
+'''
+
+import argparse
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import load_world, print_table
+from benchmarks.synthetic import protected_polygons
+
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+CRS = 'ESRI:54009'
+
+
+def _run(mode, path, rows_per_partition, cache_dir):
+    import geopandas as gpd
+    from geobirds.overlay import protected_fraction
+    from geobirds.partition import (partition_file,
+                                    partition_protected_areas,
+                                    partitioned_fraction)
+
+    t0 = time.perf_counter()
+    if mode == 'memory':
+        world = load_world()
+        protected = gpd.read_file(path)
+        t1 = time.perf_counter()
+        area = protected_fraction(world, protected, crs=CRS)[
+            'protected_area_total'].to_numpy()
+    else:
+        world = partition_file(gpd.datasets.get_path('naturalearth_lowres'),
+                               'world', cache_dir=cache_dir)
+        protected = partition_protected_areas(
+            path, tolerance=0, columns=['WDPAID'],
+            rows_per_partition=rows_per_partition, cache_dir=cache_dir)
+        t1 = time.perf_counter()
+        area = partitioned_fraction(world, protected, crs=CRS)[
+            'protected_area_total'].to_numpy()
+    t2 = time.perf_counter()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+    return t1 - t0, t2 - t1, rss / 2**20, area
+
+
+def run(mode, path, rows_per_partition, cache_dir):
+    '''
+    `_run` in a fresh process, so that the peak RSS is its own.
+    '''
+    with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(_run, mode, path, rows_per_partition,
+                           cache_dir).result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--n', type=int, nargs='+', default=[20_000, 100_000])
+    parser.add_argument('--rows-per-partition', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.n:
+            path = str(Path(tmp) / f'protected-{n}.gpkg')
+            protected_polygons(n).to_file(path)
+            result = {}
+            for mode in ('memory', 'partitioned'):
+                load_s, overlay_s, rss_mb, area = run(
+                    mode, path, args.rows_per_partition, tmp)
+                result[mode] = area
+                rows.append({'polygons': n, 'mode': mode,
+                             'load_s': f'{load_s:.2f}',
+                             'overlay_s': f'{overlay_s:.2f}',
+                             'peak_rss_MB': f'{rss_mb:.0f}',
+                             'max_diff_km2': ''})
+            diff = np.abs(result['memory'] - result['partitioned']).max()
+            rows[-1]['max_diff_km2'] = f'{diff:.2e}'
+    print_table(rows, ['polygons', 'mode', 'load_s', 'overlay_s',
+                       'peak_rss_MB', 'max_diff_km2'])
+
+
+if __name__ == '__main__':
+    main()
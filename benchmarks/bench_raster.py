@@ -0,0 +1,80 @@
+'''
+Raster vs. exact vector overlay of the South American protected areas.
+
+    python -m benchmarks.bench_raster [--polygons 1000 5000]
+                                      [--cells 500 2000 8000]
+
+For every grid resolution, the raster engine is timed cold (rasterizing
+into an empty cache) and warm (mapping the cached arrays), and its
+protected area per country is compared with the exact area of the
+dissolved footprint. `max_err_km2` must stay below `max_bound_km2`
+(`geobirds.raster.error_bound`). Uses the real SAPA layer when the
+course data is on disk, synthetic polygons otherwise.
+'''
+
+import argparse
+import tempfile
+
+import numpy as np
+
+from geobirds.area import equal_area_crs, reproject
+from geobirds.dissolve import dissolve_protected
+from geobirds.overlay import protected_fraction
+from geobirds.raster import error_bound
+from benchmarks.common import (best_of, load_protected_areas,
+                               load_south_america, print_table)
+from benchmarks.synthetic import protected_polygons
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--polygons', type=int, nargs='+',
+                        default=[1000, 5000])
+    parser.add_argument('--cells', type=int, nargs='+',
+                        default=[500, 2000, 8000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    south_america = load_south_america()
+    crs = equal_area_crs(south_america)
+    real = load_protected_areas()
+    layers = ([('SAPA', real)] if real is not None else
+              [(n, protected_polygons(n, tuple(south_america.total_bounds)))
+               for n in args.polygons])
+
+    rows = []
+    for label, protected in layers:
+        footprint = dissolve_protected(protected)
+        t_exact, exact = best_of(lambda: protected_fraction(
+            south_america, footprint, 'indexed', crs=crs), args.repeat)
+        exact = exact['protected_area_total'].to_numpy()
+        country_geoms = np.asarray(reproject(south_america, crs))
+        protected_geoms = np.asarray(reproject(protected, crs))
+        for n_cells in args.cells:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                def run():
+                    return protected_fraction(
+                        south_america, protected, 'raster', crs=crs,
+                        n_cells=n_cells, cache_dir=cache_dir)
+                t_cold, _ = best_of(run, 1)
+                t_warm, out = best_of(run, args.repeat)
+            got = out['protected_area_total'].to_numpy()
+            minx, miny, maxx, maxy = reproject(south_america, crs).total_bounds
+            cell = max(maxx - minx, maxy - miny) / n_cells
+            bound = error_bound(country_geoms, protected_geoms, cell) / 10**6
+            err = np.abs(got - exact)
+            rows.append({'polygons': label, 'cells': n_cells,
+                         'cell_km': f'{cell / 1000:.2f}',
+                         'exact_s': f'{t_exact:.3f}',
+                         'cold_s': f'{t_cold:.3f}',
+                         'warm_s': f'{t_warm:.3f}',
+                         'max_err_km2': f'{err.max():.0f}',
+                         'max_bound_km2': f'{bound.max():.0f}',
+                         'rel_err': f'{err.sum() / exact.sum():.2%}'})
+            assert (err <= bound).all()
+    print_table(rows, ['polygons', 'cells', 'cell_km', 'exact_s', 'cold_s',
+                       'warm_s', 'max_err_km2', 'max_bound_km2', 'rel_err'])
+
+
+if __name__ == '__main__':
+    main()
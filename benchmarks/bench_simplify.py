@@ -0,0 +1,52 @@
+'''
+Level-of-detail simplification of synthetic bird tracks.
+
+    python -m benchmarks.bench_simplify [--fixes 10000 100000 1000000]
+                                        [--interval 1h]
+
+Times `track_lod` (tolerance in screen pixels at every zoom) and reports how
+many fixes a map draws at a few zoom levels, as a reduction ratio over
+all fixes.
+'''
+
+import argparse
+
+import pandas as pd
+
+from geobirds.simplify import lod_report, track_lod
+from geobirds.trajectory import TrajectoryStore
+from benchmarks.common import best_of, print_table
+from benchmarks.synthetic import bird_tracks
+
+ZOOMS = [3, 5, 8, 12]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--fixes', type=int, nargs='+',
+                        default=[10**4, 10**5, 10**6])
+    parser.add_argument('--tolerance-px', type=float, nargs='+',
+                        default=[1.0, 2.0])
+    parser.add_argument('--interval', default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for n in args.fixes:
+        df = bird_tracks(n)
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        store = TrajectoryStore.from_birds(df)
+        for tol in args.tolerance_px:
+            t, lod = best_of(lambda: track_lod(
+                store, tolerance_px=tol, interval=args.interval),
+                args.repeat)
+            report = lod_report(lod).set_index('zoom')['reduction']
+            row = {'fixes': n, 'tolerance_px': tol, 'lod_s': f'{t:.3f}'}
+            row.update({f'z{z}_x': f'{report[z]:.1f}' for z in ZOOMS})
+            rows.append(row)
+    print_table(rows, ['fixes', 'tolerance_px', 'lod_s']
+                + [f'z{z}_x' for z in ZOOMS])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+'''
+Cold start of the `python -m geobirds` subcommands.
+
+    python -m benchmarks.bench_startup [--repeat 5] [--record FILE]
+
+Every measurement runs in a fresh interpreter. `python_s` is an empty
+interpreter, `help_s` is `python -m geobirds CMD --help` (the CLI
+alone; the options of `render` live in `geobirds.pipeline`, so its help
+imports that), and `imports_s` is the time, inside the interpreter, to
+import the CLI and the modules CMD needs before it starts working. With
+`--record`, the results are appended to FILE as one JSON line, so the
+startup can be followed over time.
+'''
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from geobirds.cli import COMMANDS
+from benchmarks.common import print_table
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORTS = '''
+import importlib, time
+t0 = time.perf_counter()
+from geobirds.cli import COMMANDS
+for m in COMMANDS[{command!r}][1]:
+    importlib.import_module(m)
+print(time.perf_counter() - t0)
+'''
+
+
+def run(args):
+    '''
+    Run `python args` in ROOT. Return (wall time [s], stdout).
+    '''
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, *args], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return time.perf_counter() - t0, out.stdout
+
+
+def cold_start(command, repeat=5):
+    '''
+    Best of `repeat` fresh interpreters: (help_s, imports_s).
+    '''
+    help_s = min(run(['-m', 'geobirds', command, '--help'])[0]
+                 for _ in range(repeat))
+    imports_s = min(float(run(['-c', IMPORTS.format(command=command)])[1])
+                    for _ in range(repeat))
+    return help_s, imports_s
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--record', default=None)
+    args = parser.parse_args(argv)
+
+    python_s = min(run(['-c', 'pass'])[0] for _ in range(args.repeat))
+    rows = []
+    for command in COMMANDS:
+        help_s, imports_s = cold_start(command, args.repeat)
+        rows.append({'command': command, 'python_s': f'{python_s:.3f}',
+                     'help_s': f'{help_s:.3f}',
+                     'imports_s': f'{imports_s:.3f}'})
+    print_table(rows, ['command', 'python_s', 'help_s', 'imports_s'])
+
+    if args.record:
+        record = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                  'python': platform.python_version(),
+                  'commands': {r['command']: {k: float(r[k]) for k in
+                                              ('python_s', 'help_s',
+                                               'imports_s')}
+                               for r in rows}}
+        with open(args.record, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
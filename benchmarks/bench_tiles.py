@@ -0,0 +1,94 @@
+'''
+Inline GeoJSON vs. tiled level-of-detail layer for the protected areas
+map (`m_2`).
+
+    python -m benchmarks.bench_tiles [--n 4700] [--max-zoom 8]
+
+The browser is not driven here. As a proxy for the time to the first
+render we report what the browser has to download and parse before it
+can draw the initial view: the HTML file, plus for the tiled layer the
+tiles that intersect a 1024 x 500 px view at the start zoom.
+'''
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import folium
+import numpy as np
+
+from geobirds.tiles import TiledGeoJson, export_tile_pyramid, lonlat_to_tile
+from benchmarks.common import load_protected_areas, print_table
+from benchmarks.synthetic import protected_polygons
+
+CENTER = [-10.0, -60.0]
+ZOOM = 5
+
+
+def view_bytes(tile_dir, manifest, center, zoom, size=(1024, 500)):
+    '''
+    Bytes of the tiles the layer fetches for the initial view.
+    '''
+    z = min(max(zoom, manifest['min_zoom']), manifest['max_zoom'])
+    cx, cy = lonlat_to_tile(center[1], center[0], z)
+    half_x = int(np.ceil(size[0] / 2 / 256)) + 1
+    half_y = int(np.ceil(size[1] / 2 / 256)) + 1
+    have = set(manifest['tiles'][str(z)])
+    total = 0
+    for x in range(cx - half_x, cx + half_x + 1):
+        for y in range(cy - half_y, cy + half_y + 1):
+            if f'{x}/{y}' in have:
+                total += (Path(tile_dir) / str(z) / str(x)
+                          / f'{y}.geojson').stat().st_size
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--n', type=int, default=4700)
+    parser.add_argument('--max-zoom', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    protected = load_protected_areas()
+    if protected is None:
+        protected = protected_polygons(args.n)
+    style = {'fillColor': 'coral', 'stroke': False}
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+
+        t0 = time.perf_counter()
+        m = folium.Map(location=CENTER, zoom_start=ZOOM)
+        folium.GeoJson(data=protected.__geo_interface__,
+                       style_function=lambda x: style).add_to(m)
+        m.save(str(tmp / 'inline.html'))
+        t_inline = time.perf_counter() - t0
+        html = (tmp / 'inline.html').stat().st_size
+        rows.append({'layer': 'inline', 'build_s': f'{t_inline:.3f}',
+                     'html_kB': html // 1024, 'first_view_kB': html // 1024,
+                     'tiles': '-'})
+
+        t0 = time.perf_counter()
+        manifest = export_tile_pyramid(protected, tmp / 'tiles',
+                                       max_zoom=args.max_zoom)
+        t_export = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        m = folium.Map(location=CENTER, zoom_start=ZOOM)
+        TiledGeoJson(manifest, 'tiles', style=style).add_to(m)
+        m.save(str(tmp / 'tiled.html'))
+        t_tiled = time.perf_counter() - t0
+        html = (tmp / 'tiled.html').stat().st_size
+        first = html + view_bytes(tmp / 'tiles', manifest, CENTER, ZOOM)
+        rows.append({'layer': 'tiled', 'build_s': f'{t_tiled:.3f}',
+                     'html_kB': html // 1024, 'first_view_kB': first // 1024,
+                     'tiles': manifest['n_tiles']})
+        print(f'tile export: {t_export:.2f} s, '
+              f'{manifest["bytes"] // 1024} kB on disk')
+    print_table(rows, ['layer', 'build_s', 'html_kB', 'first_view_kB',
+                       'tiles'])
+
+
+if __name__ == '__main__':
+    main()
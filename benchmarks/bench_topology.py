@@ -0,0 +1,75 @@
+'''
+Shared-arc TopoJSON vs. per-polygon simplify + GeoJSON.
+
+    python -m benchmarks.bench_topology [--tolerance 0.02 0.1]
+                                        [--polygons 2000]
+
+Layers: the naturalearth countries, synthetic adjacent polygons, and the
+real SAPA layer when the course data is on disk. For every tolerance
+(degree) the table shows the time to simplify (the topology is built
+once per layer, `build_s`), the payload, and the area where neighbors
+overlap after simplification (slivers), in percent of the layer area.
+'''
+
+import argparse
+import json
+
+import numpy as np
+import shapely
+
+from geobirds.topology import Topology, topology_geoms
+from benchmarks.common import (best_of, load_protected_areas, load_world,
+                               print_table)
+from benchmarks.synthetic import adjacent_polygons
+
+
+def overlap_pct(geoms):
+    geoms = shapely.make_valid(geoms[~shapely.is_missing(geoms)])
+    total = shapely.area(geoms).sum()
+    return 100 * (total - shapely.area(shapely.union_all(geoms))) / total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tolerance', type=float, nargs='+',
+                        default=[0.02, 0.1])
+    parser.add_argument('--polygons', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    layers = [('world', load_world()),
+              (f'adjacent {args.polygons}', adjacent_polygons(args.polygons))]
+    real = load_protected_areas()
+    if real is not None:
+        layers.append(('SAPA', real))
+
+    rows = []
+    for label, gdf in layers:
+        t_build, topo = best_of(lambda: Topology(gdf), args.repeat)
+        for tol in args.tolerance:
+            t_topo, tj = best_of(lambda: json.dumps(
+                topo.to_topojson(tol), separators=(',', ':')), args.repeat)
+            t_poly, gj = best_of(lambda: gdf[['geometry']].set_geometry(
+                gdf.simplify(tol, preserve_topology=False)).to_json(),
+                args.repeat)
+            simple = np.asarray(gdf.simplify(tol, preserve_topology=False))
+            decoded = topology_geoms(json.loads(tj))
+            rows.append({
+                'layer': label, 'tolerance': tol,
+                'vertices': len(shapely.get_coordinates(
+                    np.asarray(gdf.geometry))),
+                'arc_vertices': topo.n_vertices,
+                'build_s': f'{t_build:.3f}',
+                'topojson_s': f'{t_topo:.3f}',
+                'geojson_s': f'{t_poly:.3f}',
+                'topojson_KB': len(tj) // 1024,
+                'geojson_KB': len(gj) // 1024,
+                'topo_overlap_%': f'{overlap_pct(decoded):.3f}',
+                'poly_overlap_%': f'{overlap_pct(simple):.3f}'})
+    print_table(rows, ['layer', 'tolerance', 'vertices', 'arc_vertices',
+                       'build_s', 'topojson_s', 'geojson_s', 'topojson_KB',
+                       'geojson_KB', 'topo_overlap_%', 'poly_overlap_%'])
+
+
+if __name__ == '__main__':
+    main()
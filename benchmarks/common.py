@@ -0,0 +1,58 @@
+'''
+Helpers shared by the benchmark scripts.
+'''
+
+import time
+from pathlib import Path
+
+import geopandas as gpd
+
+DATA_DIR = '../input/geospatial-learn-course-data/'
+PROTECTED_SHP = ('SAPA_Aug2019-shapefile/SAPA_Aug2019-shapefile/'
+                 'SAPA_Aug2019-shapefile-polygons.shp')
+
+
+def best_of(func, repeat=3):
+    '''
+    Run `func` `repeat` times. Return (best wall time [s], last result).
+    '''
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def load_world():
+    return gpd.read_file(gpd.datasets.get_path('naturalearth_lowres'))
+
+
+def load_south_america():
+    world = load_world()
+    return world[world['continent'] == 'South America'].reset_index(drop=True)
+
+
+def load_protected_areas(data_dir=DATA_DIR):
+    '''
+    The real SAPA layer if the course data is on disk, otherwise None.
+    '''
+    path = Path(data_dir) / PROTECTED_SHP
+    if not path.exists():
+        return None
+    protected_areas = gpd.read_file(path)
+    protected_areas['geometry'] = protected_areas['geometry'].simplify(
+        0.02, preserve_topology=False)
+    return protected_areas[protected_areas['MARINE'] != '2'].reset_index(
+        drop=True)
+
+
+def print_table(rows, columns):
+    '''
+    rows    : list of dict
+    columns : keys to show, in order
+    '''
+    width = [max(len(c), *(len(f'{r[c]}') for r in rows)) for c in columns]
+    print('  '.join(c.rjust(w) for c, w in zip(columns, width)))
+    for r in rows:
+        print('  '.join(f'{r[c]}'.rjust(w) for c, w in zip(columns, width)))
@@ -0,0 +1,360 @@
+'''
+Benchmark suite of the stages of the script, with a baseline file and a
+regression check.
+
+    python -m benchmarks.suite [--scale small|medium|large] [--seed 0]
+                               [--repeat 3] [--memory] [--out FILE]
+                               [--baseline FILE] [--update-baseline]
+                               [--tolerance 0.25]
+
+Every scale writes a seeded synthetic tracking CSV (`bird_tracks`) and
+WDPA-like layer (`protected_polygons`) to a temporary directory, with
+synthetic countries (`adjacent_polygons`), so nothing is downloaded.
+The stages then run in this order, in a fresh process per scale:
+
+    csv_load       : read_tracks of the CSV
+    points_from_xy : `birds` GeoDataFrame of the fixes
+    simplify       : protected areas simplified as in the script
+    to_crs         : protected areas and fixes to the equal-area CRS
+    overlay        : protected area per country (`protected_fraction`)
+    folium_html    : track map and protected area map, written
+    plotly_html    : the two bar plots, written
+
+Each stage runs `--repeat` times (`--only` measures some of them; the
+others still run once, for their outputs) under `geobirds.profiling`;
+the result keeps the best wall and CPU time and the largest memory
+figures (peak RSS, its growth in the stage and, with --memory, the peak
+of the Python allocations).
+
+`--out` writes the results as JSON (scale, seed, versions and machine,
+stages). With `--baseline FILE`, every stage is compared with the same
+stage there: `slower` when the wall time grew by more than `--tolerance`
+(and by more than 50 ms), `more memory` when the RSS growth did (and by
+more than 16 MB). The exit status is 1 if any stage regressed. Both
+runs need `--repeat` 3 or more, since single runs are too noisy.
+`--update-baseline` writes the results to the baseline file instead.
+
+`benchmarks/baseline.json` is the small scale on the machine it was
+recorded on (see its `environment`); on another machine record a
+baseline there first.
+'''
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+SCALES = {'small': {'fixes': 20_000, 'birds': 11, 'polygons': 1000,
+                    'countries': 13},
+          'medium': {'fixes': 500_000, 'birds': 50, 'polygons': 4700,
+                     'countries': 13},
+          'large': {'fixes': 5_000_000, 'birds': 200, 'polygons': 20_000,
+                    'countries': 50}}
+IMPORTS = ['geobirds.birds', 'geobirds.figures', 'geobirds.overlay',
+           'geobirds.stages']
+VERSIONS = ['numpy', 'pandas', 'geopandas', 'shapely', 'pyproj', 'folium',
+            'plotly']
+# | Changes below these are noise, whatever the ratio.
+MIN_DELTA_S = 0.05
+MIN_DELTA_MB = 16.0
+# | The best of fewer runs varies by more than the default tolerance
+# | (two single runs of the same code differed by 26 %).
+MIN_REPEAT = 3
+
+STAGES = {}
+
+
+def suite_stage(name):
+    '''
+    Decorator: `func(data)` is stage `name` of the suite. It reads its
+    inputs from and puts its outputs into the dict `data`, and returns
+    the number of rows (or geometries) it handled.
+    '''
+    def register(func):
+        STAGES[name] = func
+        return func
+    return register
+
+
+@suite_stage('csv_load')
+def _csv_load(data):
+    from geobirds.birds import read_tracks
+    data['tracks'] = read_tracks(data['csv'])
+    return data['tracks'].n_fixes
+
+
+@suite_stage('points_from_xy')
+def _points_from_xy(data):
+    import geopandas as gpd
+    from geobirds.stages import color_birds
+    from geobirds.trajectory import ID, LAT, LON, TIME
+
+    tracks = data['tracks']
+    birds = gpd.GeoDataFrame(
+        {TIME: tracks.t, LON: tracks.lon, LAT: tracks.lat,
+         ID: tracks.ids[tracks.bird_of_fix()]},
+        geometry=gpd.points_from_xy(tracks.lon, tracks.lat), crs='EPSG:4326')
+    data['birds'] = color_birds(birds)
+    return len(birds)
+
+
+@suite_stage('simplify')
+def _simplify(data):
+    protected = data['protected_raw'].copy()
+    protected['geometry'] = protected.simplify(0.02, preserve_topology=False)
+    data['protected'] = protected[protected['MARINE'] != '2']
+    return len(protected)
+
+
+@suite_stage('to_crs')
+def _to_crs(data):
+    from geobirds.area import equal_area_crs
+
+    data['crs'] = equal_area_crs(data['countries'])
+    data['protected_ea'] = data['protected'].to_crs(data['crs'])
+    data['birds_ea'] = data['birds'].to_crs(data['crs'])
+    return len(data['protected_ea']) + len(data['birds_ea'])
+
+
+@suite_stage('overlay')
+def _overlay(data):
+    from geobirds.overlay import protected_fraction
+
+    out = protected_fraction(data['countries'], data['protected'],
+                             crs=data['crs'])
+    out['non_protected_area_total'] = (out['area_total']
+                                       - out['protected_area_total'])
+    data['fraction'] = out
+    return len(data['protected'])
+
+
+@suite_stage('folium_html')
+def _folium_html(data):
+    from geobirds.figures import protected_map, save, track_map
+
+    birds = data['birds']
+    center = [birds['location-lat'].mean(), birds['location-long'].mean()]
+    out = Path(data['tmp'])
+    size = save(track_map(data['countries'], birds, center), out / 'm_1.html')
+    size += save(protected_map(data['protected'], center, tiled=False),
+                 out / 'm_2.html')
+    data['folium_bytes'] = size
+    return len(birds) + len(data['protected'])
+
+
+@suite_stage('plotly_html')
+def _plotly_html(data):
+    from geobirds.figures import area_bar, fraction_bar, save
+
+    fraction = data['fraction']
+    p_frac = float(fraction['protected_area_total'].sum()
+                   / fraction['area_total'].sum())
+    out = Path(data['tmp'])
+    data['plotly_bytes'] = (save(fraction_bar(fraction, p_frac),
+                                 out / 'p_1.html')
+                            + save(area_bar(fraction), out / 'p_2.html'))
+    return len(fraction)
+
+
+def make_inputs(tmp, scale, seed):
+    '''
+    The synthetic inputs of `scale` (a dict of SCALES) in `tmp`.
+    '''
+    from benchmarks.synthetic import (adjacent_polygons, bird_tracks,
+                                      protected_polygons)
+
+    csv = Path(tmp) / 'tracks.csv'
+    bird_tracks(scale['fixes'], n_birds=scale['birds'],
+                seed=seed).to_csv(csv, index=False)
+    countries = adjacent_polygons(scale['countries'], segment=0.05,
+                                  seed=seed).rename(columns={'NAME': 'name'})
+    return {'tmp': str(tmp), 'csv': str(csv), 'countries': countries,
+            'protected_raw': protected_polygons(scale['polygons'],
+                                                seed=seed)}
+
+
+def run_scale(scale, seed=0, repeat=3, memory=False, only=None):
+    '''
+    Run the stages (all, or those in `only`) on the inputs of `scale`.
+    Return {stage: measures}.
+    '''
+    from geobirds import profiling
+
+    # | Imported up front, so that no stage pays for (or counts the memory
+    # | of) importing them.
+    for module in IMPORTS:
+        importlib.import_module(module)
+    with tempfile.TemporaryDirectory() as tmp:
+        data = make_inputs(tmp, scale, seed)
+        log = Path(tmp) / 'profile.jsonl'
+        profiling.enable(log, memory=memory)
+        for name, func in STAGES.items():
+            if only and name not in only:
+                # | Not measured, but later stages need its outputs.
+                func(data)
+                continue
+            for _ in range(repeat):
+                with profiling.stage(name) as rec:
+                    rec['rows'] = func(data)
+        profiling.disable()
+        records = profiling.read_records(log)
+
+    stages = {}
+    for r in records:
+        s = stages.setdefault(r['stage'], {'runs': 0, 'rows': r['rows']})
+        s['runs'] += 1
+        for k in ('wall_s', 'cpu_s'):
+            s[k] = min(s.get(k, float('inf')), r[k])
+        for k in ('peak_rss_mb', 'rss_growth_mb', 'alloc_peak_mb'):
+            if k in r:
+                s[k] = max(s.get(k, 0.0), r[k])
+    return stages
+
+
+def environment():
+    from importlib.metadata import PackageNotFoundError, version
+
+    versions = {}
+    for package in VERSIONS:
+        try:
+            versions[package] = version(package)
+        except PackageNotFoundError:
+            versions[package] = None
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'versions': versions}
+
+
+def run_suite(scale='small', seed=0, repeat=3, memory=False, only=None):
+    '''
+    `run_scale` in a fresh process, so that its memory figures are its
+    own. Return the results (what --out writes).
+    '''
+    with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+        stages = pool.submit(run_scale, SCALES[scale], seed, repeat, memory,
+                             only).result()
+    return {'scale': scale, 'params': SCALES[scale], 'seed': seed,
+            'repeat': repeat, 'memory': memory, 'environment': environment(),
+            'stages': stages}
+
+
+def compare(results, baseline, tolerance=0.25):
+    '''
+    One row per stage of `results` and `baseline`, with the ratios of
+    wall time and RSS growth and a `status`: ok, faster, slower, more
+    memory, new (not in the baseline) or missing (only in the
+    baseline).
+    '''
+    rows = []
+    old, new = baseline['stages'], results['stages']
+    for name in list(new) + [s for s in old if s not in new]:
+        row = {'stage': name, 'wall_s': '-', 'base_wall_s': '-',
+               'wall_ratio': '-', 'rss_growth_mb': '-',
+               'base_rss_growth_mb': '-', 'status': 'ok'}
+        if name not in old or name not in new:
+            row['status'] = 'new' if name in new else 'missing'
+            rows.append(row)
+            continue
+        a, b = new[name], old[name]
+        status = []
+        if (a['wall_s'] > b['wall_s'] * (1 + tolerance)
+                and a['wall_s'] - b['wall_s'] > MIN_DELTA_S):
+            status.append('slower')
+        elif (a['wall_s'] < b['wall_s'] / (1 + tolerance)
+                and b['wall_s'] - a['wall_s'] > MIN_DELTA_S):
+            status.append('faster')
+        if (a['rss_growth_mb'] > b['rss_growth_mb'] * (1 + tolerance)
+                and a['rss_growth_mb'] - b['rss_growth_mb'] > MIN_DELTA_MB):
+            status.append('more memory')
+        row.update(wall_s=f"{a['wall_s']:.3f}",
+                   base_wall_s=f"{b['wall_s']:.3f}",
+                   wall_ratio=f"{a['wall_s'] / max(b['wall_s'], 1e-9):.2f}",
+                   rss_growth_mb=f"{a['rss_growth_mb']:.0f}",
+                   base_rss_growth_mb=f"{b['rss_growth_mb']:.0f}",
+                   status=', '.join(status) or 'ok')
+        rows.append(row)
+    return rows
+
+
+def regressed(rows):
+    return [r['stage'] for r in rows
+            if 'slower' in r['status'] or 'more memory' in r['status']]
+
+
+def _write_json(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(data, indent=2))
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    from benchmarks.common import print_table
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scale', choices=list(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--memory', action='store_true',
+                        help='also trace Python allocations (slower)')
+    parser.add_argument('--only', nargs='+', choices=list(STAGES),
+                        default=None)
+    parser.add_argument('--out', default=None, help='write the results here')
+    parser.add_argument('--baseline', default=None,
+                        help='results to compare with')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='write the results to --baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.scale, args.seed, args.repeat, args.memory,
+                        args.only)
+    rows = [{'stage': name, **{k: (f'{v:.3f}' if isinstance(v, float)
+                                   else v) for k, v in s.items()}}
+            for name, s in results['stages'].items()]
+    columns = ['stage', 'rows', 'wall_s', 'cpu_s', 'peak_rss_mb',
+               'rss_growth_mb'] + (['alloc_peak_mb'] if args.memory else [])
+    print_table(rows, columns)
+    if args.out:
+        _write_json(args.out, results)
+
+    if not args.baseline:
+        return
+    if args.update_baseline or not Path(args.baseline).exists():
+        _write_json(args.baseline, results)
+        print(f'baseline written to {args.baseline}')
+        return
+    baseline = json.loads(Path(args.baseline).read_text())
+    # | tracemalloc (--memory) slows every stage down, so it must match too.
+    for key in ('scale', 'seed', 'memory'):
+        if baseline.get(key) != results[key]:
+            parser.error(f'baseline has {key} {baseline.get(key)!r}, '
+                         f'this run {results[key]!r}')
+    repeat = min(baseline.get('repeat', 1), results['repeat'])
+    if repeat < MIN_REPEAT:
+        parser.error(f'comparing needs --repeat {MIN_REPEAT} or more in '
+                     f'both runs (baseline {baseline.get("repeat")}, '
+                     f'this run {results["repeat"]})')
+    if baseline['environment'] != results['environment']:
+        print('note: the baseline was recorded with other versions or on '
+              'another machine')
+    print()
+    table = compare(results, baseline, args.tolerance)
+    print_table(table, ['stage', 'wall_s', 'base_wall_s', 'wall_ratio',
+                        'rss_growth_mb', 'base_rss_growth_mb', 'status'])
+    if regressed(table):
+        print(f"regressions: {', '.join(regressed(table))}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
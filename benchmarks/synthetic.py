@@ -0,0 +1,119 @@
+'''
+Seeded synthetic tracking tables and protected area layers for offline
+benchmarks.
+'''
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+
+def protected_polygons(n, bounds=(-82.0, -56.0, -34.0, 13.0),
+                       radius=(0.05, 1.0), n_vertex=24, seed=0):
+    '''
+    WDPA-like layer of `n` irregular polygons scattered in `bounds`
+    (minx, miny, maxx, maxy), with the REP_AREA / REP_M_AREA / MARINE
+    columns the notebook uses and a handful of the other WDPA attribute
+    columns (names, designations, codes).
+    '''
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = bounds
+    cx = rng.uniform(minx, maxx, n)
+    cy = rng.uniform(miny, maxy, n)
+    r = np.exp(rng.uniform(np.log(radius[0]), np.log(radius[1]), n))
+
+    theta = np.linspace(0, 2 * np.pi, n_vertex, endpoint=False)
+    jitter = rng.uniform(0.6, 1.0, (n, n_vertex))
+    x = cx[:, None] + r[:, None] * jitter * np.cos(theta)
+    y = cy[:, None] + r[:, None] * jitter * np.sin(theta)
+    ring = np.stack([x, y], axis=-1)
+    ring = np.concatenate([ring, ring[:, :1]], axis=1)
+    geoms = shapely.polygons(ring)
+
+    area = shapely.area(geoms) * 111.0 ** 2
+    marine = rng.choice(np.array(['0', '1', '2']), n, p=[0.85, 0.1, 0.05])
+    m_area = np.where(marine == '0', 0.0, area * rng.uniform(0, 1, n))
+    attrs = {
+        'WDPAID': np.arange(1, n + 1),
+        'NAME': [f'Protected area {i}' for i in range(n)],
+        'DESIG_ENG': rng.choice(np.array(['National Park', 'Indigenous Area',
+                                          'Forest Reserve',
+                                          'Ecological Station',
+                                          'Sustainable Use Area']), n),
+        'DESIG_TYPE': rng.choice(np.array(['National', 'International']), n),
+        'IUCN_CAT': rng.choice(np.array(['Ia', 'Ib', 'II', 'III', 'IV', 'V',
+                                         'VI', 'Not Reported']), n),
+        'MARINE': marine,
+        'REP_M_AREA': m_area,
+        'GIS_M_AREA': m_area,
+        'REP_AREA': area,
+        'GIS_AREA': area,
+        'STATUS': rng.choice(np.array(['Designated', 'Proposed']), n),
+        'STATUS_YR': rng.integers(1930, 2020, n),
+        'ISO3': rng.choice(np.array(['BRA', 'ARG', 'COL', 'PER', 'VEN',
+                                     'BOL', 'CHL', 'ECU', 'PRY', 'URY',
+                                     'GUY', 'SUR']), n),
+    }
+    return gpd.GeoDataFrame(attrs, geometry=geoms, crs='EPSG:4326')
+
+
+def adjacent_polygons(n, bounds=(-82.0, -56.0, -34.0, 13.0), segment=0.01,
+                      seed=0):
+    '''
+    Layer of `n` polygons that tile `bounds` (Voronoi cells) with wiggly
+    shared borders, ~one vertex per `segment` degree. Every vertex is
+    moved by a function of its position, so both sides of a border stay
+    identical, as in country and WDPA layers.
+    '''
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = bounds
+    points = shapely.multipoints(np.column_stack([rng.uniform(minx, maxx, n),
+                                                  rng.uniform(miny, maxy, n)]))
+    frame = shapely.box(*bounds)
+    cells = shapely.get_parts(shapely.voronoi_polygons(points,
+                                                       extend_to=frame))
+    cells = shapely.segmentize(shapely.intersection(cells, frame), segment)
+
+    def wiggle(xy):
+        dx = 0.3 * segment * np.sin(xy[:, 1] * 7.0 + xy[:, 0] * 3.0)
+        dy = 0.3 * segment * np.cos(xy[:, 0] * 5.0 - xy[:, 1] * 2.0)
+        return xy + np.column_stack([dx, dy])
+    cells = shapely.transform(cells, wiggle)
+    return gpd.GeoDataFrame({'WDPAID': np.arange(1, len(cells) + 1),
+                             'NAME': [f'Protected area {i}'
+                                      for i in range(len(cells))]},
+                            geometry=cells, crs='EPSG:4326')
+
+
+def bird_tracks(n_fixes, n_birds=11, start='2014-08-15', seed=0):
+    '''
+    Movebank-style tracking table with the columns of purple_martin.csv:
+    `n_fixes` fixes in total, spread over `n_birds` tags that fly from
+    the eastern US to the southeast Amazon, in time order per bird.
+    '''
+    rng = np.random.default_rng(seed)
+    tag = np.sort(rng.integers(0, n_birds, n_fixes))
+    counts = np.bincount(tag, minlength=n_birds)
+    offsets = np.r_[0, np.cumsum(counts)]
+    # | Position along the route of every fix: 0 at the start, 1 at the end.
+    rank = np.arange(n_fixes) - offsets[tag]
+    s = rank / np.maximum(counts[tag] - 1, 1)
+
+    lon0 = rng.uniform(-90, -75, n_birds)[tag]
+    lat0 = rng.uniform(30, 45, n_birds)[tag]
+    lon1 = rng.uniform(-62, -45, n_birds)[tag]
+    lat1 = rng.uniform(-15, -3, n_birds)[tag]
+    wiggle = np.sin(np.pi * s) * rng.uniform(-8, 8, n_birds)[tag]
+    lon = lon0 + (lon1 - lon0) * s + wiggle + rng.normal(0, 0.05, n_fixes)
+    lat = lat0 + (lat1 - lat0) * s + rng.normal(0, 0.05, n_fixes)
+
+    # | ~150 days per bird, whatever the number of fixes.
+    step = 150 * 86400 / np.maximum(counts[tag], 1)
+    seconds = (rank + rng.uniform(0, 0.5, n_fixes)) * step
+    timestamp = (np.datetime64(start, 's')
+                 + seconds.astype('timedelta64[s]'))
+    return pd.DataFrame({'timestamp': timestamp,
+                         'location-long': lon,
+                         'location-lat': lat,
+                         'tag-local-identifier': 30000 + tag})
@@ -0,0 +1,11 @@
+'''
+Reusable pieces of the purple martin / protected area exercise.
+
+The notebook script `exercise-coordinate-reference-systems.py` imports
+the stages from here. Submodules are imported on demand so that loading
+the package itself stays cheap.
+'''
+
+# | Where the course data is extracted, relative to the working directory
+# | of the notebook. Here so that `geobirds.cli` needs no submodule.
+DATA_DIR = '../input/geospatial-learn-course-data/'
@@ -0,0 +1,3 @@
+from geobirds.cli import main
+
+main()
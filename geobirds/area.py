@@ -0,0 +1,196 @@
+'''
+Areas in square kilometers.
+
+- `transformer` keeps the pyproj Transformers, which are expensive to
+  create, for reuse.
+- `reproject` projects the geometries of a GeoDataFrame with them, and
+  remembers the result per frame, source and target CRS, so that every
+  layer is projected at most once per CRS.
+- `equal_area_crs` picks an equal-area projection for a region. EPSG:3035
+  (LAEA Europe) is fine for Europe, but not for South America.
+- `geodesic_area_km2` computes areas on the WGS 84 ellipsoid for all
+  rings of all geometries in one vectorized pass, without projecting.
+'''
+
+import weakref
+from functools import lru_cache
+
+import numpy as np
+import pyproj
+import shapely
+import geopandas as gpd
+
+# | Equal-area projections by continent (the `continent` column of the
+# | naturalearth world map).
+REGION_CRS = {
+    'South America': 'ESRI:102033',  # South America Albers equal-area conic
+    'North America': 'ESRI:102008',  # North America Albers equal-area conic
+    'Europe': 'EPSG:3035',           # LAEA Europe
+    'Africa': 'ESRI:102022',         # Africa Albers equal-area conic
+    'Asia': 'ESRI:102025',           # Asia North Albers equal-area conic
+    'World': 'ESRI:54009',           # Mollweide
+}
+
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+
+
+@lru_cache(maxsize=None)
+def _crs(text):
+    return pyproj.CRS.from_user_input(text)
+
+
+def crs_key(crs):
+    '''
+    Hashable, canonical form of a CRS given as anything pyproj accepts.
+    '''
+    if isinstance(crs, pyproj.CRS):
+        return crs.to_wkt()
+    return _crs(crs if isinstance(crs, str) else str(crs)).to_wkt()
+
+
+@lru_cache(maxsize=None)
+def _transformer(src_wkt, dst_wkt):
+    return pyproj.Transformer.from_crs(src_wkt, dst_wkt, always_xy=True)
+
+
+def transformer(src, dst):
+    '''
+    Cached `pyproj.Transformer` from `src` to `dst` (x = longitude).
+    '''
+    return _transformer(crs_key(src), crs_key(dst))
+
+
+def transform_geoms(geoms, src, dst):
+    '''
+    Project an array of shapely geometries from `src` to `dst`; all the
+    coordinates go through the transformer in one call.
+    '''
+    t = transformer(src, dst)
+
+    def project(xy):
+        x, y = t.transform(xy[:, 0], xy[:, 1])
+        return np.column_stack([x, y])
+    return shapely.transform(np.asarray(geoms), project)
+
+
+# | (id of the frame, its CRS, target CRS) -> (weak reference to the
+# | geometry array that was projected, projected GeoSeries)
+_reprojected = {}
+
+
+def reproject(gdf, crs):
+    '''
+    Geometries of `gdf` in `crs` as a GeoSeries (same index).
+
+    The result is remembered as long as `gdf` lives and neither its
+    geometry column nor its CRS is replaced, so asking again for the
+    same CRS is free.
+    '''
+    if gdf.crs is None:
+        raise ValueError('cannot reproject a layer without CRS')
+    geometry = gdf.geometry.values
+    src = crs_key(gdf.crs)
+    key = (id(gdf), src, crs_key(crs))
+    hit = _reprojected.get(key)
+    if hit is not None and hit[0]() is geometry:
+        return hit[1]
+
+    if src == key[2]:
+        projected = gdf.geometry
+    else:
+        projected = gpd.GeoSeries(transform_geoms(geometry, gdf.crs, crs),
+                                  index=gdf.index, crs=crs)
+    _reprojected[key] = (weakref.ref(geometry), projected)
+    weakref.finalize(gdf, _reprojected.pop, key, None)
+    return projected
+
+
+def local_equal_area_crs(gdf):
+    '''
+    Lambert azimuthal equal-area projection centered on the layer.
+    '''
+    minx, miny, maxx, maxy = reproject(gdf, 'EPSG:4326').total_bounds
+    return (f'+proj=laea +lat_0={(miny + maxy) / 2:.4f} '
+            f'+lon_0={(minx + maxx) / 2:.4f} +datum=WGS84 +units=m')
+
+
+def equal_area_crs(gdf, region=None):
+    '''
+    Equal-area CRS for `gdf`.
+
+    region : key of REGION_CRS. Without it, a layer within one continent
+             in the `continent` column gets that continent's projection,
+             a layer spanning more than ~half the globe gets Mollweide,
+             and anything else a LAEA centered on the layer.
+    '''
+    if region is None and 'continent' in gdf:
+        continents = gdf['continent'].unique()
+        if len(continents) == 1:
+            region = continents[0]
+    if region in REGION_CRS:
+        return REGION_CRS[region]
+
+    minx, miny, maxx, maxy = reproject(gdf, 'EPSG:4326').total_bounds
+    if maxx - minx > 180 or maxy - miny > 90:
+        return REGION_CRS['World']
+    return local_equal_area_crs(gdf)
+
+
+def area_km2(gdf, crs=None):
+    '''
+    Area of every geometry of `gdf` in km^2, computed in `crs` (default:
+    `equal_area_crs`).
+    '''
+    crs = crs or equal_area_crs(gdf)
+    return shapely.area(np.asarray(reproject(gdf, crs))) / 10**6
+
+
+def _authalic(lat):
+    '''
+    Authalic latitude [rad] of geodetic latitude [rad] on WGS 84, and the
+    radius of the authalic sphere [m].
+    '''
+    e2 = WGS84_F * (2 - WGS84_F)
+    e = np.sqrt(e2)
+
+    def q(s):
+        return (1 - e2) * (s / (1 - e2 * s**2)
+                           - np.log((1 - e * s) / (1 + e * s)) / (2 * e))
+    q_p = q(1.0)
+    beta = np.arcsin(np.clip(q(np.sin(lat)) / q_p, -1, 1))
+    return beta, WGS84_A * np.sqrt(q_p / 2)
+
+
+def geodesic_area_km2(gdf):
+    '''
+    Area [km^2] of every geometry of `gdf` on the WGS 84 ellipsoid.
+
+    Latitudes are mapped to the authalic sphere (same areas as the
+    ellipsoid), where the area of a ring is the line integral
+    R^2 / 2 * sum (lon2 - lon1) (sin lat1 + sin lat2) over its edges.
+    This is exact for edges along meridians and parallels. For the
+    naturalearth countries it agrees with pyproj.Geod to 0.01 % (median),
+    0.5 % at worst for small countries with long straight borders, since
+    Geod follows geodesics between the vertices. Rings around a pole
+    (Antarctica) are not supported.
+    '''
+    geoms = shapely.normalize(np.asarray(reproject(gdf, 'EPSG:4326')))
+    parts, i_geom = shapely.get_parts(geoms, return_index=True)
+    rings, i_part = shapely.get_rings(parts, return_index=True)
+    xy, i_ring = shapely.get_coordinates(rings, return_index=True)
+
+    lon = np.radians(xy[:, 0])
+    beta, radius = _authalic(np.radians(xy[:, 1]))
+    same = i_ring[1:] == i_ring[:-1]
+    dlon = np.diff(lon)
+    # | Edges crossing the antimeridian.
+    dlon = (dlon + np.pi) % (2 * np.pi) - np.pi
+    edge = dlon * (np.sin(beta[1:]) + np.sin(beta[:-1]))
+    ring_area = np.bincount(i_ring[1:][same], weights=edge[same],
+                            minlength=len(rings)) * radius**2 / 2
+    # | normalize() makes exteriors clockwise (positive here) and holes
+    # | counter-clockwise (negative).
+    area = np.bincount(i_geom[i_part], weights=ring_area,
+                       minlength=len(geoms))
+    return area / 10**6
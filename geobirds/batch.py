@@ -0,0 +1,263 @@
+'''
+Batch runs of many tracking files (species) against one set of
+reference layers.
+
+    python -m geobirds.batch TRACKS.csv ... [--data-dir DIR]
+                             [--out-dir DIR] [--workers N] [--no-maps]
+                             [--tiles]
+
+The protected areas and the world borders are loaded, repaired and
+indexed (STR-trees) once, in `ReferenceLayers`, and with `--tiles` the
+tiles of the protected areas are exported once. The worker processes are forked
+after that, so they share the layers and the trees read-only
+(copy-on-write, nothing is pickled); where fork is not available every
+worker loads them once, from the on-disk cache. Every tracking CSV is
+then one job, which writes to the output directory
+
+    SPECIES.json : fixes, birds, fixes in protected areas (per bird and
+                   in total), fixes per country and the days spent in
+                   every country, inside and outside protected areas
+    SPECIES.html : the tracks over the protected areas (embedded, or
+                   the shared tiles with `--tiles`, which have to be
+                   served over HTTP)
+
+SPECIES is the file name without .csv. `batch.json` records the time to
+load the reference layers, every job, and the throughput in jobs per
+minute.
+'''
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_all_start_methods, get_context
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from geobirds.birds import read_tracks
+from geobirds.dwell import AT_SEA, country_dwell, dwell_table, fix_days
+from geobirds.figures import protected_map, save
+from geobirds.geometry import valid_geoms
+from geobirds.stages import (DATA_DIR, americas_bbox, color_birds,
+                             load_protected, load_world)
+from geobirds.tiles import export_tile_pyramid
+from geobirds.trajectory import ID, TrajectoryStore
+
+TILES = 'protected_areas'
+
+
+class ReferenceLayers:
+    '''
+    protected : GeoDataFrame of the protected areas (EPSG:4326)
+    world     : GeoDataFrame of the country borders with a `name` column
+                (EPSG:4326), or None
+    '''
+
+    def __init__(self, protected, world=None):
+        self.protected = protected
+        self.polygons = valid_geoms(protected)
+        self.tree = shapely.STRtree(self.polygons)
+        self.world = world
+        if world is not None:
+            self.country_names = world['name'].to_numpy()
+            self.country_tree = shapely.STRtree(valid_geoms(world))
+        self.tiles = None
+
+    @classmethod
+    def load(cls, data_dir=DATA_DIR):
+        '''
+        The land protected areas of the course data and the
+        naturalearth countries. The protected areas are loaded with the
+        arguments of the script (bbox of the Americas, compact dtypes),
+        so both use the same cache entry.
+        '''
+        world = load_world()
+        protected = load_protected(data_dir, bbox=americas_bbox(world),
+                                   land_only=True)
+        return cls(protected, world)
+
+    def export_tiles(self, out_dir):
+        self.tiles = export_tile_pyramid(self.protected,
+                                         Path(out_dir) / 'tiles' / TILES)
+        return self.tiles
+
+    def n_protected(self, points):
+        '''
+        Number of protected areas that contain each point.
+        '''
+        i_point, _ = self.tree.query(points, predicate='intersects')
+        return np.bincount(i_point, minlength=len(points))
+
+    def country(self, points):
+        '''
+        Name of the country of each point ('' at sea).
+        '''
+        out = np.full(len(points), '', dtype=object)
+        if self.world is not None:
+            i_point, i_country = self.country_tree.query(
+                points, predicate='intersects')
+            out[i_point[::-1]] = self.country_names[i_country[::-1]]
+        return out
+
+
+def species_stats(birds, reference, species):
+    '''
+    Overlap of the fixes of one tracking file with the reference layers.
+    '''
+    points = np.asarray(birds.geometry)
+    inside = reference.n_protected(points) > 0
+    # | `fix_days` gives the days in the order of the store (by bird, in
+    # | time order); put them back onto the rows of `birds`.
+    store = TrajectoryStore.from_birds(birds.reset_index(drop=True))
+    days = np.empty(len(birds))
+    days[store.index] = fix_days(store)
+    df = pd.DataFrame({'bird': birds[ID].to_numpy(),
+                       'inside': inside,
+                       'country': reference.country(points)})
+    per_bird = df.groupby('bird')['inside'].agg(fixes='size',
+                                                in_protected='sum')
+    per_bird['frac_in_protected'] = (per_bird['in_protected']
+                                     / per_bird['fixes'])
+    countries = df.loc[df['country'] != '', 'country'].value_counts()
+    dwell = country_dwell(dwell_table(df['bird'].to_numpy(),
+                                      df['country'].to_numpy(), inside,
+                                      days))
+    dwell = dwell[dwell['country'] != AT_SEA].set_index('country')
+    return {'species': species,
+            'n_birds': int(len(per_bird)),
+            'n_fixes': int(len(df)),
+            'fixes_in_protected': int(inside.sum()),
+            'frac_in_protected': float(inside.mean()) if len(df) else 0.0,
+            'birds': json.loads(per_bird.reset_index().to_json(
+                orient='records')),
+            'countries': {k: int(v) for k, v in countries.items()},
+            'dwell_days': {k: {'days': float(r['dwell_days']),
+                               'protected_days': float(r['protected_days'])}
+                           for k, r in dwell.iterrows()}}
+
+
+def run_job(path, out_dir, reference=None, maps=True, seed=0,
+            tiled=False):
+    '''
+    One tracking CSV: write SPECIES.json (and SPECIES.html, over the
+    tiles of `reference` if `tiled`). Return the job record for
+    batch.json.
+    '''
+    reference = reference or _WORKER['reference']
+    out_dir = Path(out_dir)
+    species = Path(path).stem
+    t0 = time.perf_counter()
+    tracks = read_tracks(path)
+    birds = color_birds(tracks.to_birds(), seed)
+    stats = species_stats(birds, reference, species)
+    stats_path = out_dir / f'{species}.json'
+    tmp = stats_path.with_name(stats_path.name + '.tmp')
+    tmp.write_text(json.dumps(stats, indent=1))
+    os.replace(tmp, stats_path)
+    if maps:
+        center = [birds['location-lat'].mean(), birds['location-long'].mean()]
+        m = protected_map(reference.protected, center, birds=birds,
+                          tiled=tiled, out_dir=out_dir, name=TILES,
+                          manifest=reference.tiles)
+        save(m, out_dir / f'{species}.html')
+    return {'species': species, 'path': str(path), 'n_fixes': tracks.n_fixes,
+            'seconds': time.perf_counter() - t0, 'pid': os.getpid()}
+
+
+# | Set in the parent before the workers are forked (then inherited), or
+# | by `_init_worker` in a spawned worker.
+_WORKER = {}
+
+
+def _init_worker(data_dir, tiles):
+    if 'reference' not in _WORKER:
+        _WORKER['reference'] = ReferenceLayers.load(data_dir)
+        _WORKER['reference'].tiles = tiles
+
+
+def _write_manifest(out_dir, manifest):
+    path = out_dir / 'batch.json'
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, path)
+
+
+def run_batch(paths, out_dir='.', data_dir=DATA_DIR, workers=None,
+              maps=True, reference=None, tiled=False):
+    '''
+    paths     : tracking CSVs (the queue of jobs)
+    out_dir   : directory of the results and of batch.json
+    workers   : processes (1: in this process)
+    reference : ReferenceLayers to use instead of loading them from
+                `data_dir`
+    tiled     : the maps share XYZ tiles of the protected areas under
+                out_dir/tiles instead of embedding them (needs HTTP)
+
+    Return the batch manifest. Without paths nothing is loaded and the
+    manifest has no jobs.
+    '''
+    t0 = time.perf_counter()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if not paths:
+        manifest = {'reference_s': 0.0, 'jobs_s': 0.0, 'jobs_per_min': 0.0,
+                    'workers': 0, 'jobs': [], 'total_s': 0.0}
+        _write_manifest(out_dir, manifest)
+        return manifest
+    reference = reference or ReferenceLayers.load(data_dir)
+    if maps and tiled and reference.tiles is None:
+        reference.export_tiles(out_dir)
+    reference_s = time.perf_counter() - t0
+
+    t1 = time.perf_counter()
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    if workers == 1:
+        records = [run_job(p, out_dir, reference, maps, tiled=tiled)
+                   for p in paths]
+    else:
+        _WORKER['reference'] = reference
+        fork = 'fork' in get_all_start_methods()
+        with ProcessPoolExecutor(
+                workers, mp_context=get_context('fork' if fork else 'spawn'),
+                initializer=_init_worker,
+                initargs=(data_dir, reference.tiles)) as pool:
+            futures = [pool.submit(run_job, p, out_dir, None, maps,
+                                   tiled=tiled)
+                       for p in paths]
+            records = [f.result() for f in as_completed(futures)]
+        _WORKER.clear()
+    jobs_s = time.perf_counter() - t1
+
+    manifest = {'reference_s': reference_s, 'jobs_s': jobs_s,
+                'jobs_per_min': 60 * len(records) / jobs_s if jobs_s else 0.0,
+                'workers': workers, 'jobs': records,
+                'total_s': time.perf_counter() - t0}
+    _write_manifest(out_dir, manifest)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('tracks', nargs='+', help='tracking CSV files')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--out-dir', default='.')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-maps', dest='maps', action='store_false')
+    parser.add_argument('--tiles', dest='tiled', action='store_true',
+                        help='protected areas as shared XYZ tiles '
+                             '(needs HTTP)')
+    args = parser.parse_args(argv)
+    manifest = run_batch(args.tracks, args.out_dir, args.data_dir,
+                         args.workers, args.maps, tiled=args.tiled)
+    print(f"reference layers {manifest['reference_s']:.3f} s, "
+          f"{len(manifest['jobs'])} jobs in {manifest['jobs_s']:.3f} s "
+          f"({manifest['jobs_per_min']:.1f} jobs/min, "
+          f"{manifest['workers']} workers)")
+
+
+if __name__ == '__main__':
+    main()
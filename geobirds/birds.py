@@ -0,0 +1,142 @@
+'''
+Reading of Movebank tracking tables (e.g. purple_martin.csv).
+
+`read_birds` streams the CSV in chunks with fixed dtypes and an explicit
+timestamp format, and keeps only NumPy arrays per bird between chunks.
+The memory still grows with the file, by ~24 bytes per fix (timestamp,
+longitude, latitude), plus one chunk of the CSV; reading the whole file
+into a DataFrame first takes several times more.
+
+Tag ids are read as categories, so any id works; ids that are all
+integers (as in the course data) come out as int64. Fixes without a
+tag id are dropped, as `groupby` does.
+'''
+
+import numpy as np
+import pandas as pd
+
+from geobirds.trajectory import ID, LAT, LON, TIME, TrajectoryStore
+
+BIRD_COLUMNS = [TIME, LON, LAT, ID]
+BIRD_DTYPES = {LON: 'float64', LAT: 'float64', ID: 'category', TIME: 'str'}
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def bird_ids(ids):
+    '''
+    ids : bird ids as read (e.g. the strings of a category column)
+
+    Return the ids as an int64 array if every id is an integer written
+    in the usual way ('30000', not '030000'), else as an object array.
+    '''
+    ids = np.asarray(ids, dtype=object)
+    try:
+        as_int = ids.astype(np.int64)
+    except (TypeError, ValueError):
+        return ids
+    if (as_int.astype(str) == ids.astype(str)).all():
+        return as_int
+    return ids
+
+
+class TrackAssembler:
+    '''
+    Collects fixes chunk by chunk into per-bird pieces.
+
+    `add` takes one chunk of arrays (fixes without an id are dropped),
+    `arrays` returns all fixes with the birds in order of first
+    appearance and the fixes of each bird in time order.
+    '''
+
+    def __init__(self):
+        self._pieces = {}
+
+    def add(self, ids, t, lon, lat):
+        # | factorize numbers the birds in order of first appearance and
+        # | works the same for int, string and categorical ids.
+        codes, uid = pd.factorize(ids)
+        # | Missing ids get code -1 and sort first; skip them.
+        order = np.argsort(codes, kind='stable')
+        order = order[np.count_nonzero(codes < 0):]
+        offsets = np.r_[0, np.cumsum(np.bincount(codes[codes >= 0],
+                                                 minlength=len(uid)))]
+        for k, bird in enumerate(np.asarray(uid, dtype=object).tolist()):
+            rows = order[offsets[k]:offsets[k + 1]]
+            self._pieces.setdefault(bird, []).append(
+                (t[rows], lon[rows], lat[rows]))
+
+    def arrays(self):
+        '''
+        Return ids (`bird_ids`), t (datetime64[ns]), lon, lat, offsets.
+        The collected pieces are released on the way.
+        '''
+        birds = list(self._pieces)
+        counts = [sum(len(p[0]) for p in pieces)
+                  for pieces in self._pieces.values()]
+        offsets = np.r_[0, np.cumsum(counts)].astype(np.int64)
+        t = np.empty(offsets[-1], dtype='datetime64[ns]')
+        lon = np.empty(offsets[-1])
+        lat = np.empty(offsets[-1])
+        for k, bird in enumerate(birds):
+            pieces = self._pieces.pop(bird)
+            rows = slice(offsets[k], offsets[k + 1])
+            for out, i in ((t, 0), (lon, 1), (lat, 2)):
+                np.concatenate([p[i] for p in pieces], out=out[rows])
+            del pieces
+            order = np.argsort(t[rows], kind='stable')
+            for out in (t, lon, lat):
+                out[rows] = out[rows][order]
+        return bird_ids(birds), t, lon, lat, offsets
+
+
+def parse_timestamps(s, timestamp_format=TIMESTAMP_FORMAT):
+    '''
+    Movebank timestamps with an explicit format (much faster than
+    inference). Falls back to ISO 8601, then to inference, if the
+    format does not match.
+    '''
+    for fmt in (timestamp_format, 'ISO8601', None):
+        try:
+            return pd.to_datetime(s, format=fmt)
+        except ValueError:
+            if fmt is None:
+                raise
+
+
+def read_chunks(path, chunksize=10**6, timestamp_format=TIMESTAMP_FORMAT):
+    '''
+    Yield (ids, t, lon, lat) arrays per chunk of the CSV; ids is a
+    pandas Categorical, the others NumPy arrays.
+    '''
+    reader = pd.read_csv(path, usecols=BIRD_COLUMNS, dtype=BIRD_DTYPES,
+                         chunksize=chunksize)
+    for chunk in reader:
+        t = parse_timestamps(chunk[TIME], timestamp_format)
+        yield (chunk[ID].array,
+               t.to_numpy(dtype='datetime64[ns]'),
+               chunk[LON].to_numpy(),
+               chunk[LAT].to_numpy())
+
+
+def read_tracks(path, chunksize=10**6, timestamp_format=TIMESTAMP_FORMAT):
+    '''
+    path             : Movebank CSV
+    chunksize        : rows per chunk
+    timestamp_format : strptime format of the `timestamp` column
+
+    Return a TrajectoryStore with the birds in order of first appearance,
+    each in time order.
+    '''
+    assembler = TrackAssembler()
+    for arrays in read_chunks(path, chunksize, timestamp_format):
+        assembler.add(*arrays)
+    return TrajectoryStore(*assembler.arrays())
+
+
+def read_birds(path, chunksize=10**6, timestamp_format=TIMESTAMP_FORMAT):
+    '''
+    Same as `read_tracks`, but return the `birds` GeoDataFrame
+    (timestamp, location-long, location-lat, tag-local-identifier,
+    geometry in EPSG:4326).
+    '''
+    return read_tracks(path, chunksize, timestamp_format).to_birds()
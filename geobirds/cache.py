@@ -0,0 +1,200 @@
+'''
+On-disk cache of preprocessed GeoDataFrames.
+
+Entries are GeoParquet files (.npy files for arrays) named after what
+they hold, the content hash of the source files and a key made from
+the preprocessing parameters. Changing either gives a new file name, so
+stale entries are never read. Every read touches the entry; when a new
+entry is written, only the MAX_ENTRIES most recently used ones of the
+same name are kept (so alternating between a few sources or parameter
+sets does not rebuild every time, and old versions do not pile up).
+Entries are written to a temporary file of the writing process and
+renamed into place, so concurrent runs never read a partial entry.
+'''
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import geopandas as gpd
+import shapely
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(os.environ.get('GEOBIRDS_CACHE', '~/.cache/geobirds'))
+SHAPEFILE_PARTS = ('.shp', '.shx', '.dbf', '.prj', '.cpg')
+MAX_ENTRIES = int(os.environ.get('GEOBIRDS_CACHE_ENTRIES', 8))
+
+
+def source_files(path):
+    '''
+    All files that make up the data set at `path`. For a shapefile these
+    are the sidecar files next to the .shp.
+    '''
+    path = Path(path)
+    if path.suffix.lower() != '.shp':
+        return [path]
+    return [p for p in (path.with_suffix(s) for s in SHAPEFILE_PARTS)
+            if p.exists()]
+
+
+def _tmp_path(path):
+    '''
+    Temporary name for writing `path`, unique per process.
+    '''
+    return path.with_name(f'{path.name}.{os.getpid()}.tmp')
+
+
+def file_digest(paths, cache_dir=None, chunk=1 << 20):
+    '''
+    sha256 of the concatenated contents of `paths`.
+
+    Hashing a large shapefile on every run would eat much of what the
+    cache saves, so the digest is remembered per (path, size, mtime) in
+    `digests.json` of the cache directory.
+    '''
+    cache_dir = Path(cache_dir or CACHE_DIR).expanduser()
+    memo_path = cache_dir / 'digests.json'
+    try:
+        memo = json.loads(memo_path.read_text())
+    except (OSError, ValueError):
+        memo = {}
+
+    paths = [Path(p).resolve() for p in paths]
+    stamp = [[str(p), p.stat().st_size, p.stat().st_mtime_ns] for p in paths]
+    memo_key = json.dumps(stamp)
+    if memo_key in memo:
+        return memo[memo_key]
+
+    h = hashlib.sha256()
+    for p in paths:
+        with open(p, 'rb') as f:
+            for block in iter(lambda: f.read(chunk), b''):
+                h.update(block)
+    digest = h.hexdigest()
+
+    memo[memo_key] = digest
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_path(memo_path)
+    tmp.write_text(json.dumps(memo))
+    os.replace(tmp, memo_path)
+    return digest
+
+
+def frame_digest(gdf, columns=None):
+    '''
+    sha256 of the geometries (WKB) and of `columns` of a GeoDataFrame.
+    Identifies a layer that is not read from a file.
+    '''
+    h = hashlib.sha256()
+    h.update(b''.join(shapely.to_wkb(gdf.geometry.values)))
+    if columns:
+        h.update(gdf[list(columns)].to_json().encode())
+    return h.hexdigest()
+
+
+def cache_key(**params):
+    '''
+    Short key from the preprocessing parameters.
+    '''
+    text = json.dumps(sorted(params.items()), default=str)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def evict(cache_dir, name, suffix, keep=None):
+    '''
+    Remove all but the `keep` (default MAX_ENTRIES) most recently used
+    entries `{name}-*{suffix}` of `cache_dir`.
+    '''
+    keep = MAX_ENTRIES if keep is None else keep
+    entries = []
+    for path in Path(cache_dir).glob(f'{name}-*{suffix}'):
+        try:
+            entries.append((path.stat().st_mtime_ns, path))
+        except FileNotFoundError:
+            pass
+    entries.sort(reverse=True)
+    for _, path in entries[keep:]:
+        path.unlink(missing_ok=True)
+        logger.info('cache evicted %s', path)
+
+
+def cached_frame(name, digest, params, build, cache_dir=None):
+    '''
+    name      : what is stored (e.g. 'protected_areas')
+    digest    : content hash of the source, see `file_digest`
+    params    : dict of the preprocessing parameters
+    build     : function that returns the GeoDataFrame on a miss
+    cache_dir : defaults to $GEOBIRDS_CACHE or ~/.cache/geobirds
+
+    Return the GeoDataFrame. `gdf.attrs['cache']` tells whether it was a
+    hit and how long it took.
+    '''
+    cache_dir = Path(cache_dir or CACHE_DIR).expanduser()
+    prefix = f'{name}-{digest[:16]}-'
+    path = cache_dir / f'{prefix}{cache_key(**params)}.parquet'
+
+    t0 = time.perf_counter()
+    if path.exists():
+        gdf = gpd.read_parquet(path)
+        os.utime(path)
+        hit = True
+    else:
+        gdf = build()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_path(path)
+        try:
+            gdf.to_parquet(tmp)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        evict(cache_dir, name, '.parquet')
+        hit = False
+    seconds = time.perf_counter() - t0
+
+    gdf.attrs['cache'] = {'name': name, 'hit': hit, 'seconds': seconds,
+                          'path': str(path)}
+    logger.info('cache %s for %s: %.3f s (%s)',
+                'hit' if hit else 'miss', name, seconds, path)
+    return gdf
+
+
+def cached_array(name, digest, params, shape, dtype, fill, cache_dir=None):
+    '''
+    Memory-mapped NumPy array kept in the cache.
+
+    shape, dtype : of the array
+    fill         : function that writes the content into the (zeroed)
+                   memory-mapped array on a miss
+
+    Return the array opened read-only with mmap_mode='r', so only the
+    pages that are used are read from disk.
+    '''
+    cache_dir = Path(cache_dir or CACHE_DIR).expanduser()
+    prefix = f'{name}-{digest[:16]}-'
+    path = cache_dir / f'{prefix}{cache_key(**params)}.npy'
+
+    t0 = time.perf_counter()
+    hit = path.exists()
+    if hit:
+        os.utime(path)
+    else:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_path(path)
+        try:
+            out = np.lib.format.open_memmap(tmp, mode='w+', dtype=dtype,
+                                            shape=shape)
+            fill(out)
+            out.flush()
+            del out
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        evict(cache_dir, name, '.npy')
+    logger.info('cache %s for %s: %.3f s (%s)', 'hit' if hit else 'miss',
+                name, time.perf_counter() - t0, path)
+    return np.load(path, mmap_mode='r')
@@ -0,0 +1,172 @@
+'''
+Command line interface to the stages of the exercise.
+
+    python -m geobirds birds     [--data-dir DIR]
+    python -m geobirds protected [--data-dir DIR] [--land-only]
+    python -m geobirds overlay   [--data-dir DIR] [--engine indexed]
+                                 [--partitioned] [--csv FILE]
+    python -m geobirds dwell     [--data-dir DIR] [--max-gap-h H]
+                                 [--csv FILE]
+    python -m geobirds render    [options of geobirds.pipeline]
+    python -m geobirds batch     TRACKS.csv ... [options of geobirds.batch]
+    python -m geobirds update    TRACKS.csv [options of geobirds.incremental]
+    python -m geobirds profile   FILE
+
+This module imports only the standard library (and `DATA_DIR` of the
+package, which imports no submodule). Every subcommand imports
+the modules it needs (listed with `subcommand`) when it runs, so
+`--help` or a cheap subcommand does not pay for geopandas, folium and
+plotly. `python -m benchmarks.bench_startup` measures the cold start of
+every subcommand.
+'''
+
+import argparse
+import importlib
+
+from geobirds import DATA_DIR
+
+COMMANDS = {}
+
+
+def subcommand(name, *modules):
+    '''
+    Decorator: `func(args, *modules)` runs subcommand `name`; the
+    `modules` (dotted names) are imported just before.
+    '''
+    def register(func):
+        COMMANDS[name] = (func, modules)
+        return func
+    return register
+
+
+@subcommand('birds', 'geobirds.stages')
+def _birds(args, stages):
+    _, birds = stages.load_birds(args.data_dir)
+    summary = birds.groupby('tag-local-identifier')['timestamp'].agg(
+        fixes='count', first='min', last='max')
+    print(summary.to_string())
+
+
+@subcommand('protected', 'geobirds.stages')
+def _protected(args, stages):
+    bbox = stages.americas_bbox(stages.load_world())
+    protected = stages.load_protected(args.data_dir, bbox,
+                                      land_only=args.land_only)
+    area = (protected['REP_AREA'] - protected['REP_M_AREA']).sum()
+    print(f'{len(protected)} protected areas, {area:.6g} km^2 reported')
+
+
+@subcommand('overlay', 'geobirds.stages')
+def _overlay(args, stages):
+    if args.partitioned:
+        south_america, p_frac = stages.partitioned_overlay(
+            args.data_dir, args.rows_per_partition), None
+    else:
+        world = stages.load_world()
+        bbox = stages.americas_bbox(world)
+        protected = stages.load_protected(args.data_dir, bbox)
+        on_land = stages.load_protected(args.data_dir, bbox, land_only=True)
+        south_america, p_frac = stages.country_overlay(world, on_land,
+                                                       protected, args.engine)
+    table = south_america[['name', 'area_total', 'protected_area_total',
+                           'protected_area_fraction']]
+    print(table.sort_values('protected_area_fraction').to_string(index=False))
+    if p_frac is not None:
+        print(f'protected land fraction in south america {p_frac:.3}')
+    if args.csv:
+        table.to_csv(args.csv, index=False)
+
+
+@subcommand('dwell', 'geobirds.stages', 'geobirds.dwell')
+def _dwell(args, stages, dwell):
+    tracks, _ = stages.load_birds(args.data_dir)
+    world = stages.load_world()
+    on_land = stages.load_protected(args.data_dir,
+                                    stages.americas_bbox(world),
+                                    land_only=True)
+    per_bird = stages.dwell_days(tracks, world, on_land, args.max_gap_h)
+    table = dwell.country_dwell(per_bird)
+    table['country'] = table['country'].replace(dwell.AT_SEA, '(no country)')
+    print(table.to_string(index=False))
+    if args.csv:
+        per_bird.to_csv(args.csv, index=False)
+
+
+@subcommand('render', 'geobirds.pipeline')
+def _render(args, pipeline):
+    pipeline.main(args.rest)
+
+
+@subcommand('batch', 'geobirds.batch')
+def _batch(args, batch):
+    batch.main(args.rest)
+
+
+@subcommand('update', 'geobirds.incremental')
+def _update(args, incremental):
+    incremental.main(args.rest)
+
+
+@subcommand('profile', 'geobirds.profiling')
+def _profile(args, profiling):
+    profiling.main([args.path])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m geobirds',
+                                     description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    birds = commands.add_parser('birds', help='tracks per bird')
+    protected = commands.add_parser('protected',
+                                    help='load (and cache) the SAPA layer')
+    protected.add_argument('--land-only', action='store_true')
+    overlay = commands.add_parser(
+        'overlay', help='protected area per South American country')
+    overlay.add_argument('--engine', default='indexed')
+    overlay.add_argument('--csv', default=None)
+    overlay.add_argument('--partitioned', action='store_true',
+                         help='out of core: one spatial partition at a time')
+    overlay.add_argument('--rows-per-partition', type=int, default=20_000)
+    dwell = commands.add_parser(
+        'dwell', help='days per bird and country, in and out of protection')
+    dwell.add_argument('--max-gap-h', type=float, default=None,
+                       help='do not count gaps between fixes longer than this')
+    dwell.add_argument('--csv', default=None,
+                       help='write the table per bird and country')
+    for p in (birds, protected, overlay, dwell):
+        p.add_argument('--data-dir', default=DATA_DIR,
+                       help='course data: directory or zip archive')
+
+    render = commands.add_parser(
+        'render', add_help=False,
+        help='all maps and plots (see python -m geobirds.pipeline -h)')
+    commands.add_parser(
+        'batch', add_help=False,
+        help='many tracking files against shared reference layers '
+             '(see python -m geobirds.batch -h)')
+    commands.add_parser(
+        'update', add_help=False,
+        help='ingest the fixes appended to a tracking file '
+             '(see python -m geobirds.incremental -h)')
+    profile = commands.add_parser(
+        'profile', help='summary of a run profiled with GEOBIRDS_PROFILE')
+    profile.add_argument('path')
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    # | The options of `render`, `batch` and `update` are those of
+    # | `geobirds.pipeline`, `geobirds.batch` and `geobirds.incremental`,
+    # | parsed there, so that they need not be imported here.
+    args, rest = parser.parse_known_args(argv)
+    if rest and args.command not in ('render', 'batch', 'update'):
+        parser.error(f'unrecognized arguments: {" ".join(rest)}')
+    args.rest = rest
+    func, modules = COMMANDS[args.command]
+    func(args, *(importlib.import_module(m) for m in modules))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+'''
+Which bird fixes fall inside a protected area, and how far is every fix
+from the nearest protected area boundary.
+
+Both are batch queries against STR-trees: the tree of the polygons gives
+the candidates whose bounding box contains a fix, and only those are
+tested exactly; the tree of the boundaries answers the nearest-boundary
+query. Distances are computed in a metric CRS.
+'''
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from geobirds.area import reproject
+from geobirds.geometry import valid_geoms
+
+
+def local_metric_crs(gdf):
+    '''
+    Azimuthal equidistant projection centered on the layer. Distances
+    from the center are exact, and within a continent the error of other
+    distances stays at the percent level.
+    '''
+    minx, miny, maxx, maxy = reproject(gdf, 'EPSG:4326').total_bounds
+    return (f'+proj=aeqd +lat_0={(miny + maxy) / 2:.4f} '
+            f'+lon_0={(minx + maxx) / 2:.4f} +datum=WGS84 +units=m')
+
+
+def fix_containment(birds, protected, crs=None, max_distance=None):
+    '''
+    birds        : GeoDataFrame of the fixes
+    protected    : GeoDataFrame of the protected areas
+    crs          : metric CRS for the distances (default:
+                   `local_metric_crs` of the fixes)
+    max_distance : [m] do not look further for a boundary than this;
+                   fixes without a boundary in reach get NaN
+
+    Return a DataFrame indexed like `birds` with
+    - `in_protected`    : the fix is inside (or on) a protected area
+    - `n_protected`     : number of protected areas that contain it
+                          (designations overlap)
+    - `protected_index` : row of one of them in `protected` (-1 if none)
+    - `boundary_dist_m` : distance to the nearest protected area boundary
+    '''
+    crs = crs or local_metric_crs(birds)
+    points = np.asarray(reproject(birds, crs))
+    polygons = valid_geoms(reproject(protected, crs))
+    n = len(points)
+
+    i_point, i_poly = shapely.STRtree(polygons).query(
+        points, predicate='intersects')
+    n_protected = np.bincount(i_point, minlength=n)
+    protected_index = np.full(n, -1)
+    protected_index[i_point[::-1]] = i_poly[::-1]
+
+    boundaries = shapely.boundary(polygons)
+    i_near, dist = shapely.STRtree(boundaries).query_nearest(
+        points, max_distance=max_distance, return_distance=True,
+        all_matches=False)
+    boundary_dist = np.full(n, np.nan)
+    boundary_dist[i_near[0]] = dist
+
+    return pd.DataFrame({'in_protected': n_protected > 0,
+                         'n_protected': n_protected,
+                         'protected_index': protected_index,
+                         'boundary_dist_m': boundary_dist},
+                        index=birds.index)
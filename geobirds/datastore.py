@@ -0,0 +1,214 @@
+'''
+Content-addressed store of data archives, read without extraction.
+
+The course data comes as one zip (`geospatial-learn-course-data.zip`),
+of which only `purple_martin.csv` and the SAPA shapefile are used.
+Instead of extracting all of it, `DataStore.register` copies the archive
+under its sha256 into the store directory (checking the copy against
+that hash, so later edits of the source do not reach the store), checks
+the CRC of every member once, and records the members in `index.json`.
+Afterwards
+
+- `open_member` streams a member (CSV) straight out of the zip, and
+- `member_path` gives a GDAL `zip://archive!member` path, so that
+  `geopandas.read_file` reads the shapefile inside the zip.
+
+A registered archive is recognized by (path, size, mtime) without being
+hashed again (see `geobirds.cache.file_digest`), so nothing is re-read
+across runs, and `source_digest` (archive hash + member) keys the
+cached results built from a member. Nothing here touches the network.
+
+The module functions take `data` as either a directory (the extracted
+data, as before) or a zip archive, so the callers work with both.
+'''
+
+import hashlib
+import json
+import os
+import zipfile
+from functools import lru_cache
+from pathlib import Path
+
+from geobirds.cache import CACHE_DIR, file_digest, source_files
+
+
+def _copy_checked(path, target, digest, chunk=1 << 20):
+    '''
+    Copy `path` to `target` (atomically) and check that the copy hashes
+    to `digest`; a source that changed since it was hashed raises
+    ValueError.
+    '''
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f'{target.name}.{os.getpid()}.tmp')
+    h = hashlib.sha256()
+    try:
+        with open(path, 'rb') as src, open(tmp, 'wb') as dst:
+            for block in iter(lambda: src.read(chunk), b''):
+                h.update(block)
+                dst.write(block)
+        if h.hexdigest() != digest:
+            raise ValueError(f'{path} changed while it was registered')
+        os.replace(tmp, target)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+class DataStore:
+    '''
+    root : directory of the store, defaults to $GEOBIRDS_CACHE/store
+    '''
+
+    def __init__(self, root=None):
+        self.root = Path(root or Path(CACHE_DIR) / 'store').expanduser()
+        self.index_path = self.root / 'index.json'
+        try:
+            self.index = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            self.index = {'archives': {}, 'names': {}}
+
+    def _save_index(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_name(self.index_path.name + '.tmp')
+        tmp.write_text(json.dumps(self.index, indent=1))
+        os.replace(tmp, self.index_path)
+
+    def archive_path(self, digest):
+        return self.root / 'archives' / f'{digest}.zip'
+
+    def register(self, path, name=None, sha256=None):
+        '''
+        Add the zip archive at `path` to the store (once per content).
+
+        name   : alias for `resolve` (default: the file name without .zip)
+        sha256 : expected digest; a different content raises ValueError
+
+        Return the sha256 of the archive.
+        '''
+        path = Path(path)
+        digest = file_digest([path], cache_dir=self.root)
+        if sha256 and digest != sha256:
+            raise ValueError(f'{path}: sha256 {digest}, expected {sha256}')
+
+        alias = name or path.stem
+        changed = self.index['names'].get(alias) != digest
+        if digest not in self.index['archives']:
+            target = self.archive_path(digest)
+            if not target.exists():
+                _copy_checked(path, target, digest)
+            with zipfile.ZipFile(target) as z:
+                bad = z.testzip()
+                if bad is not None:
+                    target.unlink()
+                    raise zipfile.BadZipFile(f'{path}: bad CRC in {bad}')
+                members = {i.filename: [i.file_size, i.CRC]
+                           for i in z.infolist() if not i.is_dir()}
+            self.index['archives'][digest] = {'source': str(path.resolve()),
+                                              'members': members}
+            changed = True
+        if changed:
+            self.index['names'][alias] = digest
+            self._save_index()
+        return digest
+
+    def resolve(self, key):
+        '''
+        Digest of the archive registered as `key` (name or digest).
+        '''
+        digest = self.index['names'].get(key, key)
+        if digest not in self.index['archives']:
+            raise KeyError(f'{key} is not in the store {self.root}')
+        return digest
+
+    def member(self, key, name):
+        '''
+        Full name of member `name` of archive `key`: `name` itself or the
+        one member that ends with /`name` (archives often add a folder).
+        '''
+        members = self.index['archives'][self.resolve(key)]['members']
+        if name in members:
+            return name
+        found = [m for m in members if m.endswith('/' + name)]
+        if len(found) != 1:
+            raise KeyError(f'{len(found)} members match {name} in {key}')
+        return found[0]
+
+    def open(self, key, name):
+        '''
+        Binary stream of a member; zipfile checks its CRC when read to
+        the end. The archive file is closed with the stream.
+        '''
+        digest = self.resolve(key)
+        # | The member keeps the file of the archive open until it is
+        # | closed itself.
+        with zipfile.ZipFile(self.archive_path(digest)) as z:
+            return z.open(self.member(digest, name))
+
+    def path(self, key, name):
+        '''
+        GDAL path of a member, for `geopandas.read_file`.
+        '''
+        digest = self.resolve(key)
+        return (f'zip://{self.archive_path(digest).resolve()}'
+                f'!{self.member(digest, name)}')
+
+    def verify(self, key):
+        '''
+        Hash the archive again and check the CRC of every member.
+        Return True if both match what was registered.
+        '''
+        digest = self.resolve(key)
+        path = self.archive_path(digest)
+        h = hashlib.sha256()
+        with path.open('rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        if h.hexdigest() != digest:
+            return False
+        with zipfile.ZipFile(path) as z:
+            return z.testzip() is None
+
+
+@lru_cache(maxsize=None)
+def default_store():
+    return DataStore()
+
+
+def is_archive(data):
+    return Path(data).is_file() and zipfile.is_zipfile(data)
+
+
+def open_member(data, name, store=None):
+    '''
+    data : directory or zip archive (registered on first use)
+
+    Binary stream of `name`, to be closed by the caller, e.g.
+    `with open_member(data, 'x.csv') as f: pd.read_csv(f)`.
+    '''
+    if not is_archive(data):
+        return open(Path(data) / name, 'rb')
+    store = store or default_store()
+    return store.open(store.register(data), name)
+
+
+def member_path(data, name, store=None):
+    '''
+    Path of `name` in `data` (directory or zip archive) that
+    `geopandas.read_file` can read.
+    '''
+    if not is_archive(data):
+        return str(Path(data) / name)
+    store = store or default_store()
+    return store.path(store.register(data), name)
+
+
+def source_digest(data, name, store=None):
+    '''
+    Content hash of member `name` of `data` (for shapefiles with their
+    sidecar files), to key cached results built from it.
+    '''
+    if not is_archive(data):
+        return file_digest(source_files(Path(data) / name))
+    store = store or default_store()
+    digest = store.register(data)
+    key = f'{digest}!{store.member(digest, name)}'
+    return hashlib.sha256(key.encode()).hexdigest()
@@ -0,0 +1,111 @@
+'''
+Non-overlapping footprint of the protected areas.
+
+WDPA designations overlap (a national park inside an indigenous
+territory, for example), so summing `REP_AREA` or the areas of the
+single polygons counts the overlaps more than once. `dissolve_protected`
+merges the polygons with GEOS' cascaded (tree-structured) union,
+optionally per group (a column such as ISO3) or per square tile, and
+`load_footprint` keeps the result in the on-disk cache so the union runs
+once per version of the layer.
+'''
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from geobirds.area import area_km2, equal_area_crs
+from geobirds.cache import cached_frame, frame_digest
+from geobirds.geometry import valid_geoms
+
+
+def tile_pieces(geoms, tile):
+    '''
+    Cut `geoms` along a grid of `tile` x `tile` cells. Return (cell id,
+    piece) arrays; a geometry spanning several cells gives one piece per
+    cell.
+    '''
+    bounds = shapely.bounds(geoms)
+    ix0, iy0 = np.floor(bounds[:, 0] / tile), np.floor(bounds[:, 1] / tile)
+    ix1, iy1 = np.floor(bounds[:, 2] / tile), np.floor(bounds[:, 3] / tile)
+    nx = (ix1 - ix0 + 1).astype(int)
+    ny = (iy1 - iy0 + 1).astype(int)
+
+    # | One row per (geometry, cell it may touch).
+    i_geom = np.repeat(np.arange(len(geoms)), nx * ny)
+    k = np.arange(len(i_geom)) - np.repeat(np.cumsum(nx * ny) - nx * ny,
+                                           nx * ny)
+    ix = ix0[i_geom] + k % nx[i_geom]
+    iy = iy0[i_geom] + k // nx[i_geom]
+    boxes = shapely.box(ix * tile, iy * tile, (ix + 1) * tile, (iy + 1) * tile)
+    pieces = shapely.intersection(geoms[i_geom], boxes)
+    keep = ~shapely.is_empty(pieces)
+    cell = np.char.add(np.char.add(ix.astype(int).astype(str), '_'),
+                       iy.astype(int).astype(str))
+    return cell[keep], pieces[keep]
+
+
+def dissolve_protected(protected, by=None, tile=None):
+    '''
+    protected : GeoDataFrame of the protected areas
+    by        : column to dissolve within (e.g. 'ISO3'); the footprints of
+                different groups may still overlap each other
+    tile      : cell size (in the units of the layer) to dissolve per grid
+                cell; cells do not overlap, so their areas add up
+
+    Return a GeoDataFrame with one footprint per group / cell (a single
+    row `all` without either) and the number of polygons merged.
+    '''
+    geoms = valid_geoms(protected)
+    if tile:
+        group, geoms = tile_pieces(geoms, tile)
+    elif by:
+        group = protected[by].astype(str).to_numpy()
+    else:
+        group = np.full(len(geoms), 'all')
+
+    order = np.argsort(group, kind='stable')
+    group, geoms = group[order], geoms[order]
+    start = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    end = np.r_[start[1:], len(group)]
+    footprint = [shapely.union_all(geoms[a:b]) for a, b in zip(start, end)]
+
+    name = by or ('tile' if tile else 'group')
+    return gpd.GeoDataFrame({name: group[start], 'n_polygons': end - start},
+                            geometry=footprint, crs=protected.crs)
+
+
+def load_footprint(protected, by=None, tile=None, name='footprint',
+                   cache_dir=None):
+    '''
+    `dissolve_protected`, cached on disk. The key is the content of the
+    layer (geometries and the `by` column) and the parameters. A new
+    version of the layer replaces the old entries under the same `name`,
+    so give different layers different names.
+    '''
+    digest = frame_digest(protected, [by] if by else None)
+    return cached_frame(name, digest, dict(by=by, tile=tile),
+                        lambda: dissolve_protected(protected, by, tile),
+                        cache_dir=cache_dir)
+
+
+def footprint_report(protected, footprint, crs=None):
+    '''
+    Naive vs. overlap corrected protected area [km^2].
+
+    - `reported`  : sum of REP_AREA - REP_M_AREA (WDPA attributes)
+    - `naive`     : sum of the areas of the single polygons
+    - `footprint` : area of the dissolved footprint
+    - `overlap`   : naive - footprint, i.e. what the naive sum counts twice
+    '''
+    crs = crs or equal_area_crs(protected)
+    report = {}
+    if {'REP_AREA', 'REP_M_AREA'} <= set(protected.columns):
+        report['reported'] = float((protected['REP_AREA']
+                                    - protected['REP_M_AREA']).sum())
+    report['naive'] = float(area_km2(protected, crs).sum())
+    report['footprint'] = float(area_km2(footprint, crs).sum())
+    report['overlap'] = report['naive'] - report['footprint']
+    report['overlap_fraction'] = report['overlap'] / report['naive']
+    return pd.Series(report, name='km^2')
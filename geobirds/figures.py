@@ -0,0 +1,123 @@
+'''
+The maps and plots of the notebook, as functions of their inputs.
+
+The script and the headless runner (`geobirds.pipeline`) build the same
+artifacts with these. `save` writes an artifact exactly once, to a
+temporary file that is then renamed, so readers never see half a file.
+'''
+
+import os
+from pathlib import Path
+
+import folium
+import plotly.graph_objs as go
+
+from geobirds.hotspots import heatmap_layer
+from geobirds.layers import add_tracks
+from geobirds.tiles import TiledGeoJson, export_tile_pyramid
+from geobirds.topology import topology
+
+PROTECTED_STYLE = {'fillColor': 'coral', 'stroke': False}
+
+
+def protected_style(feature):
+    return PROTECTED_STYLE
+
+
+def track_map(americas, birds, center, zoom=5):
+    '''
+    m_1: the paths of the birds over the Americas.
+    '''
+    m = folium.Map(location=center, zoom_start=zoom)
+    folium.TopoJson(topology(americas, 'countries', tolerance=0.05),
+                    'objects.countries').add_to(m)
+    add_tracks(m, birds, color_col='color')
+    return m
+
+
+def protected_map(protected, center, zoom=5, birds=None, tiles=None,
+                  tiled=False, out_dir='.', name='protected_areas',
+                  manifest=None):
+    '''
+    m_2 / m_3: the protected areas (and the paths of the birds, if
+    given) on basemap `tiles`.
+
+    tiled    : cut the polygons into XYZ tiles under out_dir/tiles/`name`
+               (fetched by the map while panning, so the HTML file has
+               to be served over HTTP) instead of embedding them as
+               TopoJSON
+    out_dir  : directory of the HTML file
+    manifest : of tiles already exported there; `protected` is then not
+               needed (many maps sharing one set of tiles)
+    '''
+    m = folium.Map(location=center, zoom_start=zoom,
+                   **({'tiles': tiles} if tiles else {}))
+    if tiled:
+        url = f'tiles/{name}'
+        manifest = manifest or export_tile_pyramid(protected,
+                                                   Path(out_dir) / url)
+        TiledGeoJson(manifest, url, style=PROTECTED_STYLE).add_to(m)
+    else:
+        folium.TopoJson(topology(protected, name), f'objects.{name}',
+                        style_function=protected_style).add_to(m)
+    if birds is not None:
+        add_tracks(m, birds, color_col='color')
+    return m
+
+
+def hotspot_map(hot, center, zoom=5, window='winter'):
+    '''
+    m_4: heatmap of the `hotspots` cells of `window`.
+    '''
+    m = folium.Map(location=center, zoom_start=zoom)
+    heatmap_layer(hot[hot['window'] == window]).add_to(m)
+    return m
+
+
+def fraction_bar(south_america, p_frac):
+    '''
+    p_1: fraction of protected area per country, with the South American
+    average `p_frac` as a vertical line.
+    '''
+    df = south_america.sort_values('protected_area_fraction')
+    fig = go.Figure(data=[go.Bar(y=df['name'],
+                                 x=df['protected_area_fraction'],
+                                 orientation='h')],
+                    layout=go.Layout(height=512, width=1024,
+                                     font=dict(size=20),
+                                     xaxis=dict(title=dict(
+                                         text='Fraction of Protected Area'))))
+    fig.add_vline(x=p_frac)
+    return fig
+
+
+def area_bar(south_america):
+    '''
+    p_2: protected and not protected area per country, stacked.
+    '''
+    df = south_america.sort_values('protected_area_total')
+    data = [go.Bar(name='protected', y=df['name'],
+                   x=df['protected_area_total'], orientation='h'),
+            go.Bar(name='not protected', y=df['name'],
+                   x=df['non_protected_area_total'], orientation='h')]
+    return go.Figure(data=data,
+                     layout=go.Layout(height=512, width=1024,
+                                      font=dict(size=20), barmode='stack',
+                                      xaxis=dict(title=dict(
+                                          text='Area Use [km^2]'))))
+
+
+def save(artifact, path):
+    '''
+    Write a folium Map or plotly Figure to `path` (HTML) once. Return the
+    size in bytes.
+    '''
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    if isinstance(artifact, folium.Map):
+        artifact.save(str(tmp))
+    else:
+        artifact.write_html(str(tmp))
+    os.replace(tmp, path)
+    return path.stat().st_size
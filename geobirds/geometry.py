@@ -0,0 +1,21 @@
+'''
+Helpers on shapely geometries shared by the overlay, containment,
+dissolve, topology, hotspot and dwell modules.
+'''
+
+import numpy as np
+import shapely
+
+
+def valid_geoms(gdf):
+    '''
+    Geometries of `gdf` (GeoDataFrame, GeoSeries or array of shapely
+    geometries), repaired where invalid (simplify with
+    preserve_topology=False leaves some self-intersections).
+    '''
+    geoms = np.asarray(getattr(gdf, 'geometry', gdf))
+    bad = ~shapely.is_valid(geoms)
+    if bad.any():
+        geoms = geoms.copy()
+        geoms[bad] = shapely.make_valid(geoms[bad])
+    return geoms
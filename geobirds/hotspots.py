@@ -0,0 +1,197 @@
+'''
+Hotspots: where do many birds pass or stay?
+
+The fixes are projected to an equal-area CRS and hashed to square or
+hexagonal cells of the same area, so that every cell is an integer pair
+computed with a few array operations (no geometry per fix). Fixes and
+distinct birds are then counted per (time window, cell) with one sort
+of an int64 key, which scales to millions of fixes. Only the cells
+that hold fixes get a polygon.
+
+- `hotspots` counts per cell and time window (e.g. summer / winter).
+- `hotspot_protection` joins the hottest cells to the protected areas.
+- `heatmap_layer` gives a folium HeatMap with one point per cell.
+'''
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from folium.plugins import HeatMap
+
+from geobirds.area import REGION_CRS, reproject, transformer
+from geobirds.geometry import valid_geoms
+from geobirds.overlay import candidate_pairs
+from geobirds.trajectory import as_store
+
+# | Months of the time windows. Purple martins breed in North America
+# | in summer and winter in the Amazon basin.
+SEASONS = {'summer': (5, 6, 7, 8), 'winter': (11, 12, 1, 2)}
+
+SQRT3 = np.sqrt(3)
+
+
+def square_cells(x, y, cell):
+    '''
+    (column, row) of the square cells of side `cell` holding (x, y).
+    '''
+    return (np.floor(x / cell).astype(np.int64),
+            np.floor(y / cell).astype(np.int64))
+
+
+def hex_size(cell):
+    '''
+    Circumradius of the pointy-top hexagon with the area of a `cell` x
+    `cell` square.
+    '''
+    return cell * np.sqrt(2 / (3 * SQRT3))
+
+
+def hex_cells(x, y, cell):
+    '''
+    Axial coordinates (q, r) of the hexagons (area cell^2) holding (x, y),
+    by rounding the fractional cube coordinates.
+    '''
+    size = hex_size(cell)
+    q = (SQRT3 / 3 * x - y / 3) / size
+    r = 2 / 3 * y / size
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq[fix_q] = -rr[fix_q] - rs[fix_q]
+    rr[fix_r] = -rq[fix_r] - rs[fix_r]
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def cell_polygons(i, j, cell, kind='hex'):
+    '''
+    Polygons of the cells (i, j) returned by `square_cells` / `hex_cells`.
+    '''
+    if kind == 'square':
+        return shapely.box(i * cell, j * cell, (i + 1) * cell, (j + 1) * cell)
+    size = hex_size(cell)
+    cx = size * SQRT3 * (i + j / 2)
+    cy = size * 1.5 * j
+    angle = np.radians(30 + 60 * np.arange(7))
+    ring = np.stack([cx[:, None] + size * np.cos(angle),
+                     cy[:, None] + size * np.sin(angle)], axis=-1)
+    return shapely.polygons(ring)
+
+
+def time_windows(t, windows=None):
+    '''
+    t       : datetime64 per fix
+    windows : {name: months}, default SEASONS
+
+    Return (window index per fix, -1 outside every window; names).
+    A fix in more than one window goes to the first.
+    '''
+    windows = SEASONS if windows is None else windows
+    month = pd.DatetimeIndex(t).month.to_numpy()
+    label = np.full(len(month), -1)
+    for k, months in reversed(list(enumerate(windows.values()))):
+        label[np.isin(month, months)] = k
+    return label, list(windows)
+
+
+def hotspots(tracks, cell=50_000, kind='hex', windows=None, crs=None):
+    '''
+    tracks  : TrajectoryStore or `birds` GeoDataFrame
+    cell    : cell size in the units of `crs` (the side of a square, or
+              a hexagon of the same area)
+    kind    : 'hex' or 'square'
+    windows : {name: months} (default SEASONS); {} counts all fixes in
+              one window 'all'
+    crs     : equal-area CRS (default: Mollweide, fine for tracks that
+              span continents)
+
+    Return a GeoDataFrame (in `crs`) with one row per (window, cell) that
+    has fixes: `window`, `i`, `j`, `n_fixes`, `n_birds`, sorted by
+    `n_birds` and `n_fixes`, hottest first.
+    '''
+    tracks = as_store(tracks)
+    crs = crs or REGION_CRS['World']
+    x, y = transformer('EPSG:4326', crs).transform(tracks.lon, tracks.lat)
+    i, j = (hex_cells if kind == 'hex' else square_cells)(x, y, cell)
+
+    if windows == {}:
+        window, names = np.zeros(len(i), dtype=int), ['all']
+    else:
+        window, names = time_windows(tracks.t, windows)
+    keep = window >= 0
+    i, j, window = i[keep], j[keep], window[keep]
+    bird = tracks.bird_of_fix()[keep]
+
+    # | One int64 per (window, cell): shift the cell coordinates to >= 0.
+    i0, j0 = (i.min(), j.min()) if len(i) else (0, 0)
+    ni = int(i.max() - i0 + 1) if len(i) else 1
+    nj = int(j.max() - j0 + 1) if len(j) else 1
+    # | One sort of (cell, bird) gives both counts.
+    key = (window * nj + (j - j0)) * ni + (i - i0)
+    key = np.sort(key * len(tracks) + bird)
+    new_pair = np.r_[True, key[1:] != key[:-1]]
+    key //= len(tracks)
+    new_cell = np.r_[True, key[1:] != key[:-1]]
+    start = np.flatnonzero(new_cell)
+    cells = key[start]
+    n_fixes = np.diff(np.r_[start, len(key)])
+    n_birds = np.add.reduceat(new_pair, start) if len(start) else start
+
+    ci = cells % ni + i0
+    cj = cells // ni % nj + j0
+    out = gpd.GeoDataFrame(
+        {'window': pd.Categorical.from_codes(cells // (ni * nj), names),
+         'i': ci, 'j': cj, 'n_fixes': n_fixes, 'n_birds': n_birds},
+        geometry=cell_polygons(ci, cj, cell, kind), crs=crs)
+    return out.sort_values(['n_birds', 'n_fixes'],
+                           ascending=False).reset_index(drop=True)
+
+
+def hotspot_protection(hot, protected, top=20, name_col='NAME'):
+    '''
+    hot       : result of `hotspots`
+    protected : GeoDataFrame of the protected areas (e.g.
+                `protected_areas_on_land`)
+    top       : number of hottest cells per window to look at
+    name_col  : column of the area names (in PIPELINE_COLUMNS)
+
+    Return the `top` cells of every window with `protected_fraction`
+    (the share of the cell covered by protected areas, overlaps counted
+    once) and the names of those areas (`name_col`, if present).
+    '''
+    hot = hot.groupby('window', observed=True, sort=False).head(top)
+    hot = hot.reset_index(drop=True)
+    cells = np.asarray(hot.geometry)
+    geoms = valid_geoms(reproject(protected, hot.crs))
+    i_c, i_p = candidate_pairs(cells, geoms)
+    pieces = shapely.intersection(cells[i_c], geoms[i_p])
+    hit = ~shapely.is_empty(pieces)
+    i_c, i_p, pieces = i_c[hit], i_p[hit], pieces[hit]
+
+    covered = np.zeros(len(cells))
+    for k in np.unique(i_c):
+        covered[k] = shapely.area(shapely.union_all(pieces[i_c == k]))
+    hot = hot.assign(protected_fraction=covered / shapely.area(cells))
+    if name_col in protected:
+        names = pd.Series(protected[name_col].to_numpy()[i_p]).groupby(
+            i_c).agg(lambda s: sorted(set(s)))
+        hot['protected_names'] = [names.get(k, []) for k in range(len(hot))]
+    return hot
+
+
+def heatmap_layer(hot, value='n_birds', decimals=4, **kwargs):
+    '''
+    folium HeatMap with one weighted point (the cell center, EPSG:4326)
+    per row of `hot`; `kwargs` go to `folium.plugins.HeatMap`.
+    '''
+    centers = shapely.centroid(np.asarray(hot.geometry))
+    lon, lat = transformer(hot.crs, 'EPSG:4326').transform(
+        shapely.get_x(centers), shapely.get_y(centers))
+    weight = hot[value].to_numpy(dtype=float)
+    data = np.column_stack([np.round(lat, decimals), np.round(lon, decimals),
+                            weight / weight.max()]).tolist()
+    kwargs.setdefault('radius', 25)
+    kwargs.setdefault('name', f'hotspots ({value})')
+    return HeatMap(data, **kwargs)
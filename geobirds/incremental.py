@@ -0,0 +1,536 @@
+'''
+Incremental update of the per-bird outputs when fixes are appended to
+the tracking CSV.
+
+    python -m geobirds.incremental purple_martin.csv [--state DIR]
+                                   [--data-dir DIR] [--no-reference]
+                                   [--watch SECONDS]
+
+`IncrementalTracks.update` reads the CSV from the byte offset where the
+previous update stopped (complete lines only) and touches only the birds
+with new fixes, so an update costs the new rows, not the history. The
+state directory holds
+
+    state.json        : offset and header of the CSV, a hash of the
+                        GUARD bytes just before the offset, and per
+                        bird the last fix and the running metrics
+    fixes/BIRD.bin    : all fixes of the bird (time, lon, lat, inside a
+                        protected area), appended
+    stats.csv         : fixes, distance, max speed, fixes in protected
+                        areas and stopovers per bird
+    layers/index.json : the GeoJSON files of the tracks per bird, and
+                        positions.geojson with the last fix of every bird
+    map.html          : folium map of layers/ (written once, shows the
+                        latest update on reload)
+
+The metrics equal those of a full run (`step_metrics`, `stopovers`,
+`ReferenceLayers.n_protected`) on the whole file; a stopover that is
+still going on counts as soon as it lasts `min_hours`. A fix older than
+the last fix of its bird rebuilds that bird from fixes/BIRD.bin. A CSV
+that shrank, or whose header or last GUARD bytes before the offset
+changed, starts everything over. Hashing the whole prefix would make
+every update cost the history again, so an edit further back (same
+size, same tail) goes unnoticed: call `reset` (or remove the state
+directory) after editing old rows.
+
+Every update adds one track file per updated bird. The newest files of
+a bird are merged while the last one holds at least as many fixes as
+the one before, so a bird has O(log updates) files and a fix is
+rewritten O(log fixes) times.
+'''
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+from branca.element import MacroElement
+from jinja2 import Template
+
+from geobirds.birds import (BIRD_COLUMNS, BIRD_DTYPES, bird_ids,
+                            parse_timestamps)
+from geobirds.movement import haversine
+from geobirds.stages import DATA_DIR
+from geobirds.trajectory import ID, LAT, LON, TIME
+
+FIX_DTYPE = np.dtype([('t', '<i8'), ('lon', '<f8'), ('lat', '<f8'),
+                      ('inside', '?')])
+# | Bytes before the offset that must be unchanged since the last update.
+GUARD = 4096
+NS_PER_HOUR = 3.6e12
+STATS_COLUMNS = ['bird', 'n_fixes', 'first', 'last', 'distance_km',
+                 'max_speed_kmh', 'fixes_in_protected', 'frac_in_protected',
+                 'n_stopovers', 'stopover_hours']
+
+
+def bird_color(bird):
+    '''
+    Fixed color of a bird (the same in every update), for any id.
+    '''
+    seed = int(hashlib.sha256(str(bird).encode()).hexdigest()[:16], 16)
+    return '#%06x' % np.random.default_rng(seed).integers(0, 256**3 - 1)
+
+
+def _file_stem(bird):
+    '''
+    File name of a bird: the id itself if it is safe in a path and a
+    URL, else a hash of it.
+    '''
+    if re.fullmatch(r'[\w.-]+', bird) and not bird.startswith('.'):
+        return bird
+    return hashlib.sha256(bird.encode()).hexdigest()[:16]
+
+
+def _new_bird():
+    return {'n_fixes': 0, 'first_t': None, 'last_t': None,
+            'last_lon': None, 'last_lat': None, 'last_inside': False,
+            'distance_km': 0.0, 'max_speed_kmh': 0.0,
+            'fixes_in_protected': 0, 'n_stopovers': 0,
+            'stopover_hours': 0.0, 'run_start_t': None, 'run_len': 0}
+
+
+def _write(path, data):
+    tmp = path.with_name(path.name + '.tmp')
+    if isinstance(data, bytes):
+        tmp.write_bytes(data)
+    else:
+        tmp.write_text(data)
+    os.replace(tmp, path)
+
+
+class IncrementalTracks:
+    '''
+    state_dir : directory of the state (created by the first update)
+    reference : `geobirds.batch.ReferenceLayers` for the fixes inside
+                protected areas, or None (then no fix is inside)
+    radius_km, min_hours : stopover parameters, as in `stopovers`
+    '''
+
+    def __init__(self, state_dir='incremental', reference=None,
+                 radius_km=50.0, min_hours=48.0):
+        self.dir = Path(state_dir)
+        self.reference = reference
+        self.radius_km = radius_km
+        self.min_hours = min_hours
+        self.state = self._load()
+
+    def _load(self):
+        path = self.dir / 'state.json'
+        if path.exists():
+            return json.loads(path.read_text())
+        return {'source': None, 'offset': 0, 'header': None, 'guard': None,
+                'radius_km': self.radius_km, 'min_hours': self.min_hours,
+                'birds': {}, 'layers': {}}
+
+    def _save(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        _write(self.dir / 'state.json', json.dumps(self.state))
+
+    def reset(self):
+        '''
+        Forget everything; the next update reads the CSV from the start.
+        '''
+        if self.dir.exists():
+            shutil.rmtree(self.dir)
+        self.state = self._load()
+
+    # | Appended rows --------------------------------------------------
+
+    @staticmethod
+    def _guard(f, offset):
+        f.seek(max(0, offset - GUARD))
+        return hashlib.sha256(f.read(min(offset, GUARD))).hexdigest()
+
+    def _is_continued(self, f, path):
+        '''
+        Whether the CSV is still the one of the state with rows appended:
+        same file and parameters, not shorter, and the header and the
+        GUARD bytes before the offset unchanged.
+        '''
+        st = self.state
+        header = (st['header'] or '').encode()
+        if not (st['source'] == str(Path(path).resolve())
+                and st['radius_km'] == self.radius_km
+                and st['min_hours'] == self.min_hours
+                and os.fstat(f.fileno()).st_size >= st['offset']):
+            return False
+        f.seek(0)
+        return (f.read(len(header)) == header
+                and self._guard(f, st['offset']) == st['guard'])
+
+    def _read_new(self, path):
+        '''
+        Return the complete rows appended since the last update as a
+        DataFrame (bird, t [ns], lon, lat) sorted by bird and time, or
+        None.
+        '''
+        with open(path, 'rb') as f:
+            if self.state['offset'] and not self._is_continued(f, path):
+                self.reset()
+            st = self.state
+            f.seek(st['offset'])
+            data = f.read()
+            if st['header'] is None:
+                if b'\n' not in data:
+                    return None
+                end = data.index(b'\n') + 1
+                st['header'], data = data[:end].decode(), data[end:]
+                st['offset'] = end
+            end = data.rfind(b'\n') + 1
+            st['source'] = str(Path(path).resolve())
+            st['offset'] += end
+            st['guard'] = self._guard(f, st['offset'])
+        if not end:
+            return None
+        df = pd.read_csv(io.BytesIO(st['header'].encode() + data[:end]),
+                         usecols=BIRD_COLUMNS, dtype=BIRD_DTYPES)
+        # | Fixes without a tag id are dropped, as in `read_tracks`.
+        df = df[df[ID].notna()]
+        t = parse_timestamps(df[TIME]).to_numpy(dtype='datetime64[ns]')
+        # | Birds are keyed by their id as a string (as in state.json).
+        new = pd.DataFrame({'bird': df[ID].astype(str).to_numpy(),
+                            't': t.astype(np.int64),
+                            'lon': df[LON].to_numpy(),
+                            'lat': df[LAT].to_numpy()})
+        # | lexsort is stable, so fixes with equal times keep the file
+        # | order (as in `read_tracks`). Birds are grouped in order of
+        # | first appearance.
+        bird_code = pd.factorize(new['bird'])[0]
+        return new.iloc[np.lexsort((new['t'], bird_code))]
+
+    def _inside(self, lon, lat):
+        if self.reference is None:
+            return np.zeros(len(lon), dtype=bool)
+        return self.reference.n_protected(shapely.points(lon, lat)) > 0
+
+    # | Running metrics ------------------------------------------------
+
+    def _advance(self, s, fixes):
+        '''
+        Fold `fixes` (FIX_DTYPE, time order, none before s['last_t']) of
+        one bird into its state `s`.
+        '''
+        t, lon, lat = fixes['t'], fixes['lon'], fixes['lat']
+        if s['n_fixes'] == 0:
+            s.update(first_t=int(t[0]), run_start_t=int(t[0]), run_len=1)
+            t_prev, lon_prev, lat_prev = t[:-1], lon[:-1], lat[:-1]
+            t, lon, lat = t[1:], lon[1:], lat[1:]
+        else:
+            t_prev = np.r_[s['last_t'], t[:-1]]
+            lon_prev = np.r_[s['last_lon'], lon[:-1]]
+            lat_prev = np.r_[s['last_lat'], lat[:-1]]
+
+        step_km = haversine(lon_prev, lat_prev, lon, lat)
+        step_h = (t - t_prev) / NS_PER_HOUR
+        s['distance_km'] += float(step_km.sum())
+        moving = step_h > 0
+        if moving.any():
+            s['max_speed_kmh'] = max(s['max_speed_kmh'], float(
+                (step_km[moving] / step_h[moving]).max()))
+
+        # | Runs of short steps as in `stopover_labels`: every long step
+        # | closes the open run at the fix before it and opens a new one.
+        long = np.flatnonzero(~(step_km < self.radius_km))
+        if len(long):
+            start = np.r_[s['run_start_t'], t[long[:-1]]]
+            n_fixes = np.diff(long, prepend=-s['run_len'])
+            hours = (t_prev[long] - start) / NS_PER_HOUR
+            stop = (n_fixes > 1) & (hours >= self.min_hours)
+            s['n_stopovers'] += int(stop.sum())
+            s['stopover_hours'] += float(hours[stop].sum())
+            s['run_start_t'] = int(t[long[-1]])
+            s['run_len'] = len(t) - int(long[-1])
+        else:
+            s['run_len'] += len(t)
+
+        s['n_fixes'] += len(fixes)
+        s['fixes_in_protected'] += int(fixes['inside'].sum())
+        s['last_t'] = int(fixes['t'][-1])
+        s['last_lon'] = float(fixes['lon'][-1])
+        s['last_lat'] = float(fixes['lat'][-1])
+        s['last_inside'] = bool(fixes['inside'][-1])
+
+    def _stats_row(self, bird, s):
+        hours = (s['last_t'] - s['run_start_t']) / NS_PER_HOUR
+        is_open = s['run_len'] > 1 and hours >= self.min_hours
+        return {'bird': bird, 'n_fixes': s['n_fixes'],
+                'first': pd.Timestamp(s['first_t']),
+                'last': pd.Timestamp(s['last_t']),
+                'distance_km': s['distance_km'],
+                'max_speed_kmh': s['max_speed_kmh'],
+                'fixes_in_protected': s['fixes_in_protected'],
+                'frac_in_protected': s['fixes_in_protected'] / s['n_fixes'],
+                'n_stopovers': s['n_stopovers'] + is_open,
+                'stopover_hours': s['stopover_hours'] + is_open * hours}
+
+    def stats(self):
+        '''
+        DataFrame of the metrics per bird (what stats.csv holds).
+        '''
+        rows = [self._stats_row(b, s) for b, s in self.state['birds'].items()]
+        stats = pd.DataFrame(rows, columns=STATS_COLUMNS)
+        # | int64 ids when all ids are integers, as `read_tracks` gives.
+        stats['bird'] = bird_ids(stats['bird'])
+        return stats
+
+    # | Fix files and map layers ---------------------------------------
+
+    def _fix_path(self, bird):
+        return self.dir / 'fixes' / f'{_file_stem(bird)}.bin'
+
+    def _append_fixes(self, bird, n_before, fixes):
+        with open(self._fix_path(bird), 'ab') as f:
+            # | Drop what an interrupted update appended after the last
+            # | saved state.
+            f.truncate(n_before * FIX_DTYPE.itemsize)
+            f.write(fixes.tobytes())
+
+    def _read_track(self, name):
+        points, line = [], []
+        data = json.loads((self.dir / 'layers' / name).read_text())
+        for feature in data['features']:
+            if feature['geometry']['type'] == 'MultiPoint':
+                points = feature['geometry']['coordinates']
+            else:
+                line = feature['geometry']['coordinates']
+        return points, line
+
+    def _add_track(self, bird, fixes, previous=None):
+        '''
+        One more track file of `bird` with `fixes`, its path starting at
+        `previous` ([lon, lat] of the fix before them).
+        '''
+        layer = self.state['layers'].setdefault(
+            bird, {'color': bird_color(bird), 'seq': 0, 'files': []})
+        points = np.c_[fixes['lon'], fixes['lat']].round(6).tolist()
+        line = ([previous] if previous else []) + points
+        files = layer['files']
+        while files and files[-1]['n'] <= len(points):
+            last = files.pop()
+            old_points, old_line = self._read_track(last['file'])
+            (self.dir / 'layers' / last['file']).unlink()
+            # | `line` starts at the last fix of the older file.
+            points = old_points + points
+            line = old_line + line[1:] if old_line else line
+        features = [{'type': 'Feature', 'properties': {},
+                     'geometry': {'type': 'MultiPoint',
+                                  'coordinates': points}}]
+        if len(line) > 1:
+            features.append({'type': 'Feature', 'properties': {},
+                             'geometry': {'type': 'LineString',
+                                          'coordinates': line}})
+        name = f"{_file_stem(bird)}-{layer['seq']:06d}.geojson"
+        layer['seq'] += 1
+        _write(self.dir / 'layers' / name, json.dumps(
+            {'type': 'FeatureCollection', 'features': features},
+            separators=(',', ':')))
+        files.append({'file': name, 'n': len(points)})
+
+    def _rebuild(self, bird, fixes):
+        '''
+        A fix of `bird` arrived out of order: recompute the bird from
+        all its fixes.
+        '''
+        s = self.state['birds'][bird]
+        old = np.fromfile(self._fix_path(bird), dtype=FIX_DTYPE)
+        fixes = np.concatenate([old[:s['n_fixes']], fixes])
+        fixes = fixes[np.argsort(fixes['t'], kind='stable')]
+        _write(self._fix_path(bird), fixes.tobytes())
+        s = self.state['birds'][bird] = _new_bird()
+        self._advance(s, fixes)
+        layer = self.state['layers'][bird]
+        for entry in layer['files']:
+            (self.dir / 'layers' / entry['file']).unlink(missing_ok=True)
+        layer['files'] = []
+        self._add_track(bird, fixes)
+
+    def _write_layers(self):
+        birds, layers = self.state['birds'], self.state['layers']
+        positions = [{
+            'type': 'Feature',
+            'properties': {'bird': bird, 'color': layers[bird]['color'],
+                           'time': str(pd.Timestamp(s['last_t'])),
+                           'inside': s['last_inside']},
+            'geometry': {'type': 'Point',
+                         'coordinates': [s['last_lon'], s['last_lat']]}}
+            for bird, s in birds.items()]
+        _write(self.dir / 'layers' / 'positions.geojson', json.dumps(
+            {'type': 'FeatureCollection', 'features': positions}))
+        index = {'positions': 'positions.geojson',
+                 'birds': {bird: {'color': layer['color'],
+                                  'files': [e['file'] for e in layer['files']]}
+                           for bird, layer in layers.items()}}
+        _write(self.dir / 'layers' / 'index.json', json.dumps(index))
+
+    # ------------------------------------------------------------------
+
+    def update(self, path):
+        '''
+        Ingest the rows appended to the CSV `path` since the last update
+        and rewrite the outputs of the birds they belong to.
+
+        Return a summary: new fixes, updated birds, rebuilt birds (out
+        of order fixes) and seconds.
+        '''
+        t0 = time.perf_counter()
+        new = self._read_new(path)
+        summary = {'new_fixes': 0, 'birds': 0, 'rebuilt': 0}
+        if new is None:
+            self._save()
+            return dict(summary, seconds=time.perf_counter() - t0)
+        for sub in ('fixes', 'layers'):
+            (self.dir / sub).mkdir(parents=True, exist_ok=True)
+
+        fixes = np.empty(len(new), dtype=FIX_DTYPE)
+        for name in ('t', 'lon', 'lat'):
+            fixes[name] = new[name].to_numpy()
+        fixes['inside'] = self._inside(fixes['lon'], fixes['lat'])
+        ids = new['bird'].to_numpy()
+        start = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        for lo, hi in zip(start, np.r_[start[1:], len(ids)]):
+            bird, part = ids[lo], fixes[lo:hi]
+            s = self.state['birds'].get(bird)
+            if s is not None and part['t'][0] < s['last_t']:
+                self._rebuild(bird, part)
+                summary['rebuilt'] += 1
+                continue
+            if s is None:
+                s = self.state['birds'][bird] = _new_bird()
+            previous = ([round(s['last_lon'], 6), round(s['last_lat'], 6)]
+                        if s['n_fixes'] else None)
+            self._append_fixes(bird, s['n_fixes'], part)
+            self._advance(s, part)
+            self._add_track(bird, part, previous)
+        summary.update(new_fixes=len(new), birds=len(start))
+
+        self._write_layers()
+        _write(self.dir / 'stats.csv', self.stats().to_csv(index=False))
+        if not (self.dir / 'map.html').exists():
+            birds = self.state['birds'].values()
+            center = [np.mean([s['last_lat'] for s in birds]),
+                      np.mean([s['last_lon'] for s in birds])]
+            incremental_map(self.dir, center)
+        self._save()
+        return dict(summary, seconds=time.perf_counter() - t0)
+
+
+class IncrementalTrackLayer(MacroElement):
+    '''
+    folium layer of the track files listed in layers/index.json: circle
+    markers and paths per bird, and the last position of every bird.
+
+    url : where layers/ is reachable from the HTML file
+
+    index.json and positions.geojson bypass the browser cache; a track
+    file never changes under its name. As with `TiledGeoJson`, serve the
+    state directory over HTTP.
+    '''
+
+    _template = Template(u"""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var opts = {{ this.options|tojson }};
+            var renderer = L.canvas();
+            var get = function(name, init) {
+                return fetch(opts.url + '/' + name, init)
+                    .then(function(r) { return r.json(); });
+            };
+            get('index.json', {cache: 'no-store'}).then(function(index) {
+                Object.keys(index.birds).forEach(function(bird) {
+                    var color = index.birds[bird].color;
+                    index.birds[bird].files.forEach(function(name) {
+                        get(name).then(function(data) {
+                            L.geoJSON(data, {
+                                pointToLayer: function(f, latlng) {
+                                    return L.circleMarker(latlng, {
+                                        renderer: renderer,
+                                        radius: opts.radius,
+                                        stroke: false, fill: true,
+                                        fillColor: color, fillOpacity: 0.7});
+                                },
+                                style: {renderer: renderer, color: color,
+                                        weight: opts.weight}
+                            }).addTo(map);
+                        });
+                    });
+                });
+                get(index.positions, {cache: 'no-store'}).then(function(data) {
+                    L.geoJSON(data, {
+                        pointToLayer: function(f, latlng) {
+                            return L.circleMarker(latlng, {
+                                radius: 2 * opts.radius, color: 'black',
+                                weight: 2, fillColor: f.properties.color,
+                                fillOpacity: 1.0
+                            }).bindTooltip(f.properties.bird + ' '
+                                           + f.properties.time);
+                        }
+                    }).addTo(map);
+                });
+            });
+        })();
+        {% endmacro %}
+        """)
+
+    def __init__(self, url='layers', radius=4, weight=2):
+        super().__init__()
+        self._name = 'IncrementalTrackLayer'
+        self.options = {'url': str(url).rstrip('/'), 'radius': radius,
+                        'weight': weight}
+
+
+def incremental_map(state_dir, center, basemap='OpenStreetMap'):
+    '''
+    Write state_dir/map.html with an `IncrementalTrackLayer` of
+    state_dir/layers.
+    '''
+    import folium
+
+    m = folium.Map(location=center, tiles=basemap, zoom_start=3)
+    IncrementalTrackLayer('layers').add_to(m)
+    m.save(str(Path(state_dir) / 'map.html'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('csv', help='tracking CSV that fixes are appended to')
+    parser.add_argument('--state', default='incremental',
+                        help='state and output directory')
+    parser.add_argument('--data-dir', default=DATA_DIR,
+                        help='course data (for the protected areas)')
+    parser.add_argument('--no-reference', dest='reference',
+                        action='store_false',
+                        help='skip the protected area containment')
+    parser.add_argument('--radius-km', type=float, default=50.0)
+    parser.add_argument('--min-hours', type=float, default=48.0)
+    parser.add_argument('--watch', type=float, default=None, metavar='SECONDS',
+                        help='keep updating every SECONDS')
+    args = parser.parse_args(argv)
+
+    reference = None
+    if args.reference:
+        from geobirds.batch import ReferenceLayers
+        reference = ReferenceLayers.load(args.data_dir)
+    tracks = IncrementalTracks(args.state, reference, args.radius_km,
+                               args.min_hours)
+    while True:
+        summary = tracks.update(args.csv)
+        if summary['new_fixes'] or args.watch is None:
+            print(f"{summary['new_fixes']} new fixes of {summary['birds']} "
+                  f"birds ({summary['rebuilt']} rebuilt) in "
+                  f"{summary['seconds']:.3f} s")
+        if args.watch is None:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+'''
+Bird tracks as one folium layer.
+
+Creating one `folium.CircleMarker` per fix and one `folium.PolyLine` per
+bird means one Python object and one block of JavaScript per fix. Here
+the whole `birds` table becomes a single FeatureCollection with two
+features per bird (a MultiPoint of the fixes and a LineString of the
+path), drawn by Leaflet on one canvas.
+
+`add_tracks` also gives every fix a level of detail (`geobirds.simplify`)
+and the layer draws the path through only the fixes needed at the
+current zoom, while every fix keeps its marker at every zoom.
+'''
+
+import json
+
+import numpy as np
+from branca.element import MacroElement
+from jinja2 import Template
+
+from geobirds.simplify import NEVER, track_lod
+from geobirds.trajectory import TrajectoryStore, track_offsets
+
+
+def track_collection(birds, id_col='tag-local-identifier', color_col='color',
+                     lon_col='location-long', lat_col='location-lat',
+                     decimals=5, lod=None, marker_zoom=None):
+    '''
+    birds       : DataFrame of fixes (time order within each bird)
+    color_col   : column with a CSS color per fix (constant per bird)
+    decimals    : coordinates are rounded to this many decimals
+                  (5 decimals ~ 1 m)
+    lod         : level of detail per row of `birds` (`track_lod`); the
+                  LineString leaves out the fixes with lod NEVER, the
+                  others carry their lod in the `lod` property
+    marker_zoom : zoom from which the MultiPoint has a marker for the
+                  fixes with lod NEVER too (default: the largest lod
+                  that is not NEVER)
+
+    Return a GeoJSON FeatureCollection (dict) with, per bird, a
+    MultiPoint of the fixes and a LineString of the path. Properties are
+    the bird id and its color. Birds come out in the order of their ids,
+    same as `birds.groupby(id_col)`.
+    '''
+    order = np.argsort(birds[id_col].to_numpy(), kind='stable')
+    if lod is not None:
+        lod = np.asarray(lod)[order]
+        on_line = lod != NEVER
+        if marker_zoom is None:
+            marker_zoom = lod[on_line].max(initial=0)
+        marker_lod = np.minimum(lod, marker_zoom)
+    ids = birds[id_col].to_numpy()[order]
+    xy = np.round(np.column_stack([birds[lon_col].to_numpy()[order],
+                                   birds[lat_col].to_numpy()[order]]),
+                  decimals)
+    colors = birds[color_col].to_numpy()[order]
+    uid, offsets = track_offsets(ids)
+
+    features = []
+    coords = xy.tolist()
+    for k, bird in enumerate(uid):
+        lo, hi = offsets[k], offsets[k + 1]
+        c = coords[lo:hi]
+        props = {'id': bird.item() if hasattr(bird, 'item') else bird,
+                 'color': colors[lo]}
+        line_props, c_line = props, c
+        if lod is not None:
+            line = on_line[lo:hi]
+            line_props = dict(props, lod=lod[lo:hi][line].tolist())
+            c_line = xy[lo:hi][line].tolist()
+            props = dict(props, lod=marker_lod[lo:hi].tolist())
+        features.append({'type': 'Feature', 'properties': props,
+                         'geometry': {'type': 'MultiPoint', 'coordinates': c}})
+        if len(c_line) > 1:
+            features.append({'type': 'Feature', 'properties': line_props,
+                             'geometry': {'type': 'LineString',
+                                          'coordinates': c_line}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+class TrackLayer(MacroElement):
+    '''
+    folium layer of a `track_collection`: circle markers for the fixes
+    and polylines for the paths, colored by the `color` property and
+    rendered on a canvas. Features with a `lod` property are redrawn on
+    every zoom with only the fixes of lod <= zoom; below the coarsest lod
+    the map draws that level.
+
+    The defaults match the markers and lines of the notebook maps.
+    '''
+
+    _template = Template(u"""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var opts = {{ this.options|tojson }};
+            var data = {{ this.data }};
+            var renderer = L.canvas();
+            var layer = null;
+            var at_zoom = function(z) {
+                return data.features.map(function(f) {
+                    var lod = f.properties.lod;
+                    if (!lod) { return f; }
+                    var coordinates = f.geometry.coordinates.filter(
+                        function(c, i) { return lod[i] <= z; });
+                    return {type: 'Feature', properties: f.properties,
+                            geometry: {type: f.geometry.type,
+                                       coordinates: coordinates}};
+                });
+            };
+            var draw = function() {
+                if (layer) { map.removeLayer(layer); }
+                layer = L.geoJSON({type: 'FeatureCollection',
+                                   features: at_zoom(Math.max(
+                                       map.getZoom(), opts.min_zoom))}, {
+                    pointToLayer: function(f, latlng) {
+                        return L.circleMarker(latlng, {
+                            renderer: renderer, radius: opts.radius,
+                            stroke: false, fill: true,
+                            fillColor: f.properties.color,
+                            fillOpacity: opts.fill_opacity});
+                    },
+                    style: function(f) {
+                        return {renderer: renderer, color: f.properties.color,
+                                weight: opts.weight, opacity: opts.opacity};
+                    }
+                }).addTo(map);
+            };
+            map.on('zoomend', draw);
+            draw();
+        })();
+        {% endmacro %}
+        """)
+
+    def __init__(self, collection, radius=8, weight=2, opacity=1.0,
+                 fill_opacity=0.7):
+        super().__init__()
+        self._name = 'TrackLayer'
+        self.data = json.dumps(collection, separators=(',', ':'))
+        min_zoom = min((min(f['properties']['lod'], default=0)
+                        for f in collection['features']
+                        if 'lod' in f['properties']), default=0)
+        self.options = {'radius': radius, 'weight': weight,
+                        'opacity': opacity, 'fill_opacity': fill_opacity,
+                        'min_zoom': min_zoom}
+
+
+def add_tracks(m, birds, lod=True, min_zoom=2, max_zoom=12,
+               tolerance_px=1.0, interval=None, **kwargs):
+    '''
+    Shortcut: `TrackLayer(track_collection(birds, **kwargs))` added to
+    map `m`.
+
+    lod          : simplify the paths per zoom (`track_lod` with
+                   `min_zoom`, `max_zoom`, `tolerance_px` and `interval`);
+                   the markers of all fixes are drawn at every zoom
+                   unless `marker_zoom` is given
+    '''
+    if lod:
+        kwargs['lod'] = birds_lod(birds, min_zoom, max_zoom, tolerance_px,
+                                  interval)
+        kwargs.setdefault('marker_zoom', min_zoom)
+    return TrackLayer(track_collection(birds, **kwargs)).add_to(m)
+
+
+def birds_lod(birds, min_zoom=2, max_zoom=12, tolerance_px=1.0,
+              interval=None):
+    '''
+    `track_lod` of a `birds` DataFrame, in the order of its rows.
+    '''
+    store = TrajectoryStore.from_birds(birds.reset_index(drop=True))
+    lod = np.empty(len(birds), dtype=np.int8)
+    lod[store.index] = track_lod(store, min_zoom, max_zoom, tolerance_px,
+                                 interval)
+    return lod
@@ -0,0 +1,137 @@
+'''
+Movement metrics of the birds: step length, speed, heading, and
+stopovers with their dwell time.
+
+Everything works on the arrays of a TrajectoryStore. A step is the move
+from the previous fix of the same bird to this fix; the first fix of a
+bird has no step (NaN).
+'''
+
+import numpy as np
+import pandas as pd
+
+from geobirds.trajectory import ID, as_store
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    '''
+    Great circle distance [km] between points given in degree.
+    '''
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def bearing(lon1, lat1, lon2, lat2):
+    '''
+    Initial heading [degree, 0 = north, clockwise] from point 1 to 2.
+    '''
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    y = np.sin(lon2 - lon1) * np.cos(lat2)
+    x = (np.cos(lat1) * np.sin(lat2)
+         - np.sin(lat1) * np.cos(lat2) * np.cos(lon2 - lon1))
+    return np.degrees(np.arctan2(y, x)) % 360
+
+
+def step_metrics(tracks):
+    '''
+    tracks : TrajectoryStore or `birds` GeoDataFrame
+
+    Return a DataFrame indexed like `birds` with, per fix,
+    `step_km`, `step_s`, `speed_kmh` and `heading_deg` of the step that
+    ends at the fix (heading is NaN when the bird did not move).
+    '''
+    tracks = as_store(tracks)
+    n = tracks.n_fixes
+    i = tracks.segment_index()
+
+    step_km = np.full(n, np.nan)
+    step_s = np.full(n, np.nan)
+    heading = np.full(n, np.nan)
+    step_km[i + 1] = haversine(tracks.lon[i], tracks.lat[i],
+                               tracks.lon[i + 1], tracks.lat[i + 1])
+    step_s[i + 1] = (tracks.t[i + 1] - tracks.t[i]) / np.timedelta64(1, 's')
+    heading[i + 1] = bearing(tracks.lon[i], tracks.lat[i],
+                             tracks.lon[i + 1], tracks.lat[i + 1])
+    heading[step_km == 0] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = np.where(step_s > 0, step_km / (step_s / 3600), np.nan)
+
+    return pd.DataFrame({'step_km': step_km, 'step_s': step_s,
+                         'speed_kmh': speed, 'heading_deg': heading},
+                        index=tracks.index)
+
+
+def stopover_labels(tracks, radius_km=50.0, min_hours=48.0, step_km=None):
+    '''
+    Label the fixes that belong to a stopover.
+
+    A stopover is a run of consecutive fixes of one bird where every step
+    is shorter than `radius_km`, lasting at least `min_hours` from its
+    first to its last fix. (The runs are chained step by step, so a slow
+    drift of many short steps also counts.)
+
+    Return (stopover number per fix, -1 outside stopovers; dwell hours
+    per fix, 0 outside stopovers).
+    '''
+    tracks = as_store(tracks)
+    n = tracks.n_fixes
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    if step_km is None:
+        step_km = step_metrics(tracks)['step_km'].to_numpy()
+
+    # | A new run starts at every long step and at the first fix of a bird
+    # | (where step_km is NaN).
+    new_run = ~(step_km < radius_km)
+    run = np.cumsum(new_run) - 1
+    run_start = np.flatnonzero(new_run)
+    run_end = np.r_[run_start[1:], n] - 1
+    hours = (tracks.t[run_end] - tracks.t[run_start]) / np.timedelta64(1, 'h')
+
+    is_stop = (run_end > run_start) & (hours >= min_hours)
+    stop_number = np.where(is_stop, np.cumsum(is_stop) - 1, -1)
+    label = stop_number[run]
+    dwell = np.where(label >= 0, hours[run], 0.0)
+    return label, dwell
+
+
+def stopovers(tracks, radius_km=50.0, min_hours=48.0):
+    '''
+    One row per stopover: bird, arrival, departure, dwell hours, number
+    of fixes and mean position.
+    '''
+    tracks = as_store(tracks)
+    label, dwell = stopover_labels(tracks, radius_km, min_hours)
+    # | Stopovers are numbered in row order and their fixes are contiguous.
+    rows = np.flatnonzero(label >= 0)
+    k = label[rows]
+    count = np.bincount(k)
+    first = rows[np.r_[0, np.cumsum(count)[:-1]]] if len(k) else rows
+    last = first + count - 1
+    lon = np.bincount(k, weights=tracks.lon[rows]) / np.maximum(count, 1)
+    lat = np.bincount(k, weights=tracks.lat[rows]) / np.maximum(count, 1)
+    return pd.DataFrame({ID: tracks.ids[tracks.bird_of_fix()[first]],
+                         'arrival': tracks.t[first],
+                         'departure': tracks.t[last],
+                         'dwell_h': dwell[first],
+                         'n_fixes': count,
+                         'lon': lon, 'lat': lat})
+
+
+def movement_metrics(tracks, radius_km=50.0, min_hours=48.0):
+    '''
+    `step_metrics` plus `stopover` (number, -1 outside) and `dwell_h`
+    per fix. Indexed like `birds`, so `birds.join(movement_metrics(...))`
+    adds the columns.
+    '''
+    tracks = as_store(tracks)
+    metrics = step_metrics(tracks)
+    label, dwell = stopover_labels(tracks, radius_km, min_hours,
+                                   metrics['step_km'].to_numpy())
+    metrics['stopover'] = label
+    metrics['dwell_h'] = dwell
+    return metrics
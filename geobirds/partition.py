@@ -0,0 +1,396 @@
+'''
+Spatially partitioned layers on disk, for the global WDPA release.
+
+The South American SAPA subset (~4.7k polygons) fits in memory; the
+global release (hundreds of thousands of complex polygons) does not.
+`partition_layer` reads a layer in chunks of rows, twice:
+
+1. the bounding box centers of all features are collected (16 bytes per
+   feature) and mapped onto a Hilbert curve over the extent of the
+   layer; the quantiles of the curve position cut it into partitions of
+   about `rows_per_partition` features that are compact in space;
+2. every chunk is read again and its features are written to the
+   partition they fall in, then the pieces of every partition are merged
+   into one GeoParquet file, in Hilbert order.
+
+`index.json` keeps the bounds and size of every partition. At no time
+more than one chunk or one partition is in memory.
+
+`partitioned_fraction` and `partitioned_containment` then run the
+country x protected area overlay and the fix containment one protected
+partition at a time, loading only the country partitions whose bounds
+meet it (a few kept in an LRU cache), and give the same results as
+`protected_fraction` and `fix_containment` on the whole layers.
+'''
+
+import json
+import shutil
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from geobirds.area import reproject
+from geobirds.cache import CACHE_DIR, cache_key, file_digest, source_files
+from geobirds.containment import local_metric_crs
+from geobirds.geometry import valid_geoms
+from geobirds.overlay import overlay_indexed
+from geobirds.protected import (_region_key, compact_dtypes,
+                                read_protected_areas)
+
+HILBERT_LEVEL = 16
+# | Row of the feature in the (filtered) source layer, so that results
+# | line up with the in-memory path.
+ROW = '_row'
+KEY = '_hilbert'
+
+
+def hilbert_key(x, y, bounds, level=HILBERT_LEVEL):
+    '''
+    Position of the points (x, y) on the Hilbert curve of order `level`
+    that fills `bounds` (minx, miny, maxx, maxy).
+    '''
+    n = 1 << level
+    minx, miny, maxx, maxy = bounds
+    xi = np.clip(((np.asarray(x) - minx) / max(maxx - minx, 1e-12)
+                  * (n - 1)).astype(np.int64), 0, n - 1)
+    yi = np.clip(((np.asarray(y) - miny) / max(maxy - miny, 1e-12)
+                  * (n - 1)).astype(np.int64), 0, n - 1)
+    d = np.zeros(len(xi), dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx = ((xi & s) > 0).astype(np.int64)
+        ry = ((yi & s) > 0).astype(np.int64)
+        d += s * s * ((3 * rx) ^ ry)
+        # | Rotate the quadrant so that the curve stays continuous.
+        turn = ry == 0
+        flip = turn & (rx == 1)
+        xi = np.where(flip, n - 1 - xi, xi)
+        yi = np.where(flip, n - 1 - yi, yi)
+        xi, yi = np.where(turn, yi, xi), np.where(turn, xi, yi)
+        s >>= 1
+    return d
+
+
+def count_features(path):
+    '''
+    Number of features of a vector file, from its header.
+    '''
+    import fiona
+    with fiona.open(path) as src:
+        return len(src)
+
+
+def _chunks(read, n_rows, chunksize):
+    for start in range(0, n_rows, chunksize):
+        yield read(slice(start, min(start + chunksize, n_rows)))
+
+
+class PartitionedLayer:
+    '''
+    A layer written by `partition_layer`.
+
+    root : directory with index.json and one GeoParquet file per
+           partition
+    '''
+
+    def __init__(self, root, cache_partitions=4):
+        self.root = Path(root)
+        self.manifest = json.loads((self.root / 'index.json').read_text())
+        self.bounds = np.array([p['bounds'] for p in self.manifest['parts']],
+                               dtype=float).reshape(-1, 4)
+        self.sizes = np.array([p['rows'] for p in self.manifest['parts']],
+                              dtype=np.int64)
+        self.cache_partitions = cache_partitions
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return int(self.sizes.sum())
+
+    @property
+    def n_partitions(self):
+        return len(self.sizes)
+
+    def read(self, i):
+        '''
+        Partition `i` as a GeoDataFrame (the last `cache_partitions` read
+        are kept).
+        '''
+        if i in self._cache:
+            self._cache.move_to_end(i)
+            return self._cache[i]
+        gdf = gpd.read_parquet(self.root / self.manifest['parts'][i]['file'])
+        self._cache[i] = gdf
+        if len(self._cache) > self.cache_partitions:
+            self._cache.popitem(last=False)
+        return gdf
+
+    def intersecting(self, bounds):
+        '''
+        Partitions whose bounds meet `bounds` (minx, miny, maxx, maxy).
+        '''
+        minx, miny, maxx, maxy = bounds
+        b = self.bounds
+        return np.flatnonzero((b[:, 0] <= maxx) & (b[:, 2] >= minx)
+                              & (b[:, 1] <= maxy) & (b[:, 3] >= miny))
+
+    def select(self, rows):
+        '''
+        The features at `rows` of the source, as one GeoDataFrame in
+        source order.
+        '''
+        rows = np.asarray(rows)
+        frames = []
+        for i in range(self.n_partitions):
+            part = self.read(i)
+            frames.append(part[np.isin(part[ROW].to_numpy(), rows)])
+        return (pd.concat(frames).sort_values(ROW).set_index(ROW)
+                .drop(columns=KEY))
+
+    def attributes(self):
+        '''
+        All columns but the geometry, in source order (one partition in
+        memory at a time).
+        '''
+        frames = [pd.DataFrame(self.read(i).drop(columns='geometry'))
+                  for i in range(self.n_partitions)]
+        return (pd.concat(frames).sort_values(ROW).set_index(ROW)
+                .drop(columns=KEY))
+
+
+def partition_layer(read, n_rows, out_dir, rows_per_partition=20_000,
+                    chunksize=50_000, digest=None, prepare=None):
+    '''
+    read               : function(slice of rows) -> GeoDataFrame; called
+                         twice per chunk and must give the same rows
+    n_rows             : number of features of the source
+    out_dir            : directory of the partitions
+    rows_per_partition : target features per partition
+    chunksize          : features read at a time
+    digest             : identifies source and parameters; the
+                         partitioning is skipped when out_dir already
+                         holds it
+    prepare            : function applied to every partition before it
+                         is written (e.g. `compact_dtypes`), or None
+
+    Return the PartitionedLayer.
+    '''
+    out_dir = Path(out_dir)
+    index_path = out_dir / 'index.json'
+    if digest and index_path.exists():
+        if json.loads(index_path.read_text()).get('digest') == digest:
+            return PartitionedLayer(out_dir)
+
+    t0 = time.perf_counter()
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    pieces_dir = out_dir / 'pieces'
+    pieces_dir.mkdir(parents=True)
+
+    # | Pass 1: bounding box centers. A chunk that the filters of `read`
+    # | leave empty may come without CRS, so the first non-empty one
+    # | gives it.
+    centers, crs = [], None
+    for chunk in _chunks(read, n_rows, chunksize):
+        b = shapely.bounds(np.asarray(chunk.geometry))
+        centers.append(np.column_stack([(b[:, 0] + b[:, 2]) / 2,
+                                        (b[:, 1] + b[:, 3]) / 2]))
+        if crs is None and len(chunk):
+            crs = chunk.crs
+    centers = np.concatenate(centers) if centers else np.empty((0, 2))
+    ok = np.isfinite(centers).all(axis=1)
+    extent = (centers[ok].min(axis=0).tolist() + centers[ok].max(axis=0)
+              .tolist()) if ok.any() else [0.0, 0.0, 1.0, 1.0]
+    keys = hilbert_key(np.where(ok, centers[:, 0], extent[0]),
+                       np.where(ok, centers[:, 1], extent[1]), extent)
+    n_parts = max(1, int(np.ceil(len(keys) / rows_per_partition)))
+    ranks = np.sort(keys)
+    edges = ranks[(np.arange(1, n_parts) * len(keys)) // n_parts]
+    part = np.searchsorted(edges, keys, side='right')
+    del centers, ranks
+
+    # | Pass 2: write every chunk's features to their partitions.
+    offset = 0
+    for k, chunk in enumerate(_chunks(read, n_rows, chunksize)):
+        n = len(chunk)
+        chunk = chunk.reset_index(drop=True)
+        chunk[ROW] = np.arange(offset, offset + n)
+        chunk[KEY] = keys[offset:offset + n]
+        chunk_part = part[offset:offset + n]
+        for p in np.unique(chunk_part):
+            chunk[chunk_part == p].to_parquet(
+                pieces_dir / f'{p:05d}-{k:05d}.parquet')
+        offset += n
+
+    parts = []
+    for p in range(n_parts):
+        files = sorted(pieces_dir.glob(f'{p:05d}-*.parquet'))
+        if not files:
+            continue
+        gdf = pd.concat([gpd.read_parquet(f) for f in files])
+        gdf = gdf.sort_values(KEY).reset_index(drop=True)
+        if prepare is not None:
+            gdf = prepare(gdf.drop(columns=[ROW, KEY])).assign(
+                **{ROW: gdf[ROW], KEY: gdf[KEY]})
+        name = f'part-{p:05d}.parquet'
+        gdf.to_parquet(out_dir / name)
+        bounds = shapely.total_bounds(np.asarray(gdf.geometry))
+        parts.append({'file': name, 'rows': len(gdf),
+                      'bounds': [float(v) for v in bounds]})
+        for f in files:
+            f.unlink()
+    pieces_dir.rmdir()
+
+    manifest = {'digest': digest, 'rows': int(offset),
+                'crs': crs.to_string() if crs else None,
+                'hilbert_extent': extent, 'parts': parts,
+                'seconds': time.perf_counter() - t0}
+    tmp = index_path.with_name('index.json.tmp')
+    tmp.write_text(json.dumps(manifest, indent=1))
+    tmp.replace(index_path)
+    return PartitionedLayer(out_dir)
+
+
+def _partition_dir(name, digest, params, cache_dir):
+    cache_dir = Path(cache_dir or CACHE_DIR).expanduser()
+    return (cache_dir / 'partitions'
+            / f'{name}-{digest[:16]}-{cache_key(**params)}')
+
+
+def partition_file(path, name=None, rows_per_partition=20_000,
+                   chunksize=50_000, cache_dir=None):
+    '''
+    Partition any vector file that `geopandas.read_file` reads, e.g. the
+    world borders. Kept in the cache directory, keyed by its content.
+    '''
+    params = dict(rows_per_partition=rows_per_partition)
+    digest = file_digest(source_files(path), cache_dir=cache_dir)
+    out_dir = _partition_dir(name or Path(path).stem, digest, params,
+                             cache_dir)
+    return partition_layer(lambda rows: gpd.read_file(path, rows=rows),
+                           count_features(path), out_dir,
+                           rows_per_partition, chunksize,
+                           digest=f'{digest}-{cache_key(**params)}')
+
+
+def partition_protected_areas(path, tolerance=0.02, preserve_topology=False,
+                              land_only=False, columns=None, bbox=None,
+                              compact=False, rows_per_partition=20_000,
+                              chunksize=50_000, cache_dir=None, digest=None):
+    '''
+    Partition the WDPA layer, read chunk by chunk with
+    `read_protected_areas` (same parameters, so the partitions hold the
+    rows of `load_protected_areas`). Every chunk of rows is filtered by
+    `bbox`; `compact` is applied per partition, so the categories of a
+    column may differ between partitions. `digest` is the content hash
+    of the source if `path` is not a local file.
+    '''
+    params = dict(tolerance=tolerance, preserve_topology=preserve_topology,
+                  land_only=land_only, columns=columns and sorted(columns),
+                  bbox=_region_key(bbox), compact=compact,
+                  rows_per_partition=rows_per_partition)
+    digest = digest or file_digest(source_files(path), cache_dir=cache_dir)
+    out_dir = _partition_dir('protected_areas', digest, params, cache_dir)
+
+    def read(rows):
+        return read_protected_areas(path, tolerance=tolerance,
+                                    preserve_topology=preserve_topology,
+                                    land_only=land_only, columns=columns,
+                                    bbox=bbox, rows=rows)
+    return partition_layer(read, count_features(path), out_dir,
+                           rows_per_partition, chunksize,
+                           digest=f'{digest}-{cache_key(**params)}',
+                           prepare=compact_dtypes if compact else None)
+
+
+def partitioned_fraction(countries, protected, crs=None, country_rows=None):
+    '''
+    countries    : PartitionedLayer of the country borders
+    protected    : PartitionedLayer of the protected areas (same CRS)
+    crs          : metric CRS of the overlay, as in `protected_fraction`
+    country_rows : rows of `countries` to report (default: all), e.g.
+                   the South American ones
+
+    Return a DataFrame like `protected_fraction` (without geometry),
+    indexed by the row of the country in its source.
+    '''
+    unit = 1 if crs is None else 10**6
+    n = len(countries)
+    p_area = np.zeros(n)
+    area = np.zeros(n)
+    keep = np.ones(n, dtype=bool)
+    if country_rows is not None:
+        keep[:] = False
+        keep[np.asarray(country_rows)] = True
+
+    def geoms(gdf):
+        return valid_geoms(gdf if crs is None else reproject(gdf, crs))
+
+    for c in range(countries.n_partitions):
+        part = countries.read(c)
+        area[part[ROW].to_numpy()] = shapely.area(geoms(part)) / unit
+
+    for p in range(protected.n_partitions):
+        prot = protected.read(p)
+        prot_geoms = geoms(prot)
+        for c in countries.intersecting(protected.bounds[p]):
+            part = countries.read(c)
+            rows = part[ROW].to_numpy()
+            wanted = keep[rows]
+            if not wanted.any():
+                continue
+            p_area[rows[wanted]] += overlay_indexed(
+                geoms(part)[wanted], prot_geoms) / unit
+
+    out = countries.attributes()
+    out['protected_area_total'] = p_area
+    out['area_total'] = area
+    out['protected_area_fraction'] = p_area / area
+    return out[keep]
+
+
+def partitioned_containment(birds, protected, crs=None):
+    '''
+    Same as `fix_containment` (without `max_distance`), with the
+    protected areas read one partition at a time; `protected_index` is
+    the row in the source layer.
+    '''
+    crs = crs or local_metric_crs(birds)
+    x, y = shapely.get_coordinates(np.asarray(birds.geometry)).T
+    points = np.asarray(reproject(birds, crs))
+    n = len(points)
+    n_protected = np.zeros(n, dtype=np.int64)
+    protected_index = np.full(n, -1)
+    boundary_dist = np.full(n, np.inf)
+
+    for p in range(protected.n_partitions):
+        prot = protected.read(p)
+        polygons = valid_geoms(reproject(prot, crs))
+        rows = prot[ROW].to_numpy()
+
+        minx, miny, maxx, maxy = protected.bounds[p]
+        inside = np.flatnonzero((x >= minx) & (x <= maxx)
+                                & (y >= miny) & (y <= maxy))
+        if len(inside):
+            i_point, i_poly = shapely.STRtree(polygons).query(
+                points[inside], predicate='intersects')
+            n_protected += np.bincount(inside[i_point], minlength=n)
+            first = protected_index[inside[i_point]] < 0
+            protected_index[inside[i_point][first][::-1]] = \
+                rows[i_poly[first][::-1]]
+
+        i_near, dist = shapely.STRtree(shapely.boundary(polygons)
+                                       ).query_nearest(
+            points, return_distance=True, all_matches=False)
+        boundary_dist[i_near[0]] = np.minimum(boundary_dist[i_near[0]], dist)
+
+    boundary_dist[np.isinf(boundary_dist)] = np.nan
+    return pd.DataFrame({'in_protected': n_protected > 0,
+                         'n_protected': n_protected,
+                         'protected_index': protected_index,
+                         'boundary_dist_m': boundary_dist},
+                        index=birds.index)
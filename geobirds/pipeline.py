@@ -0,0 +1,205 @@
+'''
+Headless batch run of the notebook's maps and plots.
+
+    python -m geobirds.pipeline [--data-dir DIR] [--out-dir DIR]
+                                [--workers N] [--only m_1 p_1 ...]
+                                [--tiles]
+
+The inputs (tracks, layers, overlay) are loaded once; then every
+artifact (m_1 ... m_4, p_1, p_2) is built and written in a process pool,
+each exactly once. Nothing opens a browser or needs IPython, so it runs
+in scheduled jobs. `manifest.json` in the output directory lists the
+time to load every input and, per artifact, the time to build and to
+write it and the size of the file.
+
+With `--tiles`, m_2 and m_3 fetch the protected areas from XYZ tiles
+under out_dir/tiles (`geobirds.tiles`) instead of embedding them; those
+maps then have to be served over HTTP, e.g. `python -m http.server`.
+'''
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from geobirds.figures import (area_bar, fraction_bar, hotspot_map,
+                              protected_map, save, track_map)
+from geobirds.hotspots import hotspots
+from geobirds.profiling import stage
+from geobirds.stages import (DATA_DIR, americas, americas_bbox,
+                             country_overlay, load_birds, load_protected,
+                             load_world)
+
+ARTIFACTS = {}
+
+
+def register_artifact(name):
+    '''
+    Decorator: `func(inputs, out_dir)` builds the artifact written to
+    out_dir/`name`.html.
+    '''
+    def register(func):
+        ARTIFACTS[name] = func
+        return func
+    return register
+
+
+@register_artifact('m_1')
+def _m_1(inputs, out_dir):
+    return track_map(inputs['americas'], inputs['birds'], inputs['center'])
+
+
+@register_artifact('m_2')
+def _m_2(inputs, out_dir):
+    return protected_map(inputs['protected_areas'], inputs['center'],
+                         tiled=inputs['tiled'], out_dir=out_dir,
+                         name='protected_areas')
+
+
+@register_artifact('m_3')
+def _m_3(inputs, out_dir):
+    return protected_map(inputs['protected_areas_on_land'], inputs['center'],
+                         birds=inputs['birds'], tiles=inputs['basemap'],
+                         tiled=inputs['tiled'], out_dir=out_dir,
+                         name='protected_areas_on_land')
+
+
+@register_artifact('m_4')
+def _m_4(inputs, out_dir):
+    return hotspot_map(hotspots(inputs['tracks']), inputs['center'])
+
+
+@register_artifact('p_1')
+def _p_1(inputs, out_dir):
+    return fraction_bar(inputs['south_america'], inputs['p_frac'])
+
+
+@register_artifact('p_2')
+def _p_2(inputs, out_dir):
+    return area_bar(inputs['south_america'])
+
+
+def load_inputs(data_dir=DATA_DIR, engine='indexed', tiled=False, seed=0):
+    '''
+    Everything the artifacts need, from the stages of `geobirds.stages`.
+    Return (inputs dict, seconds per step).
+    '''
+    seconds = {}
+
+    def step(name, func):
+        t0 = time.perf_counter()
+        out = func()
+        seconds[name] = time.perf_counter() - t0
+        return out
+
+    tracks, birds = step('tracks', lambda: load_birds(data_dir, seed))
+    world = step('world', load_world)
+    bbox = americas_bbox(world)
+    protected = step('protected_areas',
+                     lambda: load_protected(data_dir, bbox))
+    on_land = step('protected_areas_on_land', lambda: load_protected(
+        data_dir, bbox, land_only=True))
+    south_america, p_frac = step('south_america', lambda: country_overlay(
+        world, on_land, protected, engine))
+    inputs = {'tiled': tiled, 'tracks': tracks, 'birds': birds,
+              'center': [birds['location-lat'].mean(),
+                         birds['location-long'].mean()],
+              'world': world, 'americas': americas(world),
+              'protected_areas': protected,
+              'protected_areas_on_land': on_land,
+              'south_america': south_america, 'p_frac': p_frac}
+    return inputs, seconds
+
+
+# | Set in every worker by `_init_worker`, so the inputs are sent once
+# | per worker, not once per artifact.
+_WORKER = {}
+
+
+def _init_worker(inputs, out_dir):
+    _WORKER['inputs'] = inputs
+    _WORKER['out_dir'] = out_dir
+
+
+def build_artifact(name, inputs=None, out_dir=None):
+    '''
+    Build artifact `name` and write it to out_dir/`name`.html. Return its
+    manifest entry.
+    '''
+    inputs = _WORKER['inputs'] if inputs is None else inputs
+    out_dir = Path(_WORKER['out_dir'] if out_dir is None else out_dir)
+    t0 = time.perf_counter()
+    with stage(f'build {name}'):
+        artifact = ARTIFACTS[name](inputs, out_dir)
+    t1 = time.perf_counter()
+    path = out_dir / f'{name}.html'
+    with stage(f'write {name}') as rec:
+        n_bytes = rec['bytes'] = save(artifact, path)
+    t2 = time.perf_counter()
+    return {'name': name, 'path': str(path), 'build_s': t1 - t0,
+            'write_s': t2 - t1, 'bytes': n_bytes, 'pid': os.getpid()}
+
+
+def run_pipeline(data_dir=DATA_DIR, out_dir='.', only=None, workers=None,
+                 engine='indexed', tiled=False, basemap='Stamen Terrain'):
+    '''
+    Load the inputs once, build the artifacts `only` (default: all) in
+    `workers` processes (1: in this process) and write
+    out_dir/manifest.json. `basemap` is the folium tiles of m_3; `tiled`
+    puts the protected areas of m_2 and m_3 into XYZ tiles. Return the
+    manifest.
+    '''
+    t0 = time.perf_counter()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    names = list(only or ARTIFACTS)
+    unknown = set(names) - set(ARTIFACTS)
+    if unknown:
+        raise ValueError(f'unknown artifacts {sorted(unknown)}, '
+                         f'choose from {sorted(ARTIFACTS)}')
+    inputs, load_s = load_inputs(data_dir, engine=engine, tiled=tiled)
+    inputs['basemap'] = basemap
+
+    if workers == 1:
+        records = [build_artifact(name, inputs, out_dir) for name in names]
+    else:
+        with ProcessPoolExecutor(workers or min(len(names), os.cpu_count()),
+                                 initializer=_init_worker,
+                                 initargs=(inputs, out_dir)) as pool:
+            futures = [pool.submit(build_artifact, name) for name in names]
+            records = [f.result() for f in as_completed(futures)]
+        records.sort(key=lambda r: names.index(r['name']))
+
+    manifest = {'inputs_s': load_s, 'artifacts': records,
+                'total_s': time.perf_counter() - t0}
+    path = out_dir / 'manifest.json'
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, path)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--out-dir', default='.')
+    parser.add_argument('--only', nargs='+', choices=sorted(ARTIFACTS))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--engine', default='indexed')
+    parser.add_argument('--tiles', dest='tiled', action='store_true',
+                        help='protected areas as XYZ tiles (needs HTTP)')
+    parser.add_argument('--basemap', default='Stamen Terrain')
+    args = parser.parse_args(argv)
+    manifest = run_pipeline(args.data_dir, args.out_dir, args.only,
+                            args.workers, args.engine, args.tiled,
+                            args.basemap)
+    for r in manifest['artifacts']:
+        print(f"{r['name']}  build {r['build_s']:.3f} s  "
+              f"write {r['write_s']:.3f} s  {r['bytes']} bytes")
+    print(f"total {manifest['total_s']:.3f} s")
+
+
+if __name__ == '__main__':
+    main()
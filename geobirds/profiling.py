@@ -0,0 +1,197 @@
+'''
+Stage-level timing and memory of a run.
+
+    with stage('read_tracks') as rec:
+        tracks = read_tracks(path)
+        rec['rows'] = len(tracks)
+
+    @profiled('overlay')          # rows = len(result), if it has one
+    def overlay(...): ...
+
+Profiling is off unless `GEOBIRDS_PROFILE` names a JSON-lines file (or
+`enable` is called); then `stage` and `profiled` cost one dict lookup
+and a `nullcontext`. When on, every stage appends one line with
+
+    stage, wall_s, cpu_s, peak_rss_mb (high-water mark of the process
+    after the stage), rss_growth_mb (how much the stage raised it),
+    rows / geometries (if given), pid
+
+and, with `GEOBIRDS_PROFILE_MEMORY=1`, `alloc_mb` / `alloc_peak_mb`
+from tracemalloc (Python allocations only, and slow, so off by
+default). `GEOBIRDS_PROFILE_STAGE=NAME` also runs stage NAME under
+cProfile and writes NAME.prof next to the JSON-lines file.
+
+Worker processes inherit the environment and append to the same file.
+`python -m geobirds.profiling FILE` (or `python -m geobirds profile
+FILE`) prints the summary per stage.
+'''
+
+import argparse
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from pathlib import Path
+
+# | ru_maxrss is in KiB on Linux, in bytes on macOS.
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+_CONFIG = {}
+# | tracemalloc has one peak per process, and every stage resets it. The
+# | peak of an open stage from before a nested stage reset it is kept
+# | here, one entry per open stage with memory tracing.
+_PEAKS = []
+
+
+def enable(path, memory=False, cprofile=None):
+    '''
+    path     : JSON-lines file the stages are appended to
+    memory   : also trace Python allocations (tracemalloc)
+    cprofile : name of one stage to run under cProfile
+    '''
+    _CONFIG.update(path=Path(path), memory=memory, cprofile=cprofile)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    _CONFIG.clear()
+
+
+def enabled():
+    return 'path' in _CONFIG
+
+
+def _peak_rss_mb():
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+            / 2**20)
+
+
+@contextmanager
+def _stage(name, counts):
+    rec = dict(counts)
+    memory = _CONFIG['memory'] and tracemalloc.is_tracing()
+    profile = cProfile.Profile() if _CONFIG['cprofile'] == name else None
+    if memory:
+        alloc0, peak0 = tracemalloc.get_traced_memory()
+        if _PEAKS:
+            _PEAKS[-1] = max(_PEAKS[-1], peak0)
+        _PEAKS.append(0)
+        tracemalloc.reset_peak()
+    rss0 = _peak_rss_mb()
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    if profile:
+        profile.enable()
+    try:
+        yield rec
+    finally:
+        if profile:
+            profile.disable()
+        wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+        rss = _peak_rss_mb()
+        out = {'stage': name, 'wall_s': wall, 'cpu_s': cpu,
+               'peak_rss_mb': rss, 'rss_growth_mb': rss - rss0}
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, _PEAKS.pop())
+            out.update(alloc_mb=(current - alloc0) / 2**20,
+                       alloc_peak_mb=(peak - alloc0) / 2**20)
+        out.update(rec, pid=os.getpid())
+        path = _CONFIG['path']
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(json.dumps(out, default=str) + '\n')
+        if profile:
+            profile.dump_stats(str(path.with_name(f'{name}.prof')))
+
+
+def stage(name, **counts):
+    '''
+    Context manager that records stage `name` (when profiling is on).
+    It yields a dict; counts put there (rows=..., geometries=...) are
+    written with the stage.
+    '''
+    if 'path' not in _CONFIG:
+        return nullcontext({})
+    return _stage(name, counts)
+
+
+def profiled(name=None):
+    '''
+    Decorator: record every call of the function as stage `name`
+    (default: the function name), with `rows` = len(result).
+    '''
+    def wrap(func):
+        label = name or func.__name__
+
+        @wraps(func)
+        def run(*args, **kwargs):
+            if 'path' not in _CONFIG:
+                return func(*args, **kwargs)
+            with _stage(label, {}) as rec:
+                result = func(*args, **kwargs)
+                if hasattr(result, '__len__'):
+                    rec['rows'] = len(result)
+                return result
+        return run
+    return wrap
+
+
+def read_records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summary(records):
+    '''
+    One row per stage: calls and the total / max of the measures.
+    '''
+    rows = {}
+    for r in records:
+        s = rows.setdefault(r['stage'], {
+            'stage': r['stage'], 'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+            'peak_rss_mb': 0.0, 'rss_growth_mb': 0.0, 'alloc_peak_mb': 0.0,
+            'rows': 0})
+        s['calls'] += 1
+        for k in ('wall_s', 'cpu_s', 'rows'):
+            s[k] += r.get(k, 0)
+        for k in ('peak_rss_mb', 'rss_growth_mb', 'alloc_peak_mb'):
+            s[k] = max(s[k], r.get(k, 0.0))
+    return sorted(rows.values(), key=lambda s: -s['wall_s'])
+
+
+def format_summary(rows):
+    if not rows:
+        return 'no stages recorded'
+    columns = ['stage', 'calls', 'wall_s', 'cpu_s', 'peak_rss_mb',
+               'rss_growth_mb', 'alloc_peak_mb', 'rows']
+    cells = [[f'{r[c]:.3f}' if isinstance(r[c], float) else f'{r[c]}'
+              for c in columns] for r in rows]
+    width = [max(len(c), *(len(row[i]) for row in cells))
+             for i, c in enumerate(columns)]
+    lines = ['  '.join(c.rjust(w) for c, w in zip(columns, width))]
+    lines += ['  '.join(v.rjust(w) for v, w in zip(row, width))
+              for row in cells]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('path', help='JSON-lines file of a profiled run')
+    args = parser.parse_args(argv)
+    print(format_summary(summary(read_records(args.path))))
+
+
+if os.environ.get('GEOBIRDS_PROFILE'):
+    enable(os.environ['GEOBIRDS_PROFILE'],
+           memory=os.environ.get('GEOBIRDS_PROFILE_MEMORY', '') not in
+           ('', '0'),
+           cprofile=os.environ.get('GEOBIRDS_PROFILE_STAGE') or None)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+'''
+Loading of the WDPA protected area layer.
+'''
+
+import hashlib
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+from geobirds.cache import cached_frame, file_digest, source_files
+
+# | Attribute columns the notebook actually uses (NAME for the areas
+# | that cover the hotspots, `hotspot_protection`).
+PIPELINE_COLUMNS = ['NAME', 'REP_AREA', 'REP_M_AREA', 'MARINE']
+
+
+def compact_dtypes(df, max_category_ratio=0.5):
+    '''
+    Shrink the attribute columns in place: string codes with few distinct
+    values (MARINE, IUCN_CAT, STATUS, ISO3, ...) become categoricals,
+    floats become float32 and integers the smallest integer type.
+    '''
+    for col in df.columns:
+        if col == df.geometry.name:
+            continue
+        s = df[col]
+        if s.dtype == object:
+            if len(s) and s.nunique() <= max_category_ratio * len(s):
+                df[col] = s.astype('category')
+        elif pd.api.types.is_float_dtype(s):
+            df[col] = s.astype('float32')
+        elif pd.api.types.is_integer_dtype(s):
+            df[col] = pd.to_numeric(s, downcast='integer')
+    return df
+
+
+def read_protected_areas(path, tolerance=0.02, preserve_topology=False,
+                         land_only=False, columns=None, bbox=None, mask=None,
+                         compact=False, rows=None):
+    '''
+    Read the shapefile and simplify the polygons (no cache).
+
+    tolerance : simplify tolerance in the units of the layer (degree).
+                None or 0 keeps the original polygons.
+    land_only : drop the purely marine areas (MARINE == '2')
+    columns   : attribute columns to read (e.g. PIPELINE_COLUMNS).
+                None reads all of them.
+    bbox      : (minx, miny, maxx, maxy) or GeoDataFrame; read only the
+                features that intersect it
+    mask      : geometry or GeoDataFrame; same as bbox, but with the
+                exact shape
+    compact   : store the attributes in compact dtypes (`compact_dtypes`)
+    rows      : slice of the features to read (e.g. one chunk of a large
+                file, see `geobirds.partition`)
+    '''
+    kwargs = {} if rows is None else {'rows': rows}
+    if columns is not None:
+        columns = list(columns)
+        if land_only and 'MARINE' not in columns:
+            columns.append('MARINE')
+        kwargs['include_fields'] = columns
+    protected_areas = gpd.read_file(path, bbox=bbox, mask=mask, **kwargs)
+    if land_only:
+        protected_areas = protected_areas[
+            protected_areas['MARINE'] != '2'].reset_index(drop=True)
+    if tolerance:
+        protected_areas['geometry'] = protected_areas['geometry'].simplify(
+            tolerance, preserve_topology=preserve_topology)
+    if compact:
+        compact_dtypes(protected_areas)
+    return protected_areas
+
+
+def _region_key(region):
+    '''
+    Something hashable that identifies a bbox / mask argument.
+    '''
+    if region is None:
+        return None
+    if isinstance(region, (gpd.GeoDataFrame, gpd.GeoSeries)):
+        region = shapely.union_all(region.geometry.values)
+    if isinstance(region, shapely.Geometry):
+        return hashlib.sha256(shapely.to_wkb(region)).hexdigest()
+    return [float(v) for v in region]
+
+
+def load_protected_areas(path, tolerance=0.02, preserve_topology=False,
+                         land_only=False, columns=None, bbox=None, mask=None,
+                         compact=False, cache=True, cache_dir=None,
+                         digest=None):
+    '''
+    Same as `read_protected_areas`, but the result is kept in the on-disk
+    cache (see `geobirds.cache`) keyed by the content of the shapefile
+    and the parameters above. `cache=False` always reads the shapefile.
+    `digest` is the content hash of the source when `path` is not a
+    local file (e.g. a member of a zip, `geobirds.datastore`).
+    '''
+    params = dict(tolerance=tolerance, preserve_topology=preserve_topology,
+                  land_only=land_only, columns=columns, bbox=bbox, mask=mask,
+                  compact=compact)
+    if not cache:
+        return read_protected_areas(path, **params)
+
+    key_params = dict(params, columns=columns and sorted(columns),
+                      bbox=_region_key(bbox), mask=_region_key(mask))
+    digest = digest or file_digest(source_files(path), cache_dir=cache_dir)
+    return cached_frame('protected_areas', digest, key_params,
+                        lambda: read_protected_areas(path, **params),
+                        cache_dir=cache_dir)
@@ -0,0 +1,199 @@
+'''
+Rasterized protected areas for quick exploration.
+
+The countries and the protected areas are burned into a grid of square
+cells in a metric (equal-area) CRS: one int32 array with the country of
+every cell and one uint8 array that is 1 where the cell center lies in
+any protected area. Both are memory-mapped .npy files in the cache, so a
+second run only maps them. Per-country protected fractions are then
+`bincount`s over the arrays, and whether a bird fix is in a protected
+area is one array lookup.
+
+Error bounds. A cell is counted when its center is inside, so only cells
+whose center lies within h / sqrt(2) of a boundary (h = cell size) can
+be misclassified. The protected area of a country is therefore off by
+at most sqrt(2) * h * (perimeter of the country + perimeter of the
+protected areas in it), see `error_bound`. The raster counts overlapping
+designations once, so it approximates the dissolved footprint
+(`geobirds.dissolve`), not the sum over single polygons of the `loop` /
+`indexed` engines. A point lookup is exact except for points within
+h / sqrt(2) of a boundary.
+
+The bound is conservative, since the errors along a boundary mostly
+cancel: benchmarks/bench_raster.py measures ~1 % of the total protected
+area at 500 cells across South America (15 km cells) and < 0.1 % at
+2000 cells (4 km).
+'''
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from geobirds.area import reproject
+from geobirds.cache import cached_array
+from geobirds.overlay import candidate_pairs, register_engine
+
+DEFAULT_CELLS = 2000
+
+
+class Grid:
+    '''
+    Square cells of size `cell` with the upper left corner at (x0, y1),
+    `shape` = (rows, columns). Row 0 is the northernmost.
+    '''
+
+    def __init__(self, x0, y1, cell, shape):
+        self.x0, self.y1, self.cell = float(x0), float(y1), float(cell)
+        self.shape = tuple(int(n) for n in shape)
+
+    @classmethod
+    def covering(cls, geoms, cell=None, n_cells=DEFAULT_CELLS):
+        '''
+        Grid over the extent of `geoms`. Without `cell`, the longer side
+        gets `n_cells` cells.
+        '''
+        minx, miny, maxx, maxy = shapely.total_bounds(geoms)
+        cell = cell or max(maxx - minx, maxy - miny) / n_cells
+        x0 = np.floor(minx / cell) * cell
+        y1 = np.ceil(maxy / cell) * cell
+        shape = (int(np.ceil((y1 - miny) / cell)),
+                 int(np.ceil((maxx - x0) / cell)))
+        return cls(x0, y1, cell, shape)
+
+    @property
+    def params(self):
+        return dict(x0=self.x0, y1=self.y1, cell=self.cell, shape=self.shape)
+
+    @property
+    def cell_area(self):
+        return self.cell ** 2
+
+    def index(self, x, y):
+        '''
+        (row, column) of the cells of points (x, y); -1 outside the grid.
+        '''
+        col = np.floor((np.asarray(x) - self.x0) / self.cell).astype(np.int64)
+        row = np.floor((self.y1 - np.asarray(y)) / self.cell).astype(np.int64)
+        out = ((row < 0) | (row >= self.shape[0])
+               | (col < 0) | (col >= self.shape[1]))
+        row[out] = -1
+        col[out] = -1
+        return row, col
+
+    def burn(self, geoms, out, values):
+        '''
+        Set `out` to values[k] in the cells whose center lies in geoms[k].
+        Only the cells within the bounding box of each geometry are
+        tested, all at once with `shapely.contains_xy`.
+        '''
+        bounds = shapely.bounds(geoms)
+        for k, geom in enumerate(geoms):
+            if geom is None or shapely.is_empty(geom):
+                continue
+            r0, c0 = self._clip_index(bounds[k, 0], bounds[k, 3])
+            r1, c1 = self._clip_index(bounds[k, 2], bounds[k, 1])
+            if r1 < r0 or c1 < c0:
+                continue
+            xs = self.x0 + (np.arange(c0, c1 + 1) + 0.5) * self.cell
+            ys = self.y1 - (np.arange(r0, r1 + 1) + 0.5) * self.cell
+            shapely.prepare(geom)
+            inside = shapely.contains_xy(geom, xs[None, :], ys[:, None])
+            window = out[r0:r1 + 1, c0:c1 + 1]
+            window[inside] = values[k]
+
+    def _clip_index(self, x, y):
+        col = int(np.floor((x - self.x0) / self.cell))
+        row = int(np.floor((self.y1 - y) / self.cell))
+        return (min(max(row, 0), self.shape[0] - 1),
+                min(max(col, 0), self.shape[1] - 1))
+
+
+def _geoms_digest(geoms):
+    return hashlib.sha256(b''.join(shapely.to_wkb(geoms))).hexdigest()
+
+
+def country_raster(grid, country_geoms, cache_dir=None):
+    '''
+    int32 array: index of the country of every cell, -1 for none.
+    '''
+    def fill(out):
+        out[:] = -1
+        grid.burn(country_geoms, out, np.arange(len(country_geoms)))
+    return cached_array('raster_country', _geoms_digest(country_geoms),
+                        grid.params, grid.shape, np.int32, fill, cache_dir)
+
+
+def protected_raster(grid, protected_geoms, cache_dir=None):
+    '''
+    uint8 array: 1 where the cell center is in any protected area.
+    '''
+    def fill(out):
+        grid.burn(protected_geoms, out, np.ones(len(protected_geoms)))
+    return cached_array('raster_protected', _geoms_digest(protected_geoms),
+                        grid.params, grid.shape, np.uint8, fill, cache_dir)
+
+
+@register_engine('raster')
+def overlay_raster(country_geoms, protected_geoms, cell=None,
+                   n_cells=DEFAULT_CELLS, cache_dir=None):
+    '''
+    Protected area per country from the rasters (see the module
+    docstring for the error bounds). Use it with a metric `crs` in
+    `protected_fraction`; `cell` is in the units of that CRS.
+    '''
+    grid = Grid.covering(country_geoms, cell, n_cells)
+    country = country_raster(grid, country_geoms, cache_dir)
+    protected = protected_raster(grid, protected_geoms, cache_dir)
+    n = len(country_geoms)
+    p_cells = np.zeros(n)
+    # | Row by row keeps the memory small for big grids.
+    for row in range(0, grid.shape[0], 256):
+        c = np.asarray(country[row:row + 256]).ravel()
+        p = np.asarray(protected[row:row + 256]).ravel()
+        keep = c >= 0
+        p_cells += np.bincount(c[keep], weights=p[keep], minlength=n)
+    return p_cells * grid.cell_area
+
+
+def error_bound(country_geoms, protected_geoms, cell):
+    '''
+    Upper bound of |raster - exact footprint| of the protected area per
+    country: sqrt(2) * cell * (perimeter of the country + perimeters of
+    the protected areas that touch it).
+    '''
+    i_c, i_p = candidate_pairs(country_geoms, protected_geoms)
+    perimeter = shapely.length(country_geoms) + np.bincount(
+        i_c, weights=shapely.length(protected_geoms[i_p]),
+        minlength=len(country_geoms))
+    return np.sqrt(2) * cell * perimeter
+
+
+class RasterMask:
+    '''
+    Point lookups in the protected area raster.
+
+    protected : GeoDataFrame of the protected areas
+    crs       : metric CRS of the grid
+    cell      : cell size in the units of `crs` (default: the longer side
+                of the extent / DEFAULT_CELLS)
+    '''
+
+    def __init__(self, protected, crs, cell=None, cache_dir=None):
+        self.crs = crs
+        geoms = np.asarray(reproject(protected, crs))
+        self.grid = Grid.covering(geoms, cell)
+        self.mask = protected_raster(self.grid, geoms, cache_dir)
+
+    def contains(self, birds):
+        '''
+        Boolean Series (indexed like `birds`): the fix is in a protected
+        area cell.
+        '''
+        xy = shapely.get_coordinates(np.asarray(reproject(birds, self.crs)))
+        row, col = self.grid.index(xy[:, 0], xy[:, 1])
+        inside = np.zeros(len(xy), dtype=bool)
+        ok = row >= 0
+        inside[ok] = self.mask[row[ok], col[ok]] > 0
+        return pd.Series(inside, index=birds.index, name='in_protected')
@@ -0,0 +1,148 @@
+'''
+Simplified bird tracks for rendering.
+
+High-frequency tags give thousands of fixes per bird, far more than the
+screen can show at continental zoom levels. Here every fix gets a level
+of detail: the lowest zoom at which it is needed, so that a map at zoom
+z only draws the fixes with lod <= z.
+
+- `thin_by_time` keeps at most one fix per bird and time interval.
+- `douglas_peucker` runs Douglas-Peucker on all birds at once: every
+  pass splits all open ranges of all birds at their farthest fix with
+  a few array operations, so the Python loop runs once per level of
+  recursion, not once per range.
+- `track_lod` runs it from the coarsest to the finest zoom with a
+  tolerance of `tolerance_px` screen pixels, each zoom refining the
+  fixes kept by the previous one; `lod_report` counts what is left.
+
+Distances are taken in web mercator, in degree of longitude (same units
+as `geobirds.tiles.pixel_size`), i.e. in screen pixels at every zoom.
+'''
+
+import numpy as np
+import pandas as pd
+
+from geobirds.tiles import pixel_size
+from geobirds.trajectory import as_store
+
+# | lod of the fixes that are on the path at no zoom
+NEVER = np.iinfo(np.int8).max
+
+
+def mercator_xy(lon, lat):
+    '''
+    Web mercator coordinates in degree of longitude.
+    '''
+    lat = np.clip(lat, -85.0511, 85.0511)
+    return (np.asarray(lon, dtype=float),
+            np.degrees(np.arcsinh(np.tan(np.radians(lat)))))
+
+
+def thin_by_time(tracks, interval):
+    '''
+    Boolean mask of the fixes to keep: the first fix of every bird in
+    every `interval` (e.g. '1h'), and the last fix of every bird.
+    '''
+    tracks = as_store(tracks)
+    step = pd.Timedelta(interval).value
+    bucket = tracks.t.view(np.int64) // step
+    bird = tracks.bird_of_fix()
+    keep = np.r_[True, (bucket[1:] != bucket[:-1]) | (bird[1:] != bird[:-1])]
+    keep[tracks.last_index()[tracks.counts > 0]] = True
+    return keep
+
+
+def _segment_distance(px, py, ax, ay, bx, by):
+    dx, dy = bx - ax, by - ay
+    d2 = dx * dx + dy * dy
+    with np.errstate(invalid='ignore', divide='ignore'):
+        s = np.clip(((px - ax) * dx + (py - ay) * dy) / d2, 0, 1)
+    s = np.where(d2 > 0, s, 0)
+    return np.hypot(px - ax - s * dx, py - ay - s * dy)
+
+
+def douglas_peucker(x, y, keep, tolerance):
+    '''
+    x, y      : coordinates of the fixes, bird after bird
+    keep      : boolean mask of the fixes that must stay (at least the
+                first and last fix of every bird); updated in place
+    tolerance : largest distance of a dropped fix to the simplified path
+
+    Adds to `keep` the fixes Douglas-Peucker needs between consecutive
+    kept fixes, so the result refines what was kept before. Return
+    `keep`.
+    '''
+    kept = np.flatnonzero(keep)
+    a, b = kept[:-1], kept[1:]
+    while True:
+        open_ = b - a > 1
+        a, b = a[open_], b[open_]
+        if not len(a):
+            return keep
+        # | One row per interior fix of every open range.
+        n = b - a - 1
+        rng = np.repeat(np.arange(len(a)), n)
+        start = np.r_[0, np.cumsum(n)[:-1]]
+        i = a[rng] + 1 + np.arange(len(rng)) - start[rng]
+        d = _segment_distance(x[i], y[i], x[a][rng], y[a][rng],
+                              x[b][rng], y[b][rng])
+        d_max = np.maximum.reduceat(d, start)
+        # | First fix reaching the maximum of its range.
+        at_max = np.flatnonzero(d == d_max[rng])
+        first = np.r_[True, rng[at_max][1:] != rng[at_max][:-1]]
+        m = np.empty(len(a), dtype=np.int64)
+        m[rng[at_max][first]] = i[at_max][first]
+
+        split = d_max > tolerance
+        m = m[split]
+        keep[m] = True
+        a, b = np.r_[a[split], m], np.r_[m, b[split]]
+
+
+def track_lod(tracks, min_zoom=2, max_zoom=12, tolerance_px=1.0,
+              interval=None):
+    '''
+    tracks       : TrajectoryStore or `birds` GeoDataFrame
+    min_zoom     : zoom of the coarsest level
+    max_zoom     : zoom of the finest level; fixes not needed there are
+                   left out of the path at every zoom (their markers
+                   are up to the layer, see `geobirds.layers`)
+    tolerance_px : tolerance in screen pixels at every zoom
+    interval     : thin to at most one fix per bird and interval (e.g.
+                   '1h') before simplifying
+
+    Return an int8 array with the level of detail of every fix (in the
+    order of the store; NEVER for the fixes left out of the path).
+    '''
+    tracks = as_store(tracks)
+    x, y = mercator_xy(tracks.lon, tracks.lat)
+    candidate = (np.ones(tracks.n_fixes, dtype=bool) if interval is None
+                 else thin_by_time(tracks, interval))
+    rows = np.flatnonzero(candidate)
+    x, y = x[rows], y[rows]
+
+    # | The first and last fix of every bird are always drawn, so no
+    # | range spans two birds.
+    has = tracks.counts > 0
+    ends = np.r_[tracks.first_index()[has], tracks.last_index()[has]]
+    lod = np.full(tracks.n_fixes, NEVER, dtype=np.int8)
+    lod[ends] = min_zoom
+    keep = np.zeros(len(rows), dtype=bool)
+    keep[np.searchsorted(rows, ends)] = True
+    for z in range(min_zoom, max_zoom + 1):
+        before = keep.copy()
+        douglas_peucker(x, y, keep, tolerance_px * pixel_size(z))
+        lod[rows[keep & ~before]] = z
+    return lod
+
+
+def lod_report(lod, min_zoom=2, max_zoom=12):
+    '''
+    Number of fixes on the path per zoom and the reduction with respect to all
+    fixes.
+    '''
+    counts = np.bincount(lod[lod != NEVER], minlength=max_zoom + 1)
+    drawn = np.cumsum(counts)[min_zoom:max_zoom + 1]
+    return pd.DataFrame({'zoom': np.arange(min_zoom, max_zoom + 1),
+                         'fixes': drawn,
+                         'reduction': len(lod) / np.maximum(drawn, 1)})
@@ -0,0 +1,148 @@
+'''
+The stages of the notebook script as plain functions of their inputs.
+
+    birds     = load_birds(data_dir)
+    world     = load_world()
+    protected = load_protected(data_dir, bbox=americas_bbox(world))
+    on_land   = load_protected(data_dir, bbox=..., land_only=True)
+    south_america, p_frac = country_overlay(world, on_land, protected)
+    dwell     = dwell_days(tracks, world, on_land)
+
+Rendering is `geobirds.figures` (one artifact) or `geobirds.pipeline`
+(all of them). None of these change the working directory or download
+anything; `data_dir` is the extracted course data or the course zip
+itself, read without extraction (`geobirds.datastore`).
+'''
+
+import numpy as np
+import geopandas as gpd
+
+from geobirds import DATA_DIR
+from geobirds.area import area_km2, equal_area_crs
+from geobirds.birds import read_tracks
+from geobirds.datastore import member_path, open_member, source_digest
+from geobirds.dwell import bird_dwell
+from geobirds.overlay import protected_fraction
+from geobirds.partition import (partition_file, partition_protected_areas,
+                                partitioned_fraction)
+from geobirds.profiling import profiled, stage
+from geobirds.protected import PIPELINE_COLUMNS, load_protected_areas
+
+BIRDS_CSV = 'purple_martin.csv'
+PROTECTED_SHP = ('SAPA_Aug2019-shapefile/SAPA_Aug2019-shapefile/'
+                 'SAPA_Aug2019-shapefile-polygons.shp')
+AMERICAS = ['North America', 'South America']
+
+
+def load_birds(data_dir=DATA_DIR, seed=0):
+    '''
+    Read the tracks. Return (TrajectoryStore, `birds` GeoDataFrame with
+    one random `color` per bird, seeded with `seed`).
+    '''
+    with stage('read_tracks') as rec, open_member(data_dir, BIRDS_CSV) as f:
+        tracks = read_tracks(f)
+        rec['rows'] = tracks.n_fixes
+    with stage('to_birds', rows=tracks.n_fixes):
+        birds = color_birds(tracks.to_birds(), seed)
+    return tracks, birds
+
+
+def color_birds(birds, seed=0):
+    '''
+    Add one random `color` per bird, seeded with `seed`.
+    '''
+    ids = np.sort(birds['tag-local-identifier'].unique())
+    color = np.random.default_rng(seed).integers(0, 256**3 - 1, len(ids))
+    birds['color'] = birds['tag-local-identifier'].map(
+        dict(zip(ids, [f'#{c:06x}' for c in color])))
+    return birds
+
+
+def world_path():
+    return gpd.datasets.get_path('naturalearth_lowres')
+
+
+@profiled('read_world')
+def load_world():
+    return gpd.read_file(world_path())
+
+
+def americas(world):
+    return world.loc[world['continent'].isin(AMERICAS)]
+
+
+def americas_bbox(world):
+    return tuple(americas(world).total_bounds)
+
+
+@profiled()
+def load_protected(data_dir=DATA_DIR, bbox=None, land_only=False,
+                   tolerance=0.02):
+    '''
+    The SAPA layer as in the script: simplified with `tolerance`,
+    the pipeline columns only, clipped to `bbox` and cached on disk.
+    '''
+    return load_protected_areas(member_path(data_dir, PROTECTED_SHP),
+                                tolerance=tolerance, preserve_topology=False,
+                                land_only=land_only, columns=PIPELINE_COLUMNS,
+                                bbox=bbox, compact=True,
+                                digest=source_digest(data_dir, PROTECTED_SHP))
+
+
+def country_overlay(world, protected_on_land, protected, engine='indexed'):
+    '''
+    Protected area per South American country in its equal-area CRS.
+    Return (south_america with `area_total`, `protected_area_total`,
+    `protected_area_fraction` and `non_protected_area_total`, the
+    protected fraction of the continent from the reported areas).
+    '''
+    south_america = world[world['continent'] == 'South America'
+                          ].reset_index(drop=True)
+    crs = equal_area_crs(south_america)
+    with stage('overlay', rows=len(south_america),
+               geometries=len(protected_on_land), engine=engine):
+        out = protected_fraction(south_america, protected_on_land,
+                                 engine=engine, crs=crs)
+    out['non_protected_area_total'] = (out['area_total']
+                                       - out['protected_area_total'])
+    p_frac = float((protected['REP_AREA'] - protected['REP_M_AREA']).sum()
+                   / area_km2(south_america, crs).sum())
+    return out, p_frac
+
+
+def partitioned_overlay(data_dir=DATA_DIR, rows_per_partition=20_000):
+    '''
+    Same per-country table as `country_overlay` (without `p_frac`), with
+    the world and the land protected areas partitioned on disk and
+    processed one partition at a time (`geobirds.partition`), for layers
+    that do not fit in memory, e.g. the global WDPA.
+    '''
+    world = partition_file(world_path(), 'world')
+    # | Same rows and dtypes as `load_protected` in `country_overlay`.
+    protected = partition_protected_areas(
+        member_path(data_dir, PROTECTED_SHP), tolerance=0.02,
+        land_only=True, columns=PIPELINE_COLUMNS,
+        bbox=americas_bbox(load_world()), compact=True,
+        rows_per_partition=rows_per_partition,
+        digest=source_digest(data_dir, PROTECTED_SHP))
+    attributes = world.attributes()
+    rows = attributes.index[attributes['continent'] == 'South America']
+    crs = equal_area_crs(world.select(rows))
+    with stage('overlay', rows=len(rows), geometries=len(protected),
+               engine='partitioned'):
+        out = partitioned_fraction(world, protected, crs=crs,
+                                   country_rows=rows)
+    out['non_protected_area_total'] = (out['area_total']
+                                       - out['protected_area_total'])
+    return out.reset_index(drop=True)
+
+
+def dwell_days(tracks, world, protected_on_land, max_gap_h=None):
+    '''
+    Time-weighted days of every bird in every country of `world`, inside
+    and outside the protected areas (`geobirds.dwell.bird_dwell`).
+    '''
+    with stage('dwell', rows=tracks.n_fixes,
+               geometries=len(world) + len(protected_on_land)):
+        return bird_dwell(tracks, world, protected_on_land,
+                          max_gap_h=max_gap_h)
@@ -0,0 +1,266 @@
+'''
+Level-of-detail tiles of a polygon layer for folium maps.
+
+`folium.GeoJson(data=gdf.__geo_interface__)` writes every vertex of
+every polygon into the HTML file. `export_tile_pyramid` instead writes
+one small GeoJSON file per XYZ (web mercator) tile and zoom level, with
+the polygons clipped to the tile and simplified to about one screen
+pixel at that zoom. `TiledGeoJson` is the folium layer that fetches only
+the tiles in view.
+
+The tiles are fetched over HTTP, and browsers refuse `fetch` from
+`file://` pages. Serve the directory of the HTML file, e.g.
+`python -m http.server`, and open http://localhost:8000/m_2.html.
+'''
+
+import json
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import shapely
+from branca.element import MacroElement
+from jinja2 import Template
+
+from geobirds.cache import cache_key, frame_digest
+
+TILE_PX = 256
+
+
+def tile_bounds(z, x, y):
+    '''
+    (west, south, east, north) in degree of XYZ tile (z, x, y).
+    Arrays of x, y are fine too.
+    '''
+    n = 2.0 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n))))
+    south = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def lonlat_to_tile(lon, lat, z):
+    '''
+    XYZ tile indices containing (lon, lat) at zoom `z`.
+    '''
+    n = 2 ** z
+    lat = np.clip(lat, -85.0511, 85.0511)
+    x = np.floor((np.asarray(lon) + 180.0) / 360.0 * n)
+    y = np.floor((1 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2 * n)
+    return (np.clip(x, 0, n - 1).astype(int),
+            np.clip(y, 0, n - 1).astype(int))
+
+
+def pixel_size(z):
+    '''
+    Width of one screen pixel at zoom `z` in degree of longitude.
+    '''
+    return 360.0 / (TILE_PX * 2 ** z)
+
+
+def layer_digest(gdf, columns, **params):
+    '''
+    Hash of the geometries, the exported columns and the export
+    parameters. Used to skip the export when nothing changed.
+    '''
+    return cache_key(digest=frame_digest(gdf, columns), **params)
+
+
+def _feature_collection(geoms, props):
+    features = [
+        '{"type":"Feature","properties":%s,"geometry":%s}' % (p, g)
+        for g, p in zip(shapely.to_geojson(geoms), props)]
+    return '{"type":"FeatureCollection","features":[%s]}' % ','.join(features)
+
+
+def _read_manifest(index_path):
+    '''
+    The manifest written by `export_tile_pyramid` at `index_path`, or
+    None when there is none (missing, unreadable or another JSON file).
+    '''
+    try:
+        manifest = json.loads(index_path.read_text())
+    except (OSError, ValueError):
+        return None
+    if isinstance(manifest, dict) and {'digest', 'tiles'} <= set(manifest):
+        return manifest
+    return None
+
+
+def export_tile_pyramid(gdf, out_dir, min_zoom=3, max_zoom=8,
+                        tolerance_px=1.0, columns=None):
+    '''
+    gdf          : polygon layer in EPSG:4326
+    out_dir      : tiles go to out_dir/z/x/y.geojson, the manifest to
+                   out_dir/index.json
+    min_zoom     : coarsest level. At lower zoom the layer shows this level.
+    max_zoom     : finest level. At higher zoom the layer shows this level.
+    tolerance_px : simplify tolerance in screen pixels
+    columns      : attribute columns to copy into the tiles
+
+    Return the manifest (dict). The export is skipped when out_dir
+    already holds tiles of the same layer and parameters; tiles of
+    another layer are replaced. A non-empty out_dir without a manifest
+    of this function raises FileExistsError rather than being deleted.
+    '''
+    out_dir = Path(out_dir)
+    columns = list(columns or [])
+    digest = layer_digest(gdf, columns, min_zoom=min_zoom, max_zoom=max_zoom,
+                          tolerance_px=tolerance_px)
+    index_path = out_dir / 'index.json'
+    manifest = _read_manifest(index_path)
+    if manifest is not None and manifest['digest'] == digest:
+        return manifest
+
+    t0 = time.perf_counter()
+    if manifest is not None:
+        shutil.rmtree(out_dir)
+    elif out_dir.exists() and any(out_dir.iterdir()):
+        raise FileExistsError(f'{out_dir} is not empty and holds no tile '
+                              f'manifest; not replacing it')
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    geoms = shapely.make_valid(np.asarray(gdf.geometry))
+    props = (gdf[columns].to_json(orient='records', lines=True).splitlines()
+             if columns else ['{}'] * len(gdf))
+    props = np.array(props, dtype=object)
+    west, south, east, north = shapely.total_bounds(geoms)
+
+    tiles = {}
+    n_bytes = 0
+    for z in range(min_zoom, max_zoom + 1):
+        tol = tolerance_px * pixel_size(z)
+        decimals = max(0, int(np.ceil(-np.log10(tol))) + 1)
+        simple = shapely.transform(shapely.simplify(geoms, tol),
+                                   lambda c: np.round(c, decimals))
+        simple = shapely.make_valid(simple)
+        keep = ~shapely.is_empty(simple)
+        simple, simple_props = simple[keep], props[keep]
+
+        x0, y0 = lonlat_to_tile(west, north, z)
+        x1, y1 = lonlat_to_tile(east, south, z)
+        xs, ys = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1),
+                             indexing='ij')
+        xs, ys = xs.ravel(), ys.ravel()
+        boxes = shapely.box(*tile_bounds(z, xs, ys))
+
+        i_tile, i_geom = shapely.STRtree(simple).query(
+            boxes, predicate='intersects')
+        clipped = shapely.intersection(simple[i_geom], boxes[i_tile])
+        ok = ~shapely.is_empty(clipped)
+        i_tile, i_geom, clipped = i_tile[ok], i_geom[ok], clipped[ok]
+
+        split = np.flatnonzero(np.diff(i_tile)) + 1
+        keys = []
+        for t, part in zip(i_tile[np.r_[0, split]] if len(i_tile) else [],
+                           np.split(np.arange(len(i_tile)), split)):
+            path = out_dir / str(z) / str(xs[t]) / f'{ys[t]}.geojson'
+            path.parent.mkdir(parents=True, exist_ok=True)
+            text = _feature_collection(clipped[part],
+                                       simple_props[i_geom[part]])
+            path.write_text(text)
+            n_bytes += len(text)
+            keys.append(f'{xs[t]}/{ys[t]}')
+        tiles[str(z)] = keys
+
+    manifest = {'digest': digest, 'min_zoom': min_zoom, 'max_zoom': max_zoom,
+                'bounds': [west, south, east, north], 'tiles': tiles,
+                'n_tiles': sum(len(v) for v in tiles.values()),
+                'bytes': n_bytes,
+                'seconds': time.perf_counter() - t0}
+    index_path.write_text(json.dumps(manifest))
+    return manifest
+
+
+class TiledGeoJson(MacroElement):
+    '''
+    folium layer that shows the tiles written by `export_tile_pyramid`.
+
+    manifest : what `export_tile_pyramid` returned
+    url      : where the tile directory is reachable from the HTML file
+               (relative URLs are relative to the HTML file)
+    style    : Leaflet path options, e.g. {'fillColor': 'coral',
+               'stroke': False}
+
+    Only the tiles that intersect the view at the current zoom (clamped
+    to the pyramid) are fetched; tiles that leave the view are dropped.
+    Browsers do not fetch them from a file:// page, so the layer warns
+    in the console there; serve the directory over HTTP.
+    '''
+
+    _template = Template(u"""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var opts = {{ this.options|tojson }};
+            var have = {};
+            Object.keys(opts.tiles).forEach(function(z) {
+                have[z] = new Set(opts.tiles[z]);
+            });
+            var shown = {};
+            var group = L.layerGroup().addTo(map);
+            var n_tile = function(z) { return Math.pow(2, z); };
+            var lon2x = function(lon, z) {
+                return Math.floor((lon + 180) / 360 * n_tile(z));
+            };
+            var lat2y = function(lat, z) {
+                lat = Math.max(-85.0511, Math.min(85.0511, lat))
+                      * Math.PI / 180;
+                var y = Math.log(Math.tan(lat) + 1 / Math.cos(lat));
+                return Math.floor((1 - y / Math.PI) / 2 * n_tile(z));
+            };
+            if (location.protocol === 'file:') {
+                console.warn('TiledGeoJson: tiles cannot be fetched from '
+                             + 'a file:// page; serve the directory over '
+                             + 'HTTP (python -m http.server)');
+            }
+            var update = function() {
+                var z = Math.max(opts.min_zoom, Math.min(
+                    opts.max_zoom, Math.round(map.getZoom())));
+                var b = map.getBounds();
+                var x0 = Math.max(0, lon2x(b.getWest(), z));
+                var x1 = Math.min(n_tile(z) - 1, lon2x(b.getEast(), z));
+                var y0 = Math.max(0, lat2y(b.getNorth(), z));
+                var y1 = Math.min(n_tile(z) - 1, lat2y(b.getSouth(), z));
+                var want = {};
+                for (var x = x0; x <= x1; x++) {
+                    for (var y = y0; y <= y1; y++) {
+                        var key = x + '/' + y;
+                        if (have[z] && have[z].has(key)) {
+                            want[z + '/' + key] = true;
+                        }
+                    }
+                }
+                Object.keys(shown).forEach(function(key) {
+                    if (!want[key]) {
+                        group.removeLayer(shown[key]);
+                        delete shown[key];
+                    }
+                });
+                Object.keys(want).forEach(function(key) {
+                    if (shown[key]) { return; }
+                    shown[key] = L.geoJSON(null, {style: opts.style})
+                        .addTo(group);
+                    fetch(opts.url + '/' + key + '.geojson')
+                        .then(function(r) { return r.json(); })
+                        .then(function(data) {
+                            if (shown[key]) { shown[key].addData(data); }
+                        });
+                });
+            };
+            map.on('moveend', update);
+            update();
+        })();
+        {% endmacro %}
+        """)
+
+    def __init__(self, manifest, url, style=None):
+        super().__init__()
+        self._name = 'TiledGeoJson'
+        self.options = {'url': str(url).rstrip('/'),
+                        'min_zoom': manifest['min_zoom'],
+                        'max_zoom': manifest['max_zoom'],
+                        'tiles': manifest['tiles'],
+                        'style': style or {}}
@@ -0,0 +1,267 @@
+'''
+TopoJSON encoding of polygon layers with shared arcs.
+
+`simplify(..., preserve_topology=False)` on every polygon alone moves
+the two copies of a shared border differently, which opens gaps and
+slivers between neighbors, and GeoJSON stores that border twice.
+`Topology` instead
+
+1. quantizes the coordinates to an integer grid,
+2. finds the junctions (points where the set of neighbors changes) and
+   cuts the rings into arcs between them, and
+3. keeps every arc once, however many rings use it.
+
+`Topology.to_topojson(tolerance)` then simplifies every arc once
+(Douglas-Peucker, the junctions stay), so neighbors keep sharing exactly
+the same border, and returns a TopoJSON dict with delta-encoded arcs
+that `folium.TopoJson` renders, e.g.
+`folium.TopoJson(topo, 'objects.protected_areas')`. The arcs are built
+once per layer; every further tolerance only simplifies the arcs.
+'''
+
+import json
+
+import numpy as np
+import shapely
+
+from geobirds.geometry import valid_geoms
+
+
+def _polygon_parts(geoms):
+    '''
+    Polygons of `geoms` (collections are unpacked) and the index of the
+    geometry each comes from.
+    '''
+    parts, index = shapely.get_parts(geoms, return_index=True)
+    nested = shapely.get_type_id(parts) == 7
+    if nested.any():
+        inner, i_inner = shapely.get_parts(parts[nested], return_index=True)
+        parts = np.r_[parts[~nested], inner]
+        index = np.r_[index[~nested], index[nested][i_inner]]
+    polygon = shapely.get_type_id(parts) == 3
+    return parts[polygon], index[polygon]
+
+
+def _canonical(seq):
+    '''
+    `seq` or its reverse, whichever is smaller; and whether it was
+    reversed.
+    '''
+    rev = seq[::-1]
+    differ = np.flatnonzero(seq != rev)
+    if len(differ) and rev[differ[0]] < seq[differ[0]]:
+        return rev, True
+    return seq, False
+
+
+def _ring_arcs(ring, junction):
+    '''
+    Cut one ring (point keys without the closing point) at its junctions.
+    A ring without junctions is one closed arc starting at its smallest
+    point, so that equal rings give equal arcs.
+    '''
+    cuts = np.flatnonzero(junction)
+    start = cuts[0] if len(cuts) else int(np.argmin(ring))
+    closed = np.concatenate([ring[start:], ring[:start + 1]])
+    if not len(cuts):
+        return [closed]
+    cuts = (cuts - start).tolist() + [len(ring)]
+    return [closed[a:b + 1] for a, b in zip(cuts[:-1], cuts[1:])]
+
+
+def _junctions(key, ring_start, ring_end):
+    '''
+    True for the points (keys, ring after ring) that are seen with more
+    than one pair of neighbors.
+    '''
+    ring_len = ring_end - ring_start
+    pos = np.arange(len(key))
+    first = np.repeat(ring_start, ring_len)
+    last = np.repeat(ring_end - 1, ring_len)
+    prev = key[np.where(pos == first, last, pos - 1)]
+    nxt = key[np.where(pos == last, first, pos + 1)]
+    lo, hi = np.minimum(prev, nxt), np.maximum(prev, nxt)
+
+    # | Sorted by point, a point has more than one pair of neighbors iff
+    # | two consecutive rows of it differ.
+    order = np.argsort(key, kind='stable')
+    k, lo, hi = key[order], lo[order], hi[order]
+    same = k[1:] == k[:-1]
+    differ = same & ((lo[1:] != lo[:-1]) | (hi[1:] != hi[:-1]))
+    group = np.cumsum(np.r_[True, ~same]) - 1
+    flag = np.zeros(group[-1] + 1 if len(group) else 0, dtype=bool)
+    flag[group[1:][differ]] = True
+    junction = np.empty(len(key), dtype=bool)
+    junction[order] = flag[group]
+    return junction
+
+
+def _delta_encode(arcs):
+    '''
+    Arcs as lists of [dx, dy] steps from the previous point (the first
+    point absolute), converted to Python lists in one call.
+    '''
+    if not arcs:
+        return []
+    xy = np.concatenate(arcs)
+    start = np.r_[0, np.cumsum([len(a) for a in arcs])]
+    delta = np.diff(xy, axis=0, prepend=xy[:1])
+    delta[start[:-1]] = xy[start[:-1]]
+    steps = delta.tolist()
+    return [steps[a:b] for a, b in zip(start[:-1], start[1:])]
+
+
+class Topology:
+    '''
+    Shared-arc topology of a polygon layer.
+
+    gdf          : polygon layer (any CRS, usually EPSG:4326)
+    name         : name of the object in `objects`
+    quantization : number of grid steps across the extent per axis
+    columns      : attribute columns copied into `properties`
+    '''
+
+    def __init__(self, gdf, name='layer', quantization=10**5, columns=None):
+        self.name = name
+        self.quantization = quantization
+        columns = list(columns or [])
+        self.properties = (json.loads(gdf[columns].to_json(orient='records'))
+                           if columns else [{}] * len(gdf))
+
+        parts, i_geom = _polygon_parts(valid_geoms(gdf))
+        rings, i_part = shapely.get_rings(parts, return_index=True)
+        xy, i_ring = shapely.get_coordinates(rings, return_index=True)
+
+        x0, y0, x1, y1 = shapely.total_bounds(parts)
+        self.translate = [x0, y0]
+        self.scale = np.array([max(x1 - x0, 1e-12),
+                               max(y1 - y0, 1e-12)]) / (quantization - 1)
+        q = np.round((xy - self.translate) / self.scale).astype(np.int64)
+        key = q[:, 0] * quantization + q[:, 1]
+
+        # | Drop the closing point of every ring and repeated points.
+        keep = (np.r_[key[1:] != key[:-1], False]
+                & np.r_[i_ring[1:] == i_ring[:-1], False])
+        key, i_ring = key[keep], i_ring[keep]
+        ring_start = np.flatnonzero(np.r_[True, i_ring[1:] != i_ring[:-1]])
+        ring_end = np.r_[ring_start[1:], len(key)]
+        junction = _junctions(key, ring_start, ring_end)
+
+        arcs, arc_index, ring_refs = [], {}, []
+        for a, b in zip(ring_start, ring_end):
+            refs = []
+            if b - a >= 3:
+                for arc in _ring_arcs(key[a:b], junction[a:b]):
+                    arc, reversed_ = _canonical(arc)
+                    token = arc.tobytes()
+                    if token not in arc_index:
+                        arc_index[token] = len(arcs)
+                        arcs.append(arc)
+                    i = arc_index[token]
+                    refs.append(~i if reversed_ else i)
+            ring_refs.append(refs)
+        self.arcs = arcs
+
+        # | The first ring of every part is the exterior; parts whose
+        # | exterior collapsed are dropped with their holes.
+        exterior = np.r_[True, i_part[1:] != i_part[:-1]]
+        part_rings = {}
+        for r, refs in zip(i_ring[ring_start], ring_refs):
+            p = i_part[r]
+            if refs and (exterior[r] or p in part_rings):
+                part_rings.setdefault(p, []).append(refs)
+        self.polygons = [[] for _ in range(len(gdf))]
+        for p, rings_of_part in part_rings.items():
+            self.polygons[i_geom[p]].append(rings_of_part)
+
+    @property
+    def n_vertices(self):
+        return sum(len(a) for a in self.arcs)
+
+    def simplified_arcs(self, tolerance=0.0):
+        '''
+        Quantized (x, y) of every arc, simplified with `tolerance` (in
+        the units of the layer). Closed arcs keep at least 4 points.
+        '''
+        lengths = np.array([len(a) for a in self.arcs], dtype=np.int64)
+        keys = (np.concatenate(self.arcs) if self.arcs
+                else np.empty(0, dtype=np.int64))
+        xy = np.column_stack([keys // self.quantization,
+                              keys % self.quantization])
+        original = np.split(xy, np.cumsum(lengths)[:-1])
+        if tolerance <= 0 or not self.arcs:
+            return original
+
+        lines = shapely.linestrings(
+            xy, indices=np.repeat(np.arange(len(lengths)), lengths))
+        simple = shapely.simplify(lines, tolerance / self.scale.max(),
+                                  preserve_topology=False)
+        coords, index = shapely.get_coordinates(simple, return_index=True)
+        out = np.split(np.round(coords).astype(np.int64),
+                       np.flatnonzero(np.diff(index)) + 1)
+        end = np.cumsum(lengths)
+        closed = (xy[end - 1] == xy[end - lengths]).all(axis=1)
+        for k in np.flatnonzero(closed & (lengths >= 4)):
+            if len(out[k]) < 4:
+                arc = original[k]
+                out[k] = arc[np.linspace(0, len(arc) - 1, 4).astype(int)]
+        return out
+
+    def to_topojson(self, tolerance=0.0):
+        '''
+        TopoJSON topology (dict) with the arcs simplified with
+        `tolerance` (in the units of the layer; 0: not simplified).
+        '''
+        geometries = []
+        for polys, prop in zip(self.polygons, self.properties):
+            if not polys:
+                geometries.append({'type': None, 'properties': prop})
+            elif len(polys) == 1:
+                geometries.append({'type': 'Polygon', 'arcs': polys[0],
+                                   'properties': prop})
+            else:
+                geometries.append({'type': 'MultiPolygon', 'arcs': polys,
+                                   'properties': prop})
+        return {'type': 'Topology',
+                'transform': {'scale': self.scale.tolist(),
+                              'translate': self.translate},
+                'objects': {self.name: {'type': 'GeometryCollection',
+                                        'geometries': geometries}},
+                'arcs': _delta_encode(self.simplified_arcs(tolerance))}
+
+
+def topology(gdf, name='layer', quantization=10**5, tolerance=0.0,
+             columns=None):
+    '''
+    Shortcut: `Topology(gdf, name, quantization, columns)` as TopoJSON,
+    simplified with `tolerance`.
+    '''
+    return Topology(gdf, name, quantization, columns).to_topojson(tolerance)
+
+
+def topology_geoms(topo, name='layer'):
+    '''
+    Decode object `name` of a TopoJSON topology back into an array of
+    shapely geometries (None for empty ones).
+    '''
+    sx, sy = topo['transform']['scale']
+    tx, ty = topo['transform']['translate']
+    arcs = [np.cumsum(np.asarray(a, dtype=float), axis=0) * [sx, sy]
+            + [tx, ty] for a in topo['arcs']]
+
+    def ring(refs):
+        pieces = [arcs[i] if i >= 0 else arcs[~i][::-1] for i in refs]
+        return np.concatenate([pieces[0]] + [p[1:] for p in pieces[1:]])
+
+    def polygon(rings):
+        return shapely.Polygon(ring(rings[0]), [ring(r) for r in rings[1:]])
+
+    out = []
+    for g in topo['objects'][name]['geometries']:
+        if g['type'] == 'Polygon':
+            out.append(polygon(g['arcs']))
+        elif g['type'] == 'MultiPolygon':
+            out.append(shapely.MultiPolygon([polygon(p) for p in g['arcs']]))
+        else:
+            out.append(None)
+    return np.array(out, dtype=object)
@@ -0,0 +1,207 @@
+'''
+Array-backed store of bird trajectories.
+
+All fixes live in contiguous NumPy arrays (lon, lat, t), one bird after
+the other and each bird in time order. `offsets` tells where each bird
+starts, so the fixes of bird k are rows offsets[k]:offsets[k + 1]. First
+and last fixes, per-bird slices and segments are plain index arithmetic
+without groupby or shapely objects.
+'''
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+ID = 'tag-local-identifier'
+LON = 'location-long'
+LAT = 'location-lat'
+TIME = 'timestamp'
+
+
+def track_offsets(ids):
+    '''
+    ids : per-fix bird id, grouped (all fixes of a bird next to each
+          other)
+
+    Return (unique ids, offsets) such that the fixes of bird k are
+    rows offsets[k]:offsets[k + 1].
+    '''
+    ids = np.asarray(ids)
+    start = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    return ids[start], np.r_[start, len(ids)]
+
+
+class TrajectoryStore:
+    '''
+    ids     : bird ids, one per bird
+    t       : datetime64[ns] per fix
+    lon     : longitude per fix
+    lat     : latitude per fix
+    offsets : len(ids) + 1 row offsets
+    index   : label of every fix (default 0, 1, ...). `from_birds` puts
+              the index of `birds` here, so per-fix results can be
+              joined back onto `birds`.
+    '''
+
+    def __init__(self, ids, t, lon, lat, offsets, index=None):
+        self.ids = np.asarray(ids)
+        self.t = np.asarray(t, dtype='datetime64[ns]')
+        self.lon = np.asarray(lon, dtype=float)
+        self.lat = np.asarray(lat, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.index = (np.arange(len(self.t)) if index is None
+                      else np.asarray(index))
+        self._index = {bird: k for k, bird in enumerate(self.ids.tolist())}
+
+    @classmethod
+    def from_birds(cls, birds):
+        '''
+        Store of a `birds` (Geo)DataFrame. If the fixes are already
+        grouped by bird and in time order (e.g. from `read_birds`) that
+        order is kept, otherwise birds are sorted by id.
+        '''
+        ids = birds[ID].to_numpy()
+        t = birds[TIME].to_numpy(dtype='datetime64[ns]')
+        if LON in birds and LAT in birds:
+            lon, lat = birds[LON].to_numpy(), birds[LAT].to_numpy()
+        else:
+            xy = shapely.get_coordinates(birds.geometry.values)
+            lon, lat = xy[:, 0], xy[:, 1]
+
+        index = birds.index.to_numpy()
+
+        uid, offsets = track_offsets(ids)
+        grouped = len(np.unique(uid)) == len(uid)
+        if not grouped or np.any((np.diff(t) < np.timedelta64(0))
+                                 & (ids[1:] == ids[:-1])):
+            order = np.lexsort((t, ids))
+            ids, t, lon, lat = ids[order], t[order], lon[order], lat[order]
+            index = index[order]
+            uid, offsets = track_offsets(ids)
+        return cls(uid, t, lon, lat, offsets, index=index)
+
+    @classmethod
+    def from_endpoints(cls, start_gdf, end_gdf):
+        '''
+        Two-fix store (start -> end per bird) from the `start_gdf` and
+        `end_gdf` GeoDataFrames. Their `timestamp` column is used when
+        present.
+        '''
+        end_gdf = end_gdf.set_index(ID).loc[start_gdf[ID]]
+        ids = start_gdf[ID].to_numpy()
+        xy = np.stack([shapely.get_coordinates(start_gdf.geometry.values),
+                       shapely.get_coordinates(end_gdf.geometry.values)],
+                      axis=1).reshape(-1, 2)
+        if TIME in start_gdf and TIME in end_gdf:
+            t = np.stack([start_gdf[TIME].to_numpy(dtype='datetime64[ns]'),
+                          end_gdf[TIME].to_numpy(dtype='datetime64[ns]')],
+                         axis=1).ravel()
+        else:
+            t = np.full(len(xy), np.datetime64('NaT'), dtype='datetime64[ns]')
+        return cls(ids, t, xy[:, 0], xy[:, 1],
+                   np.arange(0, 2 * len(ids) + 1, 2))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def n_fixes(self):
+        return len(self.t)
+
+    @property
+    def counts(self):
+        '''
+        Number of fixes per bird.
+        '''
+        return np.diff(self.offsets)
+
+    def bird_of_fix(self):
+        '''
+        Index (0 .. len(self) - 1) of the bird of every fix.
+        '''
+        return np.repeat(np.arange(len(self)), self.counts)
+
+    def first_index(self):
+        '''
+        Row of the first fix of every bird (birds without fixes: -1).
+        '''
+        return np.where(self.counts > 0, self.offsets[:-1], -1)
+
+    def last_index(self):
+        '''
+        Row of the last fix of every bird (birds without fixes: -1).
+        '''
+        return np.where(self.counts > 0, self.offsets[1:] - 1, -1)
+
+    def track(self, bird):
+        '''
+        (t, lon, lat) views of the fixes of `bird` (an id).
+        '''
+        k = self._index[bird]
+        rows = slice(self.offsets[k], self.offsets[k + 1])
+        return self.t[rows], self.lon[rows], self.lat[rows]
+
+    def segment_index(self):
+        '''
+        Row of the start of every segment (consecutive fixes of the same
+        bird); the segment ends at row + 1.
+        '''
+        bird = self.bird_of_fix()
+        return np.flatnonzero(bird[:-1] == bird[1:])
+
+    def segments(self):
+        '''
+        DataFrame with one row per segment: bird id, start and end time
+        and coordinates.
+        '''
+        i = self.segment_index()
+        return pd.DataFrame({ID: self.ids[self.bird_of_fix()[i]],
+                             'time_start': self.t[i],
+                             'time_end': self.t[i + 1],
+                             'lon_start': self.lon[i],
+                             'lat_start': self.lat[i],
+                             'lon_end': self.lon[i + 1],
+                             'lat_end': self.lat[i + 1]})
+
+    def _endpoint_frame(self, rows):
+        ok = rows >= 0
+        rows = rows[ok]
+        return gpd.GeoDataFrame({ID: self.ids[ok], TIME: self.t[rows]},
+                                geometry=gpd.points_from_xy(self.lon[rows],
+                                                            self.lat[rows]),
+                                crs='EPSG:4326')
+
+    def start_frame(self):
+        '''
+        `start_gdf`: first fix of every bird.
+        '''
+        return self._endpoint_frame(self.first_index())
+
+    def end_frame(self):
+        '''
+        `end_gdf`: last fix of every bird.
+        '''
+        return self._endpoint_frame(self.last_index())
+
+    def to_birds(self):
+        '''
+        The `birds` GeoDataFrame (EPSG:4326 points).
+        '''
+        df = pd.DataFrame({TIME: self.t, LON: self.lon, LAT: self.lat,
+                           ID: np.repeat(self.ids, self.counts)},
+                          index=self.index, copy=False)
+        return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(self.lon,
+                                                                self.lat),
+                                crs='EPSG:4326')
+
+
+def as_store(tracks):
+    '''
+    tracks : TrajectoryStore or `birds` GeoDataFrame
+
+    Return `tracks` as a TrajectoryStore (the store itself if it is one).
+    '''
+    if isinstance(tracks, TrajectoryStore):
+        return tracks
+    return TrajectoryStore.from_birds(tracks)
@@ -0,0 +1,117 @@
+import warnings
+
+import numpy as np
+import pyproj
+import pytest
+import shapely
+import geopandas as gpd
+
+from geobirds.area import (REGION_CRS, area_km2, equal_area_crs,
+                           geodesic_area_km2, reproject, transformer)
+
+GEOD = pyproj.Geod(ellps='WGS84')
+
+
+@pytest.fixture(scope='module')
+def polygons():
+    # | Edges every 0.01 degree, so that the geodesics between the
+    # | vertices follow the parallels closely.
+    hole = shapely.Polygon(shapely.box(-60, -10, -50, 0).exterior,
+                           [shapely.box(-56, -6, -54, -4).exterior.coords])
+    geoms = [shapely.box(-70, -30, -60, -20), hole,
+             shapely.MultiPolygon([shapely.box(-45, -20, -44, -19),
+                                   shapely.box(-40, -5, -38, -3)]),
+             shapely.Polygon([(-75, 5), (-65, 10), (-60, -2)])]
+    geoms = shapely.segmentize(geoms, 0.01)
+    return gpd.GeoDataFrame({'continent': 'South America'},
+                            index=range(len(geoms)), geometry=geoms,
+                            crs='EPSG:4326')
+
+
+def geod_km2(gdf):
+    def ring(r):
+        return abs(GEOD.geometry_area_perimeter(shapely.Polygon(r))[0])
+
+    area = [sum(ring(p.exterior) - sum(ring(h) for h in p.interiors)
+                for p in shapely.get_parts(g))
+            for g in gdf.geometry]
+    return np.array(area) / 10**6
+
+
+def test_geodesic_area(polygons):
+    np.testing.assert_allclose(geodesic_area_km2(polygons),
+                               geod_km2(polygons), rtol=1e-5)
+
+
+def test_geodesic_area_of_projected_layer(polygons):
+    projected = polygons.to_crs('EPSG:3857')
+    np.testing.assert_allclose(geodesic_area_km2(projected),
+                               geodesic_area_km2(polygons), rtol=1e-9)
+
+
+def test_equal_area_crs(polygons):
+    assert equal_area_crs(polygons) == REGION_CRS['South America']
+    assert equal_area_crs(polygons, 'Europe') == REGION_CRS['Europe']
+    layer = polygons.drop(columns='continent')
+    assert equal_area_crs(layer).startswith('+proj=laea')
+    world = gpd.GeoDataFrame(geometry=[shapely.box(-170, -60, 170, 70)],
+                             crs='EPSG:4326')
+    assert equal_area_crs(world) == REGION_CRS['World']
+
+
+# | ESRI:102033 is on another ellipsoid (aust_SA), and PROJ's Mollweide
+# | is equal-area on a sphere only.
+@pytest.mark.parametrize('region, rtol', [(None, 1e-6),
+                                          ('South America', 1e-5),
+                                          ('World', 1e-2)])
+def test_equal_area_crs_keeps_areas(polygons, region, rtol):
+    layer = polygons if region else polygons.drop(columns='continent')
+    crs = equal_area_crs(layer, region)
+    np.testing.assert_allclose(area_km2(layer, crs), geod_km2(polygons),
+                               rtol=rtol)
+
+
+def test_reproject_is_remembered(polygons):
+    gdf = polygons.copy()
+    crs = REGION_CRS['South America']
+    first = reproject(gdf, crs)
+    assert reproject(gdf, crs) is first
+    assert reproject(gdf, 'EPSG:4326') is gdf.geometry
+    expected = polygons.to_crs(crs).geometry
+    np.testing.assert_allclose(shapely.area(np.asarray(first)),
+                               shapely.area(np.asarray(expected)),
+                               rtol=1e-12)
+    assert transformer('EPSG:4326', crs) is transformer('EPSG:4326', crs)
+
+
+def test_reproject_follows_geometry_and_crs(polygons):
+    gdf = polygons.copy()
+    crs = REGION_CRS['South America']
+    first = reproject(gdf, crs)
+
+    gdf.geometry = gdf.geometry.translate(1, 0)
+    moved = reproject(gdf, crs)
+    assert moved is not first
+    np.testing.assert_allclose(
+        shapely.area(np.asarray(moved)),
+        shapely.area(np.asarray(gdf.to_crs(crs).geometry)), rtol=1e-12)
+
+    # | Same geometry array, now read as web mercator meters.
+    geometry = gdf.geometry.values
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        gdf.crs = 'EPSG:3857'
+    assert gdf.geometry.values is geometry
+    relabeled = reproject(gdf, crs)
+    expected = gdf.to_crs(crs).geometry
+    np.testing.assert_allclose(shapely.area(np.asarray(relabeled)),
+                               shapely.area(np.asarray(expected)),
+                               rtol=1e-12)
+    assert not np.allclose(shapely.area(np.asarray(relabeled)),
+                           shapely.area(np.asarray(moved)))
+
+
+def test_reproject_needs_crs(polygons):
+    with pytest.raises(ValueError, match='without CRS'):
+        reproject(gpd.GeoDataFrame(geometry=np.asarray(polygons.geometry)),
+                  'EPSG:4326')
@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+import geopandas as gpd
+
+from benchmarks.synthetic import (adjacent_polygons, bird_tracks,
+                                  protected_polygons)
+from geobirds.batch import ReferenceLayers, run_batch, species_stats
+from geobirds.trajectory import ID, LAT, LON, TIME
+
+NS_PER_DAY = 86400 * 10**9
+
+
+@pytest.fixture(scope='module')
+def reference():
+    world = adjacent_polygons(8, segment=0.5, seed=6).rename(
+        columns={'NAME': 'name'})
+    world['name'] = [f'Country {i}' for i in range(len(world))]
+    return ReferenceLayers(protected_polygons(300, seed=7), world)
+
+
+def as_birds(df):
+    return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(
+        df[LON], df[LAT]), crs='EPSG:4326')
+
+
+def reference_stats(birds, reference):
+    '''
+    Fixes and days per country with pandas: every fix gets half of the
+    gaps to its neighbours of the same bird.
+    '''
+    points = np.asarray(birds.geometry)
+    df = pd.DataFrame({'bird': birds[ID].to_numpy(),
+                       't': birds[TIME].to_numpy(dtype='datetime64[ns]'),
+                       'country': reference.country(points),
+                       'inside': reference.n_protected(points) > 0})
+    df = df.sort_values(['bird', 't'], kind='stable')
+    gap = df.groupby('bird')['t'].diff().dt.total_seconds() / 86400
+    df['days'] = (gap.fillna(0) / 2
+                  + gap.groupby(df['bird']).shift(-1).fillna(0) / 2)
+    df = df[df['country'] != '']
+    days = df.groupby('country')['days'].sum()
+    protected = df[df['inside']].groupby('country')['days'].sum()
+    return df['country'].value_counts(), days, protected
+
+
+def test_species_stats_in_any_row_order(reference):
+    fixes = bird_tracks(3000, n_birds=4, seed=8)
+    counts, days, protected = reference_stats(as_birds(fixes), reference)
+    assert len(days) > 1
+    for order in ('sorted', 'by time', 'shuffled'):
+        df = {'sorted': fixes,
+              'by time': fixes.sort_values(TIME, kind='stable'),
+              'shuffled': fixes.sample(frac=1.0, random_state=1)}[order]
+        stats = species_stats(as_birds(df), reference, 'martin')
+        assert stats['n_fixes'] == len(fixes)
+        assert stats['n_birds'] == 4
+        assert stats['countries'] == counts.to_dict()
+        got = {k: v['days'] for k, v in stats['dwell_days'].items()}
+        assert got == pytest.approx(days.to_dict(), rel=1e-9)
+        got = {k: v['protected_days']
+               for k, v in stats['dwell_days'].items() if v['protected_days']}
+        assert got == pytest.approx(protected.to_dict(), rel=1e-9)
+
+
+@pytest.fixture
+def species(tmp_path):
+    paths = []
+    for k in range(3):
+        path = tmp_path / f'species_{k}.csv'
+        bird_tracks(800, n_birds=3, seed=10 + k).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def test_run_batch(species, reference, tmp_path):
+    out_dir = tmp_path / 'out'
+    manifest = run_batch(species, out_dir, workers=1, reference=reference)
+    assert [j['species'] for j in manifest['jobs']] == [
+        'species_0', 'species_1', 'species_2']
+    assert not (out_dir / 'tiles').exists()
+    html = (out_dir / 'species_0.html').read_text()
+    assert 'topojson' in html.lower() and 'TiledGeoJson' not in html
+    assert json.loads((out_dir / 'batch.json').read_text()) == manifest
+
+    pooled = run_batch(species, tmp_path / 'pooled', workers=2,
+                       maps=False, reference=reference)
+    assert len(pooled['jobs']) == 3
+    for path in species:
+        name = f'{path.stem}.json'
+        assert (json.loads((tmp_path / 'pooled' / name).read_text())
+                == json.loads((out_dir / name).read_text()))
+
+
+def test_run_batch_tiled(species, reference, tmp_path):
+    reference.tiles = None
+    run_batch(species[:1], tmp_path, workers=1, reference=reference,
+              tiled=True)
+    assert (tmp_path / 'tiles' / 'protected_areas' / 'index.json').exists()
+    assert 'TiledGeoJson' in (tmp_path / 'species_0.html').read_text()
+    reference.tiles = None
+
+
+def test_run_batch_without_paths(tmp_path):
+    manifest = run_batch([], tmp_path)
+    assert manifest['jobs'] == []
+    assert (tmp_path / 'batch.json').exists()
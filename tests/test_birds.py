@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import bird_tracks
+from geobirds.birds import TrackAssembler, bird_ids, read_tracks
+from geobirds.trajectory import ID, LAT, LON, TIME
+
+
+def shuffled_tracks(n_fixes=5000, n_birds=7, seed=0):
+    df = bird_tracks(n_fixes, n_birds=n_birds, seed=seed)
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def groupby_sorted(df):
+    '''
+    The reference: birds in order of first appearance, fixes in time
+    order (stable) within each bird.
+    '''
+    first = df.groupby(ID, sort=False).ngroup()
+    return df.assign(_bird=first).sort_values(
+        ['_bird', TIME], kind='stable').drop(columns='_bird')
+
+
+@pytest.mark.parametrize('chunk', [100, 1000, 10**6])
+def test_assembler_matches_groupby_sort(chunk):
+    df = shuffled_tracks()
+    assembler = TrackAssembler()
+    for lo in range(0, len(df), chunk):
+        part = df.iloc[lo:lo + chunk]
+        assembler.add(part[ID].to_numpy(),
+                      part[TIME].to_numpy(dtype='datetime64[ns]'),
+                      part[LON].to_numpy(), part[LAT].to_numpy())
+    ids, t, lon, lat, offsets = assembler.arrays()
+
+    ref = groupby_sorted(df)
+    expected_ids = ref[ID].unique()
+    np.testing.assert_array_equal(ids, expected_ids)
+    np.testing.assert_array_equal(
+        np.diff(offsets), ref.groupby(ID, sort=False).size()[expected_ids])
+    np.testing.assert_array_equal(t, ref[TIME].to_numpy(
+        dtype='datetime64[ns]'))
+    np.testing.assert_array_equal(lon, ref[LON].to_numpy())
+    np.testing.assert_array_equal(lat, ref[LAT].to_numpy())
+
+
+def test_read_tracks_int_and_string_ids(tmp_path):
+    df = shuffled_tracks(n_fixes=3000)
+    path = tmp_path / 'tracks.csv'
+    df.to_csv(path, index=False)
+    tracks = read_tracks(path, chunksize=700)
+    ref = groupby_sorted(df)
+    assert tracks.ids.dtype == np.int64
+    np.testing.assert_array_equal(tracks.ids, ref[ID].unique())
+    # | The CSV parser may differ from repr in the last bit.
+    np.testing.assert_allclose(tracks.lon, ref[LON].to_numpy(), rtol=1e-15)
+
+    df[ID] = 'tag-' + df[ID].astype(str)
+    df.to_csv(path, index=False)
+    named = read_tracks(path, chunksize=700)
+    assert named.ids.dtype == object
+    np.testing.assert_array_equal(named.ids, 'tag-' + ref[ID].unique()
+                                  .astype(str))
+    np.testing.assert_array_equal(named.t, tracks.t)
+    np.testing.assert_array_equal(named.lon, tracks.lon)
+
+
+def test_read_tracks_timestamp_formats(tmp_path):
+    df = shuffled_tracks(n_fixes=200)
+    path = tmp_path / 'tracks.csv'
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.000'):
+        df.assign(**{TIME: pd.to_datetime(df[TIME]).dt.strftime(fmt)}
+                  ).to_csv(path, index=False)
+        tracks = read_tracks(path)
+        np.testing.assert_array_equal(
+            np.sort(tracks.t), np.sort(df[TIME].to_numpy(
+                dtype='datetime64[ns]')))
+
+
+def test_bird_ids():
+    assert bird_ids(['30000', '30001']).dtype == np.int64
+    assert bird_ids(['30000', '030001']).dtype == object
+    assert bird_ids(['a', '1']).dtype == object
+    assert bird_ids([5, 7]).tolist() == [5, 7]
+
+
+def test_missing_ids_are_dropped(tmp_path):
+    df = shuffled_tracks(n_fixes=1000)
+    df[ID] = df[ID].astype(object)
+    df.loc[[0, 10, 500], ID] = np.nan
+    path = tmp_path / 'tracks.csv'
+    df.to_csv(path, index=False)
+    tracks = read_tracks(path, chunksize=300)
+    ref = groupby_sorted(df.dropna(subset=[ID]).astype({ID: np.int64}))
+    assert tracks.n_fixes == len(df) - 3
+    np.testing.assert_array_equal(tracks.ids, ref[ID].unique())
+    np.testing.assert_array_equal(tracks.t, ref[TIME].to_numpy(
+        dtype='datetime64[ns]'))
+
+    # | A chunk without any id.
+    assembler = TrackAssembler()
+    assembler.add(pd.Categorical([np.nan, np.nan]),
+                  np.zeros(2, dtype='datetime64[ns]'), np.zeros(2),
+                  np.zeros(2))
+    ids, t, lon, lat, offsets = assembler.arrays()
+    assert len(ids) == len(t) == 0 and offsets.tolist() == [0]
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import shapely
+import geopandas as gpd
+
+from geobirds import cache
+from geobirds.cache import cached_array, cached_frame, evict, file_digest
+
+
+def frame(n):
+    return gpd.GeoDataFrame({'n': np.arange(n)},
+                            geometry=shapely.points(np.arange(n), 0),
+                            crs='EPSG:4326')
+
+
+def test_hit_and_miss(tmp_path):
+    calls = []
+
+    def build():
+        calls.append(1)
+        return frame(3)
+
+    first = cached_frame('layer', 'a' * 64, {'tol': 1}, build, tmp_path)
+    second = cached_frame('layer', 'a' * 64, {'tol': 1}, build, tmp_path)
+    assert not first.attrs['cache']['hit']
+    assert second.attrs['cache']['hit']
+    assert len(calls) == 1
+    assert second.drop(columns='geometry').equals(
+        first.drop(columns='geometry'))
+    assert second.geometry.geom_equals(first.geometry).all()
+
+    # | Other parameters or another source are another entry.
+    cached_frame('layer', 'a' * 64, {'tol': 2}, build, tmp_path)
+    cached_frame('layer', 'b' * 64, {'tol': 1}, build, tmp_path)
+    assert len(calls) == 3
+    assert len(list(tmp_path.glob('layer-*.parquet'))) == 3
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_evict_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'MAX_ENTRIES', 2)
+    paths = {}
+    for i, tol in enumerate([1, 2, 3]):
+        if tol == 3:
+            # | Reading the oldest entry makes it the most recent one.
+            cached_frame('layer', 'a' * 64, {'tol': 1}, None, tmp_path)
+        gdf = cached_frame('layer', 'a' * 64, {'tol': tol},
+                           lambda: frame(2), tmp_path)
+        paths[tol] = gdf.attrs['cache']['path']
+        stamp = 1_000_000_000 + i
+        os.utime(paths[tol], (stamp, stamp))
+    assert os.path.exists(paths[1])
+    assert not os.path.exists(paths[2])
+    assert os.path.exists(paths[3])
+
+
+def test_evict_keep(tmp_path):
+    for i in range(5):
+        path = tmp_path / f'grid-{i}.npy'
+        path.write_bytes(b'')
+        os.utime(path, (i, i))
+    (tmp_path / 'other-0.npy').write_bytes(b'')
+    evict(tmp_path, 'grid', '.npy', keep=2)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        'grid-3.npy', 'grid-4.npy', 'other-0.npy']
+
+
+def test_cached_array(tmp_path):
+    calls = []
+
+    def fill(out):
+        calls.append(1)
+        out[:] = np.arange(6).reshape(2, 3)
+
+    a = cached_array('grid', 'a' * 64, {'res': 1}, (2, 3), np.int32, fill,
+                     tmp_path)
+    b = cached_array('grid', 'a' * 64, {'res': 1}, (2, 3), np.int32, fill,
+                     tmp_path)
+    assert len(calls) == 1
+    assert isinstance(b, np.memmap) and not b.flags.writeable
+    np.testing.assert_array_equal(a, np.arange(6).reshape(2, 3))
+    np.testing.assert_array_equal(b, a)
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_file_digest(tmp_path):
+    src = tmp_path / 'data.csv'
+    src.write_text('a,b\n1,2\n')
+    cache_dir = tmp_path / 'cache'
+    digest = file_digest([src], cache_dir)
+    assert (cache_dir / 'digests.json').exists()
+    assert file_digest([src], cache_dir) == digest
+    assert not list(cache_dir.glob('*.tmp'))
+    src.write_text('a,b\n1,3\n')
+    assert file_digest([src], cache_dir) != digest
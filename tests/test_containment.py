@@ -0,0 +1,50 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+
+from benchmarks.synthetic import bird_tracks, protected_polygons
+from geobirds.containment import fix_containment, local_metric_crs
+from geobirds.trajectory import LAT, LON
+
+
+@pytest.fixture(scope='module')
+def layers():
+    birds = bird_tracks(1_500, n_birds=4, seed=8)
+    birds = gpd.GeoDataFrame(birds, geometry=gpd.points_from_xy(
+        birds[LON], birds[LAT]), crs='EPSG:4326')
+    birds.index = birds.index + 100
+    protected = protected_polygons(250, bounds=(-90, -15, -45, 45),
+                                   radius=(0.5, 3.0), seed=9)
+    return birds, protected
+
+
+def test_matches_brute_force(layers):
+    birds, protected = layers
+    crs = local_metric_crs(birds)
+    out = fix_containment(birds, protected)
+    points = np.asarray(birds.to_crs(crs).geometry)[:, None]
+    polygons = np.asarray(protected.to_crs(crs).geometry)[None, :]
+
+    inside = shapely.intersects(points, polygons)
+    assert 0 < inside.any(axis=1).sum() < len(birds)
+    np.testing.assert_array_equal(out['n_protected'], inside.sum(axis=1))
+    np.testing.assert_array_equal(out['in_protected'], inside.any(axis=1))
+    hit = out['protected_index'].to_numpy()
+    assert (hit[~inside.any(axis=1)] == -1).all()
+    assert inside[np.flatnonzero(hit >= 0), hit[hit >= 0]].all()
+
+    dist = shapely.distance(points, shapely.boundary(polygons)).min(axis=1)
+    np.testing.assert_allclose(out['boundary_dist_m'], dist, rtol=1e-9)
+    assert out.index.equals(birds.index)
+
+
+def test_max_distance(layers):
+    birds, protected = layers
+    full = fix_containment(birds, protected)
+    near = fix_containment(birds, protected, max_distance=20_000)
+    within = full['boundary_dist_m'] <= 20_000
+    assert 0 < within.sum() < len(birds)
+    np.testing.assert_allclose(near.loc[within, 'boundary_dist_m'],
+                               full.loc[within, 'boundary_dist_m'])
+    assert near.loc[~within, 'boundary_dist_m'].isna().all()
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+import geopandas as gpd
+
+from benchmarks.synthetic import bird_tracks, protected_polygons
+from geobirds.datastore import (DataStore, member_path, open_member,
+                                source_digest)
+
+FOLDER = 'course-data'
+
+
+@pytest.fixture
+def data(tmp_path):
+    '''
+    The same data as a directory and as a zip archive with a folder.
+    '''
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    bird_tracks(500, seed=1).to_csv(data_dir / 'tracks.csv', index=False)
+    protected_polygons(20, seed=1).to_file(data_dir / 'protected.shp')
+    archive = tmp_path / 'data.zip'
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as z:
+        for path in sorted(data_dir.iterdir()):
+            z.write(path, f'{FOLDER}/{path.name}')
+    return data_dir, archive
+
+
+def open_fds():
+    return {os.readlink(f'/proc/self/fd/{fd}')
+            for fd in os.listdir('/proc/self/fd')
+            if os.path.exists(f'/proc/self/fd/{fd}')}
+
+
+def test_register_copies_the_archive(data, tmp_path):
+    _, archive = data
+    store = DataStore(tmp_path / 'store')
+    digest = store.register(archive)
+    assert digest == hashlib.sha256(archive.read_bytes()).hexdigest()
+    stored = store.archive_path(digest)
+    assert not os.path.samefile(stored, archive)
+    assert store.resolve('data') == digest
+    assert store.member(digest, 'tracks.csv') == f'{FOLDER}/tracks.csv'
+
+    # | Changing the source afterwards does not change the store.
+    archive.write_bytes(b'not a zip any more')
+    assert store.verify(digest)
+    again = DataStore(tmp_path / 'store')
+    assert again.resolve('data') == digest
+    assert not list(stored.parent.glob('*.tmp'))
+
+
+def test_register_checks_digest(data, tmp_path):
+    _, archive = data
+    store = DataStore(tmp_path / 'store')
+    with pytest.raises(ValueError, match='expected'):
+        store.register(archive, sha256='0' * 64)
+    with pytest.raises(KeyError):
+        store.resolve('data')
+
+
+def test_members_match_the_directory(data, tmp_path):
+    data_dir, archive = data
+    store = DataStore(tmp_path / 'store')
+    with open_member(archive, 'tracks.csv', store) as f:
+        from_zip = pd.read_csv(f)
+    with open_member(data_dir, 'tracks.csv', store) as f:
+        from_dir = pd.read_csv(f)
+    pd.testing.assert_frame_equal(from_zip, from_dir)
+
+    expected = gpd.read_file(member_path(data_dir, 'protected.shp'))
+    read = gpd.read_file(member_path(archive, 'protected.shp', store))
+    assert read.geometry.geom_equals_exact(expected.geometry, 1e-9).all()
+    assert read['NAME'].tolist() == expected['NAME'].tolist()
+
+
+def test_open_closes_the_archive(data, tmp_path):
+    _, archive = data
+    store = DataStore(tmp_path / 'store')
+    digest = store.register(archive)
+    stored = str(store.archive_path(digest))
+    with store.open(digest, 'tracks.csv') as f:
+        assert f.read(9) == b'timestamp'
+        assert stored in open_fds()
+    assert stored not in open_fds()
+
+
+def test_source_digest(data, tmp_path):
+    _, archive = data
+    store = DataStore(tmp_path / 'store')
+    csv = source_digest(archive, 'tracks.csv', store)
+    assert csv == source_digest(archive, f'{FOLDER}/tracks.csv', store)
+    assert csv != source_digest(archive, 'protected.shp', store)
+    with pytest.raises(KeyError):
+        store.member(store.resolve('data'), 'missing.csv')
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import shapely
+
+from benchmarks.synthetic import protected_polygons
+from geobirds.dissolve import (dissolve_protected, footprint_report,
+                               load_footprint)
+
+
+@pytest.fixture(scope='module')
+def protected():
+    return protected_polygons(300, bounds=(-70, -30, -55, -15), seed=10)
+
+
+@pytest.fixture(scope='module')
+def union(protected):
+    return shapely.unary_union(list(protected.geometry))
+
+
+def test_footprint_is_the_union(protected, union):
+    out = dissolve_protected(protected)
+    assert out['group'].tolist() == ['all']
+    assert out['n_polygons'].tolist() == [len(protected)]
+    assert shapely.equals_exact(shapely.normalize(out.geometry.iloc[0]),
+                                shapely.normalize(union), 1e-9)
+
+
+def test_tiles_add_up_to_the_union(protected, union):
+    out = dissolve_protected(protected, tile=2.0)
+    assert len(out) > 1 and out['tile'].is_unique
+    pieces = np.asarray(out.geometry)
+    assert shapely.area(pieces).sum() == pytest.approx(union.area, rel=1e-9)
+    overlap = shapely.intersection(pieces[:, None], pieces[None, :])
+    np.fill_diagonal(overlap, shapely.Polygon())
+    assert shapely.area(overlap).max() < 1e-9
+
+
+def test_groups_match_groupby(protected):
+    out = dissolve_protected(protected, by='ISO3').set_index('ISO3')
+    for iso3, rows in protected.groupby('ISO3'):
+        assert out.loc[iso3, 'n_polygons'] == len(rows)
+        assert shapely.area(out.loc[iso3].geometry) == pytest.approx(
+            shapely.unary_union(list(rows.geometry)).area, rel=1e-9)
+
+
+def test_report_and_cache(protected, tmp_path):
+    footprint = load_footprint(protected, cache_dir=tmp_path)
+    again = load_footprint(protected, cache_dir=tmp_path)
+    assert shapely.equals(footprint.geometry.values,
+                          again.geometry.values).all()
+    report = footprint_report(protected, footprint)
+    assert report['naive'] > report['footprint'] > 0
+    assert report['overlap'] == pytest.approx(
+        report['naive'] - report['footprint'])
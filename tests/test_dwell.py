@@ -0,0 +1,87 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import (adjacent_polygons, bird_tracks,
+                                  protected_polygons)
+from geobirds.dwell import AT_SEA, bird_dwell, country_dwell, fix_days
+from geobirds.trajectory import ID, LAT, LON, TIME
+
+
+@pytest.fixture(scope='module')
+def birds():
+    birds = bird_tracks(3_000, n_birds=5, seed=16)
+    return gpd.GeoDataFrame(birds, geometry=gpd.points_from_xy(
+        birds[LON], birds[LAT]), crs='EPSG:4326')
+
+
+@pytest.fixture(scope='module')
+def layers():
+    countries = adjacent_polygons(6, bounds=(-80, -20, -40, 35),
+                                  segment=0.5, seed=17)
+    countries = countries.rename(columns={'NAME': 'name'})
+    protected = protected_polygons(200, bounds=(-80, -20, -40, 35),
+                                   radius=(0.5, 2.0), seed=18)
+    return countries, protected
+
+
+def reference_days(birds, max_gap_h=None):
+    gap = birds.groupby(ID)[TIME].diff().dt.total_seconds() / 86400
+    if max_gap_h is not None:
+        gap[gap > max_gap_h / 24] = 0.0
+    gap = gap.fillna(0.0)
+    following = gap.groupby(birds[ID]).shift(-1).fillna(0.0)
+    return (gap + following).to_numpy() / 2
+
+
+@pytest.mark.parametrize('max_gap_h', [None, 6.0])
+def test_fix_days_match_diff(birds, max_gap_h):
+    days = fix_days(birds, max_gap_h)
+    np.testing.assert_allclose(days, reference_days(birds, max_gap_h),
+                               rtol=1e-12)
+    if max_gap_h is None:
+        span = birds.groupby(ID)[TIME].agg(lambda t: t.max() - t.min())
+        np.testing.assert_allclose(
+            pd.Series(days).groupby(birds[ID].to_numpy()).sum(),
+            span.dt.total_seconds() / 86400)
+
+
+def test_bird_dwell_matches_sjoin(birds, layers):
+    countries, protected = layers
+    out = bird_dwell(birds, countries, protected)
+
+    country = gpd.sjoin(birds, countries[['name', 'geometry']],
+                        predicate='intersects', how='left')
+    country = country[~country.index.duplicated()]['name'].fillna(AT_SEA)
+    inside = gpd.sjoin(birds, protected[['geometry']],
+                       predicate='intersects').index.unique()
+    fixes = pd.DataFrame({ID: birds[ID], 'country': country,
+                          'inside': birds.index.isin(inside),
+                          'days': reference_days(birds)})
+    fixes['protected'] = fixes['days'].where(fixes['inside'], 0.0)
+    expected = fixes.groupby([ID, 'country']).agg(
+        n_fixes=('days', 'size'), dwell_days=('days', 'sum'),
+        protected_days=('protected', 'sum')).reset_index()
+    assert set(expected['country']) > {AT_SEA}
+    assert expected['protected_days'].sum() > 0
+
+    pd.testing.assert_frame_equal(
+        out[[ID, 'country', 'n_fixes', 'dwell_days', 'protected_days']],
+        expected, check_dtype=False, rtol=1e-9)
+    np.testing.assert_allclose(out['unprotected_days'],
+                               out['dwell_days'] - out['protected_days'])
+
+    inside = birds.index.isin(inside)
+    np.testing.assert_allclose(
+        bird_dwell(birds, countries, inside=inside)['protected_days'],
+        out['protected_days'])
+
+    per_country = country_dwell(out)
+    assert per_country['dwell_days'].is_monotonic_decreasing
+    per_country = per_country.set_index('country').sort_index()
+    by_country = expected.groupby('country')
+    np.testing.assert_allclose(per_country['dwell_days'],
+                               by_country['dwell_days'].sum())
+    np.testing.assert_array_equal(per_country['n_birds'],
+                                  by_country[ID].nunique())
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from benchmarks.synthetic import bird_tracks, protected_polygons
+from geobirds.area import REGION_CRS, transformer
+from geobirds.hotspots import (cell_polygons, hex_cells, hotspot_protection,
+                               hotspots, time_windows)
+from geobirds.trajectory import ID, LAT, LON, TIME
+
+CELL = 200_000
+
+
+@pytest.fixture(scope='module')
+def birds():
+    return bird_tracks(4_000, n_birds=6, start='2014-06-01', seed=14)
+
+
+@pytest.fixture(scope='module')
+def xy(birds):
+    return transformer('EPSG:4326', REGION_CRS['World']).transform(
+        birds[LON].to_numpy(), birds[LAT].to_numpy())
+
+
+def test_hex_cells_hold_their_points(xy):
+    x, y = xy
+    i, j = hex_cells(x, y, CELL)
+    polygons = cell_polygons(i, j, CELL)
+    assert shapely.area(polygons) == pytest.approx(CELL ** 2)
+    assert shapely.intersects_xy(shapely.buffer(polygons, 1e-6), x, y).all()
+
+
+@pytest.mark.parametrize('kind', ['hex', 'square'])
+def test_counts_match_groupby(birds, xy, kind):
+    hot = hotspots(birds, cell=CELL, kind=kind)
+    window, names = time_windows(birds[TIME].to_numpy())
+    assert names == ['summer', 'winter']
+    x, y = xy
+    if kind == 'hex':
+        i, j = hex_cells(x, y, CELL)
+    else:
+        i, j = np.floor(x / CELL), np.floor(y / CELL)
+    fixes = pd.DataFrame({'window': window, 'i': i, 'j': j,
+                          ID: birds[ID].to_numpy()})
+    fixes = fixes[fixes['window'] >= 0]
+    expected = fixes.groupby(['window', 'i', 'j'])[ID].agg(['size',
+                                                           'nunique'])
+    out = hot.assign(window=hot['window'].cat.codes).set_index(
+        ['window', 'i', 'j']).loc[expected.index]
+    assert len(hot) == len(expected)
+    np.testing.assert_array_equal(out['n_fixes'], expected['size'])
+    np.testing.assert_array_equal(out['n_birds'], expected['nunique'])
+    assert (hot['n_birds'].diff().dropna() <= 0).all()
+
+
+def test_one_window(birds):
+    hot = hotspots(birds, cell=CELL, windows={})
+    assert set(hot['window']) == {'all'}
+    assert hot['n_fixes'].sum() == len(birds)
+
+
+def test_protection_matches_overlay(birds):
+    hot = hotspots(birds, cell=CELL)
+    protected = protected_polygons(300, bounds=(-95, -20, -40, 50),
+                                   radius=(0.5, 3.0), seed=15)
+    out = hotspot_protection(hot, protected, top=10)
+    assert out.groupby('window', observed=True).size().max() == 10
+    footprint = shapely.union_all(
+        np.asarray(protected.to_crs(hot.crs).geometry))
+    cells = np.asarray(out.geometry)
+    expected = (shapely.area(shapely.intersection(cells, footprint))
+                / shapely.area(cells))
+    assert expected.max() > 0
+    np.testing.assert_allclose(out['protected_fraction'], expected,
+                               rtol=1e-6, atol=1e-12)
+    hit = shapely.intersects(cells[:, None], np.asarray(
+        protected.to_crs(hot.crs).geometry)[None, :])
+    for k, names in enumerate(out['protected_names']):
+        assert len(names) == hit[k].sum()
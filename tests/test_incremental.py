@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import bird_tracks, protected_polygons
+from geobirds.batch import ReferenceLayers
+from geobirds.birds import read_tracks
+from geobirds.incremental import IncrementalTracks
+from geobirds.movement import step_metrics, stopovers
+from geobirds.trajectory import ID, TIME
+
+N_FIXES = 4000
+# | Short enough that the synthetic tracks have many stopovers.
+STOPOVER = {'radius_km': 12.0, 'min_hours': 24.0}
+
+
+@pytest.fixture(scope='module')
+def reference():
+    return ReferenceLayers(protected_polygons(300, seed=3))
+
+
+@pytest.fixture
+def fixes():
+    df = bird_tracks(N_FIXES, n_birds=5, seed=4)
+    return df.sort_values(TIME, kind='stable').reset_index(drop=True)
+
+
+def full_stats(path, reference):
+    '''
+    The metrics of `IncrementalTracks.stats`, computed on the whole CSV.
+    '''
+    tracks = read_tracks(path)
+    birds = tracks.to_birds()
+    steps = step_metrics(tracks)
+    inside = reference.n_protected(np.asarray(birds.geometry)) > 0
+    per_fix = pd.DataFrame({'bird': birds[ID].to_numpy(),
+                            'step_km': steps['step_km'].to_numpy(),
+                            'speed_kmh': steps['speed_kmh'].to_numpy(),
+                            'inside': inside})
+    out = per_fix.groupby('bird', sort=False).agg(
+        n_fixes=('inside', 'size'), distance_km=('step_km', 'sum'),
+        max_speed_kmh=('speed_kmh', 'max'),
+        fixes_in_protected=('inside', 'sum'))
+    stops = stopovers(tracks, **STOPOVER).groupby(ID)['dwell_h'].agg(
+        ['size', 'sum'])
+    out['n_stopovers'] = stops['size'].reindex(out.index, fill_value=0)
+    out['stopover_hours'] = stops['sum'].reindex(out.index, fill_value=0.0)
+    return out
+
+
+def assert_same(incremental, full):
+    stats = incremental.stats().set_index('bird').loc[full.index]
+    for col in full.columns:
+        np.testing.assert_allclose(stats[col].to_numpy(dtype=float),
+                                   full[col].to_numpy(dtype=float),
+                                   rtol=1e-9, err_msg=col)
+
+
+@pytest.mark.parametrize('cuts', [[N_FIXES], [1000, 1001, 2500, N_FIXES],
+                                  [10, 3000, 3990, N_FIXES]])
+def test_appended_equals_full(tmp_path, fixes, reference, cuts):
+    path = tmp_path / 'tracks.csv'
+    tracks = IncrementalTracks(tmp_path / 'state', reference, **STOPOVER)
+    lo = 0
+    for hi in cuts:
+        fixes.iloc[lo:hi].to_csv(path, mode='a' if lo else 'w',
+                                 header=not lo, index=False)
+        summary = tracks.update(path)
+        assert summary['new_fixes'] == hi - lo
+        lo = hi
+    assert_same(tracks, full_stats(path, reference))
+
+    # | A new instance continues from the saved state, whatever path
+    # | names the same CSV.
+    again = IncrementalTracks(tmp_path / 'state', reference, **STOPOVER)
+    assert again.update(tmp_path / '.' / 'tracks.csv')['new_fixes'] == 0
+
+
+def test_out_of_order_fixes_rebuild(tmp_path, fixes, reference):
+    path = tmp_path / 'tracks.csv'
+    late = fixes.index[fixes[ID] == fixes[ID].iloc[0]][:20]
+    first = fixes.drop(index=late)
+    tracks = IncrementalTracks(tmp_path / 'state', reference, **STOPOVER)
+    first.to_csv(path, index=False)
+    tracks.update(path)
+    fixes.loc[late].to_csv(path, mode='a', header=False, index=False)
+    assert tracks.update(path)['rebuilt'] == 1
+    assert_same(tracks, full_stats(path, reference))
+
+
+def test_rewritten_csv_starts_over(tmp_path, fixes, reference):
+    path = tmp_path / 'tracks.csv'
+    tracks = IncrementalTracks(tmp_path / 'state', reference, **STOPOVER)
+    fixes.iloc[:2000].to_csv(path, index=False)
+    tracks.update(path)
+    fixes.iloc[2000:].to_csv(path, index=False)
+    assert tracks.update(path)['new_fixes'] == N_FIXES - 2000
+    assert_same(tracks, full_stats(path, reference))
+
+
+def test_string_ids(tmp_path, fixes, reference):
+    fixes[ID] = 'tag/' + fixes[ID].astype(str)
+    path = tmp_path / 'tracks.csv'
+    tracks = IncrementalTracks(tmp_path / 'state', reference, **STOPOVER)
+    fixes.iloc[:2500].to_csv(path, index=False)
+    tracks.update(path)
+    fixes.iloc[2500:].to_csv(path, mode='a', header=False, index=False)
+    tracks.update(path)
+    assert_same(tracks, full_stats(path, reference))
+
+
+def test_missing_ids(tmp_path, fixes, reference):
+    fixes[ID] = fixes[ID].astype(object)
+    fixes.loc[[5, 2600, 3000], ID] = np.nan
+    path = tmp_path / 'tracks.csv'
+    tracks = IncrementalTracks(tmp_path / 'state', reference, **STOPOVER)
+    fixes.iloc[:2500].to_csv(path, index=False)
+    tracks.update(path)
+    fixes.iloc[2500:].to_csv(path, mode='a', header=False, index=False)
+    assert tracks.update(path)['new_fixes'] == N_FIXES - 2500 - 2
+    assert_same(tracks, full_stats(path, reference))
+    assert tracks.stats()['n_fixes'].sum() == N_FIXES - 3
@@ -0,0 +1,120 @@
+import json
+
+import folium
+import numpy as np
+import pytest
+import shapely
+
+from benchmarks.synthetic import bird_tracks
+from geobirds.layers import add_tracks, birds_lod, track_collection
+from geobirds.simplify import NEVER, lod_report, mercator_xy
+from geobirds.tiles import pixel_size
+from geobirds.trajectory import ID, LAT, LON
+
+MIN_ZOOM, MAX_ZOOM = 2, 12
+
+
+@pytest.fixture(scope='module')
+def birds():
+    birds = bird_tracks(20_000, n_birds=5, seed=4)
+    birds['color'] = birds[ID].map(lambda i: f'#{i % 256:02x}0000')
+    return birds
+
+
+@pytest.fixture(scope='module')
+def lod(birds):
+    return birds_lod(birds, MIN_ZOOM, MAX_ZOOM)
+
+
+def test_dropped_fixes_are_within_tolerance(birds, lod):
+    x, y = mercator_xy(birds[LON].to_numpy(), birds[LAT].to_numpy())
+    for _, rows in birds.groupby(ID).indices.items():
+        assert lod[rows[0]] == lod[rows[-1]] == MIN_ZOOM
+        points = shapely.points(x[rows], y[rows])
+        for z in (MIN_ZOOM, 6, MAX_ZOOM):
+            on_path = rows[lod[rows] <= z]
+            path = shapely.linestrings(x[on_path], y[on_path])
+            d = shapely.distance(points, path)
+            assert d.max() <= pixel_size(z) * (1 + 1e-9)
+
+
+def test_coarsest_level_is_douglas_peucker(birds, lod):
+    x, y = mercator_xy(birds[LON].to_numpy(), birds[LAT].to_numpy())
+    tol = pixel_size(MIN_ZOOM)
+    for _, rows in birds.groupby(ID).indices.items():
+        line = shapely.linestrings(x[rows], y[rows])
+        simple = shapely.simplify(line, tol, preserve_topology=False)
+        assert (lod[rows] == MIN_ZOOM).sum() == shapely.get_num_points(simple)
+
+
+def test_lod_report(lod):
+    report = lod_report(lod, MIN_ZOOM, MAX_ZOOM)
+    assert report['zoom'].tolist() == list(range(MIN_ZOOM, MAX_ZOOM + 1))
+    assert report['fixes'].is_monotonic_increasing
+    assert report['fixes'].iloc[-1] == (lod != NEVER).sum()
+    np.testing.assert_allclose(report['reduction'],
+                               len(lod) / report['fixes'])
+    # | Continental zoom draws a small fraction of the fixes.
+    assert report['reduction'].iloc[0] > 20
+    assert report['reduction'].iloc[-1] >= 1
+
+
+def test_add_tracks_keeps_every_marker(birds, lod):
+    layer = add_tracks(folium.Map(), birds, min_zoom=MIN_ZOOM,
+                       max_zoom=MAX_ZOOM)
+    collection = json.loads(layer.data)
+    assert collection == json.loads(json.dumps(track_collection(
+        birds, lod=lod, marker_zoom=MIN_ZOOM)))
+    assert layer.options['min_zoom'] == MIN_ZOOM
+
+    counts = birds.groupby(ID).size()
+    points = [f for f in collection['features']
+              if f['geometry']['type'] == 'MultiPoint']
+    lines = [f for f in collection['features']
+             if f['geometry']['type'] == 'LineString']
+    assert [f['properties']['id'] for f in points] == counts.index.tolist()
+    for f, n in zip(points, counts):
+        assert len(f['geometry']['coordinates']) == n
+        assert set(f['properties']['lod']) == {MIN_ZOOM}
+    on_path = lod != NEVER
+    assert (sum(len(f['geometry']['coordinates']) for f in lines)
+            == on_path.sum())
+    for f in lines:
+        assert max(f['properties']['lod']) <= MAX_ZOOM
+
+
+def test_plain_tracks_have_no_lod(birds):
+    collection = track_collection(birds)
+    assert all('lod' not in f['properties']
+               for f in collection['features'])
+    n_points = sum(len(f['geometry']['coordinates'])
+                   for f in collection['features']
+                   if f['geometry']['type'] == 'MultiPoint')
+    assert n_points == len(birds)
+
+
+def test_track_collection_matches_groupby(birds):
+    # | Interleave the birds; the order within a bird stays.
+    shuffled = birds.sample(frac=1, random_state=0).sort_values(
+        'timestamp', kind='stable')
+    collection = track_collection(shuffled)
+    features = iter(collection['features'])
+    for bird, rows in shuffled.groupby(ID):
+        xy = np.round(rows[[LON, LAT]].to_numpy(), 5).tolist()
+        points, line = next(features), next(features)
+        props = {'id': bird, 'color': rows['color'].iloc[0]}
+        assert points == {'type': 'Feature', 'properties': props,
+                          'geometry': {'type': 'MultiPoint',
+                                       'coordinates': xy}}
+        assert line == {'type': 'Feature', 'properties': props,
+                        'geometry': {'type': 'LineString',
+                                     'coordinates': xy}}
+    assert next(features, None) is None
+
+
+def test_track_layer_renders_one_script(birds):
+    m = folium.Map()
+    add_tracks(m, birds, lod=False)
+    html = m.get_root().render()
+    assert html.count('L.canvas()') == 1
+    assert 'L.circleMarker' in html and 'L.polyline' not in html
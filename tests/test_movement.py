@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import bird_tracks
+from geobirds.movement import (EARTH_RADIUS_KM, movement_metrics,
+                               step_metrics, stopovers)
+from geobirds.trajectory import ID, LAT, LON, TIME
+
+RADIUS_KM, MIN_HOURS = 12.0, 12.0
+
+
+@pytest.fixture(scope='module')
+def birds():
+    birds = bird_tracks(3_000, n_birds=5, seed=7)
+    # | Some birds stay put for a while.
+    still = birds.index % 97 < 15
+    birds.loc[still, [LON, LAT]] = birds.loc[still, [LON, LAT]].round(0)
+    return birds.sample(frac=1, random_state=2)
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(math.radians, (lon1, lat1, lon2, lat2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1)
+         * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def test_steps_match_shift(birds):
+    metrics = step_metrics(birds)
+    ordered = birds.sort_values([ID, TIME])
+    previous = ordered.groupby(ID)[[TIME, LON, LAT]].shift()
+    step_km = [np.nan if pd.isna(p[LON]) else
+               haversine(p[LON], p[LAT], f[LON], f[LAT])
+               for (_, p), (_, f) in zip(previous.iterrows(),
+                                         ordered.iterrows())]
+    step_s = (ordered[TIME] - previous[TIME]).dt.total_seconds()
+    metrics = metrics.loc[ordered.index]
+    np.testing.assert_allclose(metrics['step_km'], step_km, rtol=1e-9)
+    np.testing.assert_allclose(metrics['step_s'], step_s)
+    np.testing.assert_allclose(metrics['speed_kmh'],
+                               np.array(step_km) / (step_s / 3600))
+    moved = metrics['step_km'] > 0
+    assert metrics.loc[~moved, 'heading_deg'].isna().all()
+    assert metrics.loc[moved, 'heading_deg'].between(0, 360).all()
+    # | Southward migration.
+    assert metrics['heading_deg'].median() > 90
+
+
+def reference_stopovers(birds):
+    rows = []
+    for bird, fixes in birds.sort_values([ID, TIME]).groupby(ID):
+        fixes = fixes.to_dict('records')
+        runs, run = [], [fixes[0]]
+        for a, b in zip(fixes, fixes[1:]):
+            if haversine(a[LON], a[LAT], b[LON], b[LAT]) < RADIUS_KM:
+                run.append(b)
+            else:
+                runs.append(run)
+                run = [b]
+        runs.append(run)
+        for run in runs:
+            hours = (run[-1][TIME] - run[0][TIME]).total_seconds() / 3600
+            if len(run) > 1 and hours >= MIN_HOURS:
+                rows.append({ID: bird, 'arrival': run[0][TIME],
+                             'departure': run[-1][TIME], 'dwell_h': hours,
+                             'n_fixes': len(run),
+                             'lon': np.mean([f[LON] for f in run]),
+                             'lat': np.mean([f[LAT] for f in run])})
+    return pd.DataFrame(rows)
+
+
+def test_stopovers_match_loop(birds):
+    expected = reference_stopovers(birds)
+    assert len(expected) > 5
+    out = stopovers(birds, RADIUS_KM, MIN_HOURS)
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+    metrics = movement_metrics(birds, RADIUS_KM, MIN_HOURS)
+    assert (metrics['stopover'] >= 0).sum() == expected['n_fixes'].sum()
+    assert sorted(metrics.loc[metrics['stopover'] >= 0, 'dwell_h']
+                  .unique()) == pytest.approx(sorted(expected['dwell_h']))
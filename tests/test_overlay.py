@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import shapely
+import geopandas as gpd
+
+from benchmarks.synthetic import adjacent_polygons, protected_polygons
+from geobirds.overlay import protected_fraction
+
+CRS = 'ESRI:102033'
+
+
+@pytest.fixture(scope='module')
+def layers():
+    countries = adjacent_polygons(12, segment=0.5, seed=1)
+    protected = protected_polygons(400, seed=2)
+    return countries, protected
+
+
+@pytest.mark.parametrize('crs', [None, CRS])
+def test_engines_agree(layers, crs):
+    countries, protected = layers
+    loop = protected_fraction(countries, protected, engine='loop', crs=crs)
+    for engine, kwargs in [('indexed', {}),
+                           ('parallel', {'workers': 1, 'n_tiles': 9}),
+                           ('parallel', {'workers': 2})]:
+        out = protected_fraction(countries, protected, engine=engine,
+                                 crs=crs, **kwargs)
+        np.testing.assert_allclose(out['protected_area_total'],
+                                   loop['protected_area_total'],
+                                   rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(out['protected_area_fraction'],
+                                   loop['protected_area_fraction'],
+                                   rtol=1e-9, atol=1e-12)
+    assert (loop['protected_area_total'] > 0).any()
+
+
+def test_invalid_polygons_are_repaired():
+    countries = gpd.GeoDataFrame(geometry=[shapely.box(0, 0, 2, 2)],
+                                 crs='EPSG:4326')
+    # | A bowtie (self-intersecting) and an overlapping square.
+    bowtie = shapely.Polygon([(0, 0), (2, 2), (2, 0), (0, 2)])
+    protected = gpd.GeoDataFrame(geometry=[bowtie, shapely.box(1, 1, 3, 3)],
+                                 crs='EPSG:4326')
+    for engine in ('loop', 'indexed', 'parallel'):
+        kwargs = {'workers': 1} if engine == 'parallel' else {}
+        out = protected_fraction(countries, protected, engine=engine,
+                                 **kwargs)
+        assert out['protected_area_total'].iloc[0] == pytest.approx(3.0)
+
+
+def test_unknown_engine(layers):
+    countries, protected = layers
+    with pytest.raises(ValueError, match='unknown overlay engine'):
+        protected_fraction(countries, protected, engine='nope')
@@ -0,0 +1,100 @@
+import json
+
+import numpy as np
+import pytest
+import shapely
+import geopandas as gpd
+
+from benchmarks.synthetic import (adjacent_polygons, bird_tracks,
+                                  protected_polygons)
+from geobirds.containment import fix_containment
+from geobirds.overlay import protected_fraction
+from geobirds.partition import (partition_layer, partitioned_containment,
+                                partitioned_fraction)
+from geobirds.trajectory import LAT, LON
+
+CRS = 'ESRI:102033'
+
+
+def partitioned(gdf, out_dir, rows_per_partition, chunksize=70):
+    return partition_layer(lambda rows: gdf.iloc[rows], len(gdf), out_dir,
+                           rows_per_partition, chunksize)
+
+
+@pytest.fixture(scope='module')
+def layers(tmp_path_factory):
+    root = tmp_path_factory.mktemp('partitions')
+    countries = adjacent_polygons(12, segment=0.5, seed=1)
+    protected = protected_polygons(400, seed=2)
+    return (countries, protected, partitioned(countries, root / 'c', 5),
+            partitioned(protected, root / 'p', 60))
+
+
+def test_partitions(layers):
+    countries, protected, part_c, part_p = layers
+    assert part_p.n_partitions == 7
+    assert len(part_p) == len(protected)
+    assert part_c.n_partitions > 1
+    attrs = part_p.attributes()
+    assert attrs.index.tolist() == list(range(len(protected)))
+    assert (attrs['NAME'] == protected['NAME']).all()
+    rows = [3, 150, 399]
+    assert part_p.select(rows).geometry.geom_equals(
+        protected.geometry.iloc[rows].set_axis(rows)).all()
+
+
+@pytest.mark.parametrize('crs', [None, CRS])
+def test_partitioned_fraction(layers, crs):
+    countries, protected, part_c, part_p = layers
+    expected = protected_fraction(countries, protected, crs=crs)
+    out = partitioned_fraction(part_c, part_p, crs=crs)
+    for column in ('protected_area_total', 'area_total',
+                   'protected_area_fraction'):
+        np.testing.assert_allclose(out[column], expected[column],
+                                   rtol=1e-9, atol=1e-9)
+    assert (expected['protected_area_total'] > 0).any()
+
+    rows = [0, 4, 7]
+    subset = partitioned_fraction(part_c, part_p, crs=crs, country_rows=rows)
+    assert subset.index.tolist() == rows
+    np.testing.assert_allclose(subset['protected_area_total'],
+                               expected['protected_area_total'].iloc[rows],
+                               rtol=1e-9, atol=1e-9)
+
+
+def test_partitioned_containment(layers):
+    _, protected, _, part_p = layers
+    fixes = bird_tracks(3000, seed=5)
+    birds = gpd.GeoDataFrame(fixes, geometry=gpd.points_from_xy(
+        fixes[LON], fixes[LAT]), crs='EPSG:4326')
+    crs = '+proj=aeqd +lat_0=-10 +lon_0=-60 +datum=WGS84 +units=m'
+    expected = fix_containment(birds, protected, crs=crs)
+    out = partitioned_containment(birds, part_p, crs=crs)
+    assert out.index.equals(expected.index)
+    assert expected['in_protected'].any()
+    assert (out['in_protected'] == expected['in_protected']).all()
+    assert (out['n_protected'] == expected['n_protected']).all()
+    np.testing.assert_allclose(out['boundary_dist_m'],
+                               expected['boundary_dist_m'], rtol=1e-12)
+    # | One of the containing areas, not necessarily the same one.
+    inside = out['in_protected'].to_numpy()
+    index = out['protected_index'].to_numpy()
+    assert (index[~inside] == -1).all()
+    polygons = np.asarray(protected.geometry)[index[inside]]
+    assert shapely.intersects(polygons,
+                              np.asarray(birds.geometry)[inside]).all()
+
+
+def test_crs_of_empty_chunks(tmp_path):
+    protected = protected_polygons(100, seed=3)
+
+    def read(rows):
+        # | The last chunk is filtered out entirely and has no CRS.
+        if rows.start >= 80:
+            return gpd.GeoDataFrame(geometry=[])
+        return protected.iloc[rows]
+
+    layer = partition_layer(read, len(protected), tmp_path, 30, 40)
+    manifest = json.loads((tmp_path / 'index.json').read_text())
+    assert manifest['crs'] == 'EPSG:4326'
+    assert len(layer) == 80
@@ -0,0 +1,62 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from geobirds import profiling
+
+
+@pytest.fixture
+def log(tmp_path):
+    yield tmp_path / 'profile.jsonl'
+    profiling.disable()
+    tracemalloc.stop()
+
+
+def test_off_by_default(log):
+    assert not profiling.enabled()
+    with profiling.stage('read', rows=3) as rec:
+        rec['rows'] = 4
+    assert profiling.profiled()(len)([1, 2]) == 2
+    assert not log.exists()
+
+
+def test_stages_and_summary(log):
+    profiling.enable(log, cprofile='sum')
+
+    @profiling.profiled('sum')
+    def total(n):
+        return np.arange(n)
+
+    with profiling.stage('read', geometries=2) as rec:
+        rec['rows'] = 10
+    total(5)
+    total(7)
+    records = profiling.read_records(log)
+    assert [r['stage'] for r in records] == ['read', 'sum', 'sum']
+    assert records[0]['rows'] == 10 and records[0]['geometries'] == 2
+    assert [r['rows'] for r in records[1:]] == [5, 7]
+    assert all(r['wall_s'] >= 0 and r['cpu_s'] >= 0 for r in records)
+    assert (log.parent / 'sum.prof').exists()
+
+    rows = {r['stage']: r for r in profiling.summary(records)}
+    assert rows['sum']['calls'] == 2 and rows['sum']['rows'] == 12
+    assert rows['sum']['wall_s'] == pytest.approx(
+        sum(r['wall_s'] for r in records[1:]))
+    assert 'sum' in profiling.format_summary(list(rows.values()))
+
+
+def test_nested_stage_keeps_the_outer_peak(log):
+    profiling.enable(log, memory=True)
+    with profiling.stage('outer'):
+        # | 32 MB, freed before the inner stage resets the peak.
+        block = np.ones(4 * 2**20)
+        del block
+        with profiling.stage('inner'):
+            small = np.ones(1000)
+        del small
+    inner, outer = profiling.read_records(log)
+    assert inner['stage'] == 'inner' and outer['stage'] == 'outer'
+    assert inner['alloc_peak_mb'] < 1
+    assert outer['alloc_peak_mb'] >= 32
+    assert outer['alloc_mb'] < 1
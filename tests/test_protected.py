@@ -0,0 +1,80 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from benchmarks.synthetic import protected_polygons
+from geobirds.protected import (PIPELINE_COLUMNS, compact_dtypes,
+                                load_protected_areas, read_protected_areas)
+
+BBOX = (-70.0, -30.0, -50.0, -10.0)
+
+
+@pytest.fixture(scope='module')
+def shp(tmp_path_factory):
+    path = tmp_path_factory.mktemp('wdpa') / 'synthetic.shp'
+    protected_polygons(300, seed=4).to_file(path)
+    return path
+
+
+@pytest.fixture(scope='module')
+def full(shp):
+    # | The reference: everything read, then simplified.
+    out = gpd.read_file(shp)
+    out['geometry'] = out['geometry'].simplify(0.02,
+                                               preserve_topology=False)
+    return out
+
+
+def test_columns_and_compact_match_full_read(shp, full):
+    out = read_protected_areas(shp, columns=PIPELINE_COLUMNS, compact=True)
+    # | The columns come in the order of the file.
+    assert sorted(out.columns) == sorted(PIPELINE_COLUMNS + ['geometry'])
+    assert out['MARINE'].dtype == 'category'
+    assert out['REP_AREA'].dtype == np.float32
+    pd.testing.assert_frame_equal(
+        pd.DataFrame(out[PIPELINE_COLUMNS]).astype(
+            {'MARINE': object, 'REP_AREA': float, 'REP_M_AREA': float}),
+        pd.DataFrame(full[PIPELINE_COLUMNS]), rtol=1e-6)
+    assert shapely.equals(out.geometry.values, full.geometry.values).all()
+
+
+def test_land_only_reads_marine_even_if_not_asked(shp, full):
+    out = read_protected_areas(shp, columns=['NAME'], land_only=True)
+    expected = full[full['MARINE'] != '2']
+    assert list(out['NAME']) == list(expected['NAME'])
+
+
+def test_bbox_and_mask_keep_the_intersecting_areas(shp, full):
+    original = gpd.read_file(shp)
+    expected = original.loc[original.intersects(shapely.box(*BBOX)),
+                            'NAME']
+    assert 0 < len(expected) < len(original)
+    by_bbox = read_protected_areas(shp, columns=['NAME'], bbox=BBOX)
+    by_mask = read_protected_areas(shp, columns=['NAME'],
+                                   mask=shapely.box(*BBOX))
+    assert sorted(by_bbox['NAME']) == sorted(expected)
+    assert sorted(by_mask['NAME']) == sorted(expected)
+
+
+def test_compact_dtypes_keeps_the_values():
+    df = protected_polygons(200, seed=5)
+    compact = compact_dtypes(df.copy())
+    assert compact['ISO3'].dtype == 'category'
+    assert compact['NAME'].dtype == object
+    assert compact['STATUS_YR'].dtype == np.int16
+    pd.testing.assert_frame_equal(
+        pd.DataFrame(compact.drop(columns='geometry')).astype(
+            df.drop(columns='geometry').dtypes.to_dict()),
+        pd.DataFrame(df.drop(columns='geometry')), rtol=1e-6)
+    assert (compact.memory_usage(deep=True).sum()
+            < df.memory_usage(deep=True).sum())
+
+
+def test_cached_load_matches_read(shp, tmp_path):
+    params = dict(columns=PIPELINE_COLUMNS, compact=True, bbox=BBOX)
+    expected = read_protected_areas(shp, **params)
+    for _ in range(2):
+        out = load_protected_areas(shp, cache_dir=tmp_path, **params)
+        pd.testing.assert_frame_equal(out, expected)
@@ -0,0 +1,71 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+
+from benchmarks.synthetic import (adjacent_polygons, bird_tracks,
+                                  protected_polygons)
+from geobirds.area import reproject
+from geobirds.overlay import protected_fraction
+from geobirds.raster import Grid, RasterMask, error_bound
+from geobirds.trajectory import LAT, LON
+
+CRS = 'ESRI:102033'
+N_CELLS = 400
+
+
+@pytest.fixture(scope='module')
+def layers():
+    countries = adjacent_polygons(8, segment=0.5, seed=11)
+    protected = protected_polygons(150, seed=12)
+    return countries, protected
+
+
+def test_grid_index():
+    grid = Grid(0.0, 10.0, 2.0, (5, 4))
+    row, col = grid.index([0.5, 7.9, 8.1, 1.0], [9.5, 0.1, 5.0, 11.0])
+    assert row.tolist() == [0, 4, -1, -1]
+    assert col.tolist() == [0, 3, -1, -1]
+
+
+def test_raster_within_error_bound_of_footprint(layers, tmp_path):
+    countries, protected = layers
+    out = protected_fraction(countries, protected, engine='raster', crs=CRS,
+                             n_cells=N_CELLS, cache_dir=tmp_path)
+    country_geoms = np.asarray(reproject(countries, CRS))
+    protected_geoms = np.asarray(reproject(protected, CRS))
+    # | The raster counts overlaps once: compare with the dissolved areas.
+    footprint = shapely.union_all(protected_geoms)
+    exact = shapely.area(shapely.intersection(country_geoms,
+                                              footprint)) / 10**6
+    cell = Grid.covering(country_geoms, n_cells=N_CELLS).cell
+    bound = error_bound(country_geoms, protected_geoms, cell) / 10**6
+    error = np.abs(out['protected_area_total'] - exact)
+    assert (error <= bound).all()
+    # | And well within it in practice.
+    assert error.sum() < 0.05 * exact.sum()
+
+    # | The second run maps the cached arrays.
+    again = protected_fraction(countries, protected, engine='raster',
+                               crs=CRS, n_cells=N_CELLS, cache_dir=tmp_path)
+    np.testing.assert_array_equal(again['protected_area_total'],
+                                  out['protected_area_total'])
+
+
+def test_mask_matches_contains_away_from_boundaries(layers, tmp_path):
+    _, protected = layers
+    birds = bird_tracks(2_000, n_birds=4, seed=13)
+    birds = gpd.GeoDataFrame(birds, geometry=gpd.points_from_xy(
+        birds[LON], birds[LAT]), crs='EPSG:4326')
+    mask = RasterMask(protected, CRS, cache_dir=tmp_path)
+    inside = mask.contains(birds)
+
+    points = np.asarray(reproject(birds, CRS))
+    polygons = np.asarray(reproject(protected, CRS))
+    exact = shapely.intersects(points[:, None], polygons[None, :]).any(axis=1)
+    near = (shapely.distance(points[:, None],
+                             shapely.boundary(polygons)[None, :]).min(axis=1)
+            <= mask.grid.cell / np.sqrt(2))
+    assert exact.sum() > 0
+    np.testing.assert_array_equal(inside.to_numpy()[~near], exact[~near])
+    assert inside.index.equals(birds.index)
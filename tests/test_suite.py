@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from benchmarks import suite
+
+
+def _results(repeat=3, **walls):
+    return {'scale': 'small', 'seed': 0, 'repeat': repeat, 'memory': False,
+            'environment': {}, 'stages': {name: {'rows': 10, 'wall_s': wall, 'cpu_s': wall,
+                              'peak_rss_mb': 100.0, 'rss_growth_mb': 1.0}
+                       for name, wall in walls.items()}}
+
+
+def test_compare_ignores_noise():
+    baseline = _results(overlay=0.2, folium_html=0.01, csv_load=0.5)
+    results = _results(overlay=0.3, folium_html=0.03, plotly_html=0.1)
+    status = {r['stage']: r['status']
+              for r in suite.compare(results, baseline)}
+    # | 1.5x and 100 ms slower; 3x but only 20 ms slower.
+    assert status == {'overlay': 'slower', 'folium_html': 'ok',
+                      'plotly_html': 'new', 'csv_load': 'missing'}
+    assert suite.regressed(suite.compare(results, baseline)) == ['overlay']
+
+
+def test_main_exits_1_on_regression(tmp_path, monkeypatch):
+    path = tmp_path / 'baseline.json'
+    path.write_text(json.dumps(_results(overlay=0.2)))
+    monkeypatch.setattr(suite, 'run_suite',
+                        lambda *args, **kwargs: _results(overlay=0.21))
+    suite.main(['--baseline', str(path)])
+    monkeypatch.setattr(suite, 'run_suite',
+                        lambda *args, **kwargs: _results(overlay=0.4))
+    with pytest.raises(SystemExit) as error:
+        suite.main(['--baseline', str(path)])
+    assert error.value.code == 1
+
+
+@pytest.mark.parametrize('baseline', [
+    _results() | {'seed': 1},
+    {key: value for key, value in _results().items() if key != 'memory'},
+    _results(repeat=1),
+])
+def test_mismatched_baseline_is_refused(baseline, tmp_path, monkeypatch):
+    path = tmp_path / 'baseline.json'
+    path.write_text(json.dumps(baseline))
+    monkeypatch.setattr(suite, 'run_suite',
+                        lambda *args, **kwargs: _results(overlay=0.2))
+    with pytest.raises(SystemExit) as error:
+        suite.main(['--baseline', str(path)])
+    assert error.value.code == 2
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from benchmarks.synthetic import protected_polygons
+from geobirds.tiles import export_tile_pyramid
+
+
+@pytest.fixture(scope='module')
+def protected():
+    return protected_polygons(30, seed=3)
+
+
+def test_export_is_skipped_or_replaced(protected, tmp_path):
+    out_dir = tmp_path / 'tiles'
+    first = export_tile_pyramid(protected, out_dir, min_zoom=3, max_zoom=4)
+    assert first['n_tiles'] > 0
+    assert export_tile_pyramid(protected, out_dir, min_zoom=3,
+                               max_zoom=4) == first
+    (out_dir / 'stale.geojson').write_text('{}')
+    other = export_tile_pyramid(protected.iloc[:10], out_dir, min_zoom=3,
+                                max_zoom=4)
+    assert other['digest'] != first['digest']
+    assert not (out_dir / 'stale.geojson').exists()
+    assert json.loads((out_dir / 'index.json').read_text()) == other
+
+
+def test_unrelated_directory_survives(protected, tmp_path):
+    (tmp_path / 'notes.txt').write_text('keep me')
+    (tmp_path / 'index.json').write_text('["not", "a", "manifest"]')
+    with pytest.raises(FileExistsError):
+        export_tile_pyramid(protected, tmp_path, min_zoom=3, max_zoom=3)
+    assert (tmp_path / 'notes.txt').read_text() == 'keep me'
+    assert (tmp_path / 'index.json').exists()
+
+
+def test_empty_directory_is_used(protected, tmp_path):
+    manifest = export_tile_pyramid(protected, tmp_path, min_zoom=3,
+                                   max_zoom=3)
+    assert manifest['tiles']['3']
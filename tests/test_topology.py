@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+import pytest
+import shapely
+
+from benchmarks.synthetic import adjacent_polygons, protected_polygons
+from geobirds.topology import Topology, topology_geoms
+
+BOUNDS = (-82.0, -56.0, -34.0, 13.0)
+
+
+@pytest.fixture(scope='module')
+def cells():
+    return adjacent_polygons(40, bounds=BOUNDS, segment=0.2, seed=5)
+
+
+def test_round_trip(cells):
+    topo = Topology(cells, 'cells', columns=['NAME']).to_topojson()
+    topo = json.loads(json.dumps(topo))
+    geoms = topology_geoms(topo, 'cells')
+    assert len(geoms) == len(cells)
+    # | Up to the quantization grid.
+    step = max(BOUNDS[2] - BOUNDS[0], BOUNDS[3] - BOUNDS[1]) / 10**5
+    original = np.asarray(cells.geometry)
+    assert shapely.hausdorff_distance(geoms, original).max() <= step
+    np.testing.assert_allclose(shapely.area(geoms), shapely.area(original),
+                               rtol=1e-3)
+    names = [g['properties']['NAME']
+             for g in topo['objects']['cells']['geometries']]
+    assert names == cells['NAME'].tolist()
+
+
+def test_shared_borders_are_stored_once(cells):
+    t = Topology(cells)
+    vertices = shapely.get_num_coordinates(np.asarray(cells.geometry)).sum()
+    # | Every inner border belongs to two cells but is kept once.
+    assert t.n_vertices < 0.6 * vertices
+
+
+@pytest.mark.parametrize('tolerance', [0.05, 0.5])
+def test_simplified_neighbors_leave_no_gaps(cells, tolerance):
+    geoms = topology_geoms(Topology(cells).to_topojson(tolerance))
+    geoms = shapely.make_valid(geoms)
+    vertices = shapely.get_num_coordinates(np.asarray(cells.geometry))
+    assert shapely.get_num_coordinates(geoms).sum() < vertices.sum()
+    # | No overlaps: the areas add up to the area of the union. No gaps:
+    # | the union is one polygon without holes.
+    union = shapely.union_all(geoms)
+    assert shapely.area(geoms).sum() == pytest.approx(shapely.area(union),
+                                                      rel=1e-9)
+    assert union.geom_type == 'Polygon'
+    assert len(union.interiors) == 0
+
+
+def test_multipolygons_and_holes():
+    ring = shapely.box(0, 0, 10, 10).difference(shapely.box(4, 4, 6, 6))
+    multi = shapely.MultiPolygon([shapely.box(20, 0, 21, 1),
+                                  shapely.box(22, 0, 23, 1)])
+    gdf = protected_polygons(2).set_geometry([ring, multi])
+    geoms = topology_geoms(Topology(gdf).to_topojson())
+    assert [g.geom_type for g in geoms] == ['Polygon', 'MultiPolygon']
+    assert len(geoms[0].interiors) == 1
+    original = np.asarray(gdf.geometry)
+    assert shapely.hausdorff_distance(geoms, original).max() < 1e-3
+    np.testing.assert_allclose(shapely.area(geoms), shapely.area(original),
+                               rtol=1e-3)
@@ -0,0 +1,77 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import bird_tracks
+from geobirds.trajectory import (ID, LAT, LON, TIME, TrajectoryStore,
+                                 as_store, track_offsets)
+
+
+@pytest.fixture(scope='module')
+def birds():
+    birds = bird_tracks(5_000, n_birds=7, seed=6)
+    birds.index = birds.index * 10 + 3
+    return birds
+
+
+@pytest.fixture(scope='module', params=['grouped', 'shuffled'])
+def store(request, birds):
+    if request.param == 'shuffled':
+        birds = birds.sample(frac=1, random_state=1)
+    return TrajectoryStore.from_birds(birds)
+
+
+def test_track_offsets():
+    uid, offsets = track_offsets([5, 5, 2, 2, 2, 9])
+    assert uid.tolist() == [5, 2, 9]
+    assert offsets.tolist() == [0, 2, 5, 6]
+
+
+def test_store_matches_groupby(birds, store):
+    groups = birds.sort_values(TIME).groupby(ID)
+    assert store.ids.tolist() == list(groups.groups)
+    assert store.counts.tolist() == groups.size().tolist()
+    for bird, rows in groups:
+        t, lon, lat = store.track(bird)
+        np.testing.assert_array_equal(t, rows[TIME].to_numpy())
+        np.testing.assert_array_equal(lon, rows[LON].to_numpy())
+        np.testing.assert_array_equal(lat, rows[LAT].to_numpy())
+
+    start, end = store.start_frame(), store.end_frame()
+    first, last = groups.first(), groups.last()
+    np.testing.assert_array_equal(start[TIME], first[TIME])
+    np.testing.assert_array_equal(end.geometry.x, last[LON])
+    np.testing.assert_array_equal(end.geometry.y, last[LAT])
+
+
+def test_segments_match_shift(birds, store):
+    ordered = birds.sort_values([ID, TIME])
+    following = ordered.groupby(ID).shift(-1)
+    reference = ordered[following[TIME].notna()]
+    following = following.loc[reference.index]
+    segments = store.segments()
+    assert len(segments) == len(birds) - len(store)
+    np.testing.assert_array_equal(segments[ID], reference[ID])
+    np.testing.assert_array_equal(segments['time_end'], following[TIME])
+    np.testing.assert_array_equal(segments['lon_start'], reference[LON])
+    np.testing.assert_array_equal(segments['lat_end'], following[LAT])
+
+
+def test_to_birds_round_trip(birds, store):
+    out = store.to_birds()
+    assert isinstance(out, gpd.GeoDataFrame)
+    pd.testing.assert_frame_equal(
+        pd.DataFrame(out.drop(columns='geometry')).sort_index(),
+        birds[[TIME, LON, LAT, ID]].astype({TIME: 'datetime64[ns]'}))
+    assert as_store(out) is not store
+    assert as_store(store) is store
+
+
+def test_from_endpoints(store):
+    two = TrajectoryStore.from_endpoints(store.start_frame(),
+                                         store.end_frame())
+    assert two.counts.tolist() == [2] * len(store)
+    np.testing.assert_array_equal(two.lon[1::2],
+                                  store.lon[store.last_index()])
+    np.testing.assert_array_equal(two.t[::2], store.t[store.first_index()])